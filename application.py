@@ -1,36 +1,53 @@
+import atexit
+import contextlib
+import datetime
 import logging
 import logging.config
-from itertools import count, takewhile
-from typing import Generator, Tuple
+import os
+import pathlib
+import signal
+import socket
+import threading
+import time
+import typing
+from itertools import chain, islice
+from typing import (
+    Callable,
+    ContextManager,
+    Dict,
+    Hashable,
+    Iterator,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import fire
 import fire.docstrings
-from rich.logging import RichHandler
-from selenium.webdriver import Firefox, FirefoxOptions, Remote
-from selenium.webdriver.common.options import ArgOptions
 
-from config import ApplictionConfig
+import logs
+import profiling
+import registry
+from batching import AdaptiveBatchSizer
+from config import AUTHKEY_VARIABLE, ApplictionConfig
 from crawlers.crawler import LinkCrawler
-from crawlers.strategies.careerviet import CareervietSeleniumSequentialLinkCrawler
-from crawlers.strategies.saramin import SaraminSeleniumSequentialLinkCrawler
-from models import JobDetails, JobLink
-from persistence.sqlite import SqliteJobDetailsRepository, SqliteJobLinkRepository
-from scrapers.scraper import DetailScraper
-from scrapers.strategies.careerviet import careerviet_selenium_sequential
+from models import JobDetails, WebsiteIdentifier, format_timestamp
+from persistence import JobDetailsRepository, JobLinkRepository, WorkQueue
+from persistence.sqlite import (
+    SqliteJobDetailsRepository,
+    SqliteJobLinkQueue,
+    SqliteJobLinkRepository,
+)
+from scrapers.scraper import DetailScraper, unique_links
 
-DRIVER: type[Remote] = Firefox
-OPTS: ArgOptions = FirefoxOptions()
-OPTS.add_argument("--headless")
+if typing.TYPE_CHECKING:
+    from persistence.shards import SqliteShardView
+    from scrapers.probe import LivenessProbe
 
-CRAWLERS = [
-    LinkCrawler(strategy=SaraminSeleniumSequentialLinkCrawler(DRIVER, OPTS)),
-    LinkCrawler(strategy=CareervietSeleniumSequentialLinkCrawler(DRIVER, OPTS)),
-]
-
-SCRAPERS = [
-    # DetailScraper(strategy=init_saramin_selenium_scraper(DRIVER, OPTS)),
-    DetailScraper(strategy=careerviet_selenium_sequential),
-]
+T = TypeVar("T")
 
 
 class Application:
@@ -44,19 +61,52 @@ class Application:
     Extract job details:
     poetry run scrape details extract_job_details BATCH_SIZE
 
+    Both commands use the strategies selected in `config.toml`, which can be
+    overridden with e.g. `--strategies='{careerviet: requests_sequential}'`
+
+    Any command can be profiled with `--profile`, or only some of its stages
+    with e.g. `--profile=fetch,parse`
+
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        profile: Union[bool, str, Tuple[str, ...]] = False,
+        profile_every: Optional[int] = None,
+        profile_mode: Optional[str] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        profile : bool or str or Tuple[str, ...]
+            Profile the stages of the pipeline, or only the given ones, of
+            `page_iteration`, `link_extraction`, `fetch`, `parse`
+            and `repository_write`, as configured in `config.toml`
+        profile_every : int, optional
+            Profile every Nth batch, instead of the configured N
+        profile_mode : str, optional
+            `sampling` or `cprofile`, instead of the configured mode
+
+        """
         self.config = ApplictionConfig.load()
-        logging.basicConfig(
-            level=self.config.log_level,
-            format="%(name)s - %(levelname)s - %(message)s",
-            datefmt="[%X]",
-            handlers=[RichHandler(rich_tracebacks=True)],
-        )
+        logs.configure(self.config)
+        # set when the daemon shuts down, to stop after the current batches
+        self._stopping = threading.Event()
+        # the resources kept open between the runs of the daemon's jobs
+        self._warm: Optional[threading.local] = None
+        self._warm_scrapers: Dict[Tuple[WebsiteIdentifier, str], DetailScraper] = {}
+        self._warm_scrapers_lock = threading.Lock()
         logging.info("Initialized the application with config %s", self.config)
+        if profile:
+            self._start_profiling(profile, profile_every, profile_mode)
 
-    def links(self, n_links: int, batch_size: int) -> None:
+    def links(
+        self,
+        n_links: int,
+        batch_size: int,
+        strategies: Optional[Dict[str, str]] = None,
+        adaptive: Optional[bool] = None,
+    ) -> None:
         """Provided the website and the search strategy, search the
         website's job offer lists, and collect the links to the
         job description pages, recording the access timestamp.
@@ -67,53 +117,725 @@ class Application:
             Total number of job links to go through
         batch_size : int
             How many links to collect in one step
+        strategies : Dict[str, str], optional
+            The crawling strategy to use for each website, instead of the ones
+            in `config.toml`, e.g. `{saramin: selenium_sequential}`
+        adaptive : bool, optional
+            Adapt the size of the batches after the first one,
+            as configured in `config.toml`
 
         """
-        with SqliteJobLinkRepository(
-            self.config.persistence.sqlite.db_file_location
-        ) as link_repository:
-            for crawler in CRAWLERS:
-                for batch in crawler.crawl(
-                    batch_size=batch_size, n_links_to_read=n_links
-                ):
-                    link_repository.save_batch(batch)
+        for strategy in registry.CRAWLERS.build(
+            self._select(strategies, self.config.strategies.crawlers),
+            self.config,
+        ):
+            with self._link_repository(strategy.website) as link_repository:
+                crawler = LinkCrawler(strategy=strategy)
+                sizer = self._batch_sizer(
+                    f"{strategy.website.value} links", batch_size, adaptive
+                )
+                # the crawled links are regrouped into batches of the current size
+                links = chain.from_iterable(
+                    crawler.crawl(batch_size=sizer.minimum, n_links_to_read=n_links)
+                )
+                while self._running():
+                    with profiling.batch(), sizer.measure() as measurement:
+                        batch = tuple(islice(links, sizer.size))
+                        if batch:
+                            with profiling.stage(profiling.REPOSITORY_WRITE):
+                                link_repository.save_batch(batch)
+                    if not batch:
+                        break
+                    measurement.record(len(batch))
 
-    def details(self, batch_size: int) -> None:
+    def details(
+        self,
+        batch_size: int,
+        strategies: Optional[Dict[str, str]] = None,
+        rescrape: bool = False,
+        coordinator: bool = False,
+        worker_id: Optional[str] = None,
+        adaptive: Optional[bool] = None,
+        budget_minutes: Optional[float] = None,
+    ) -> None:
         """Given the previously collected links, open each of them,
         and try to extract the job details.
 
+        The links are claimed from a work queue, so any number of `details`
+        processes can run at the same time without scraping a link twice.
+        The freshest links are claimed first: the newest of the ones never
+        scraped, then, with `rescrape`, the ones seen again most recently.
+        With the DuckDB backend, which has no work queue, a single process
+        goes through the saved links page by page instead.
+
         Parameters
         ----------
         batch_size : int
             How many saved links to retrieve and scrape the details for at once
+        strategies : Dict[str, str], optional
+            The scraping strategy to use for each website, instead of the ones
+            in `config.toml`, e.g. `{careerviet: requests_sequential}`
+        rescrape : bool
+            Scrape again the links whose details have already been scraped
+        coordinator : bool
+            Claim the links from, and save the details through, the coordinator
+            configured in `config.toml`, instead of the local database
+        worker_id : str, optional
+            The name of this worker in the queue, by default `hostname:pid`
+        adaptive : bool, optional
+            Adapt the size of the batches after the first one,
+            as configured in `config.toml`
+        budget_minutes : float, optional
+            Stop claiming new batches after this many minutes,
+            leaving the rest of the links to the next run
 
         """
-        with SqliteJobLinkRepository(
-            self.config.persistence.sqlite.db_file_location
-        ) as link_repository, SqliteJobDetailsRepository(
-            self.config.persistence.sqlite.db_file_location
-        ) as details_repository:
-            for scraper in SCRAPERS:
-                logging.info(
-                    "Starting scraper %s for website %s",
-                    scraper.strategy.__name__,
-                    scraper.strategy.website.name,
+        deadline = (
+            time.monotonic() + budget_minutes * 60
+            if budget_minutes is not None
+            else None
+        )
+        if self.config.persistence.backend == "duckdb":
+            if coordinator:
+                raise ValueError(
+                    "The coordinator shares the SQLite work queue,"
+                    " it is not available with the DuckDB backend"
                 )
-                link_batches: Generator[Tuple[JobLink, ...], None, None] = (
-                    link_repository.get_batch(
-                        scraper.strategy.website, batch_size, offset
+            self._details_in_pages(batch_size, strategies, rescrape, adaptive, deadline)
+            return
+
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        lease_seconds = self.config.work_queue.lease_seconds
+
+        for scraper in self._scrapers(strategies):
+            with self._work_queue(coordinator, scraper.strategy.website) as (
+                work_queue,
+                details_repository,
+            ):
+                work_queue.reclaim_expired()
+                if rescrape:
+                    work_queue.requeue_done(scraper.strategy.website)
+                work_queue.enqueue(scraper.strategy.website)
+                sizer = self._batch_sizer(
+                    f"{scraper.strategy.website.value} details", batch_size, adaptive
+                )
+
+                while self._running(deadline) and (
+                    batch := work_queue.claim(
+                        scraper.strategy.website, worker_id, sizer.size, lease_seconds
+                    )
+                ):
+                    ids = tuple(link.id for link in batch)
+                    try:
+                        with profiling.batch(), sizer.measure() as measurement, (
+                            _heartbeat(work_queue, worker_id, lease_seconds)
+                        ):
+                            scraped = scraper.scrape(links=batch)
+                            logging.info(
+                                "Extracted %i details for %s (%i failed)",
+                                len(scraped.details),
+                                scraper.strategy.website.name,
+                                len(scraped.failures),
+                            )
+                            with profiling.stage(profiling.REPOSITORY_WRITE):
+                                details_repository.save_batch(scraped.details)
+                    except BaseException:
+                        work_queue.release(worker_id, ids)
+                        raise
+                    work_queue.fail(worker_id, scraped.failures)
+                    failed_ids = {failure.id for failure in scraped.failures}
+                    work_queue.complete(
+                        worker_id, tuple(id_ for id_ in ids if id_ not in failed_ids)
+                    )
+                    measurement.record(len(batch), len(scraped.failures))
+
+    def to_duckdb(self, batch_size: int = 50_000) -> None:
+        """Copy the links, the details and their history from the SQLite
+        database to the DuckDB one, both set in `config.toml`.
+        The copied rows replace the ones already in the DuckDB database.
+
+        Parameters
+        ----------
+        batch_size : int
+            How many rows to copy at once
+
+        """
+        from persistence.duckdb import migrate_from_sqlite
+
+        for db_file_location in self._sqlite_locations():
+            migrate_from_sqlite(
+                db_file_location,
+                self.config.persistence.duckdb.db_file_location,
+                batch_size,
+            )
+
+    def salaries(self, batch_size: int = 10_000) -> None:
+        """Normalize the salary information of the details saved before
+        the salaries were normalized, or by an older version of the normalizer,
+        into the numeric salary columns.
+
+        Parameters
+        ----------
+        batch_size : int
+            How many details to normalize in one transaction
+
+        """
+        n_normalized = 0
+        for db_file_location in self._sqlite_locations():
+            with SqliteJobDetailsRepository(db_file_location) as details_repository:
+                n_normalized += details_repository.backfill_salaries(batch_size)
+        logging.info("Normalized the salaries of %i job details", n_normalized)
+
+    def companies(self, top: int = 20, batch_size: int = 10_000) -> None:
+        """Assign the details saved before the companies were normalized
+        to their companies, and print the companies with the most postings,
+        with the last time one of them was scraped.
+
+        Parameters
+        ----------
+        top : int
+            How many companies to print, per database if they are sharded
+        batch_size : int
+            How many details to assign in one transaction
+
+        """
+        for db_file_location in self._sqlite_locations():
+            with SqliteJobDetailsRepository(db_file_location) as details_repository:
+                details_repository.backfill_companies(batch_size)
+                for name, n_postings, latest_access in details_repository.top_companies(
+                    top
+                ):
+                    latest = (
+                        format_timestamp(latest_access)
+                        if latest_access is not None
+                        else "-"
                     )
-                    for offset in count(0, batch_size)
+                    print(f"{n_postings}\t{latest}\t{name}")
+
+    def coordinates(self, batch_size: int = 10_000) -> None:
+        """Move the coordinates of the details saved before they had their own
+        columns out of the location, into the columns and the spatial index.
+
+        Parameters
+        ----------
+        batch_size : int
+            How many details to look at in one transaction
+
+        """
+        n_found = 0
+        for db_file_location in self._sqlite_locations():
+            with SqliteJobDetailsRepository(db_file_location) as details_repository:
+                n_found += details_repository.backfill_coordinates(batch_size)
+        logging.info("Found the coordinates of %i job details", n_found)
+
+    def near(self, latitude: float, longitude: float, km: float) -> None:
+        """Print the jobs located within `km` kilometres of a point,
+        nearest first.
+
+        Parameters
+        ----------
+        latitude : float
+        longitude : float
+        km : float
+            The radius of the search
+
+        """
+        with self._details_reader() as details_reader:
+            for job_details, distance in details_reader.near(latitude, longitude, km):
+                print(f"{distance:.2f} km\t{_describe(job_details)}")
+
+    def within(self, south: float, west: float, north: float, east: float) -> None:
+        """Print the jobs located in a bounding box, given by its edges
+        in degrees of latitude and longitude.
+
+        Parameters
+        ----------
+        south : float
+        west : float
+        north : float
+        east : float
+
+        """
+        with self._details_reader() as details_reader:
+            for job_details in details_reader.within(south, west, north, east):
+                print(_describe(job_details))
+
+    def merge(self, target: str, vacuum: bool = False) -> None:
+        """Merge the databases of the websites, when `sharded` is set in
+        `config.toml`, into a single database, e.g. for an export.
+        The merged rows replace the ones already in the target.
+
+        Parameters
+        ----------
+        target : str
+            The database to merge the websites into
+        vacuum : bool
+            Also compact the databases of the websites
+
+        """
+        from persistence.shards import merge_shards
+
+        n_merged = merge_shards(
+            self.config.persistence.sqlite.db_file_location,
+            pathlib.Path(target),
+            vacuum,
+        )
+        logging.info("Merged %i job details into %s", n_merged, target)
+
+    def serve(self) -> None:
+        """Run the link crawls and the detail passes scheduled in the
+        `[schedule]` section of `config.toml`, until interrupted
+        or terminated.
+
+        Unlike separate `links` and `details` runs, the daemon keeps the
+        browsers, the HTTP connections, the scrapers and the databases open
+        between the runs. The jobs run in their own threads, and the runs of
+        a job never overlap. On shutdown, the runs in progress finish their
+        current batch, and everything is saved and closed.
+        """
+        from scheduling import Job, Scheduler
+
+        settings = self.config.schedule
+        if not settings.jobs:
+            raise ValueError("No jobs are scheduled in `config.toml`")
+        jobs = [
+            Job(
+                f"{job.command} {job.website.value}",
+                job.every_minutes * 60,
+                self._scheduled_run(job),
+            )
+            for job in settings.jobs
+        ]
+        # the runs stop after their current batch once the scheduler stops
+        scheduler = Scheduler(
+            jobs, settings.jitter_seconds, self._warm_resources, self._stopping
+        )
+        self._warm = threading.local()
+        signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+        try:
+            scheduler.run()
+        finally:
+            profiling.flush()
+            logging.info("Stopped serving")
+
+    def query_server(self) -> None:
+        """Serve the links and the details of the SQLite database as JSON over
+        local HTTP, at the address set in `config.toml`, until interrupted.
+        Other programs read them there instead of opening the database.
+
+        The queries run on a few read-only connections, which do not block
+        the scraping, and the responses are cached until the next write.
+        `/links/ID` and `/details/ID` look a job up, `/links?website=saramin`
+        and `/details?website=saramin&since=2025-01-01` list the newest,
+        a page at a time with `limit` and `offset`, and `/count?website=saramin`
+        counts the links.
+        """
+        if self.config.persistence.backend != "sqlite":
+            raise ValueError("The query server reads the SQLite database")
+        from query_server import QueryServer
+
+        settings = self.config.query_server
+        server = QueryServer(
+            self.config.persistence.sqlite.db_file_location,
+            sharded=self.config.persistence.sqlite.sharded,
+            connections=settings.connections,
+            cache_size=settings.cache_size,
+            max_page_size=settings.max_page_size,
+        )
+        try:
+            server.serve((settings.host, settings.port))
+        except KeyboardInterrupt:
+            logging.info("Stopped serving the database")
+
+    def coordinator(self) -> None:
+        """Share the work queue and the database of this machine with
+        `details --coordinator` workers on other machines, until interrupted.
+        The address is set in `config.toml`.
+        """
+        from persistence import coordinator
+
+        if self.config.persistence.sqlite.sharded:
+            raise ValueError(
+                "The coordinator shares a single database,"
+                " it is not available with the sharded databases"
+            )
+        db_file_location = self.config.persistence.sqlite.db_file_location
+        settings = self.config.work_queue.coordinator
+        authkey = self._coordinator_authkey()
+        with self._local_work_queue(
+            db_file_location
+        ) as work_queue, SqliteJobDetailsRepository(
+            db_file_location
+        ) as details_repository:
+            coordinator.serve(
+                work_queue,
+                details_repository,
+                (settings.host, settings.port),
+                authkey,
+            )
+
+    def _details_in_pages(
+        self,
+        batch_size: int,
+        strategies: Optional[Dict[str, str]],
+        rescrape: bool,
+        adaptive: Optional[bool],
+        deadline: Optional[float],
+    ) -> None:
+        from persistence.duckdb import (
+            DuckDbJobDetailsRepository,
+            DuckDbJobLinkRepository,
+        )
+
+        db_file_location = self.config.persistence.duckdb.db_file_location
+        settings = self.config.work_queue
+        with self._resource(
+            "duckdb links", lambda: DuckDbJobLinkRepository(db_file_location)
+        ) as link_repository, self._resource(
+            "duckdb details",
+            lambda: DuckDbJobDetailsRepository(
+                db_file_location,
+                retry_delay_seconds=settings.retry_delay_seconds,
+                max_retry_delay_seconds=settings.max_retry_delay_seconds,
+                max_attempts=settings.max_attempts,
+            ),
+        ) as details_repository:
+            for scraper in self._scrapers(strategies):
+                sizer = self._batch_sizer(
+                    f"{scraper.strategy.website.value} details", batch_size, adaptive
                 )
-                for batch in takewhile(lambda b: len(b) > 0, link_batches):
+                # the canonical URLs of the links of the previous pages
+                seen: Set[str] = set()
+                offset = 0
+                while self._running(deadline) and (
+                    page := link_repository.get_batch(
+                        scraper.strategy.website, sizer.size, offset
+                    )
+                ):
+                    offset += len(page)
+                    batch = unique_links(
+                        details_repository.unscraped(page, rescrape), seen
+                    )
+                    if not batch:
+                        continue
+                    with profiling.batch(), sizer.measure() as measurement:
+                        scraped = scraper.scrape(links=batch)
+                        logging.info(
+                            "Extracted %i details for %s (%i failed)",
+                            len(scraped.details),
+                            scraper.strategy.website.name,
+                            len(scraped.failures),
+                        )
+                        with profiling.stage(profiling.REPOSITORY_WRITE):
+                            details_repository.save_batch(scraped.details)
+                            details_repository.fail(scraped.failures)
+                    measurement.record(len(batch), len(scraped.failures))
+
+    def _scrapers(
+        self, strategies: Optional[Dict[str, str]]
+    ) -> Iterator[DetailScraper]:
+        selected = self._select(strategies, self.config.strategies.scrapers)
+        with self._warm_scrapers_lock:
+            warm = [
+                scraper
+                for (website, name), scraper in self._warm_scrapers.items()
+                if selected.get(website) == name
+            ]
+            missing = {
+                website: name
+                for website, name in selected.items()
+                if (website, name) not in self._warm_scrapers
+            }
+        yield from warm
+        for strategy in registry.SCRAPERS.build(missing, self.config):
+            scraper = DetailScraper(
+                strategy=strategy, probe=self._probe(strategy.website)
+            )
+            if self._warm is not None:
+                # the daemon reuses the scrapers, with their pools, in every run,
+                # and the one built first by the job threads of the website
+                with self._warm_scrapers_lock:
+                    scraper = self._warm_scrapers.setdefault(
+                        (strategy.website, missing[strategy.website]), scraper
+                    )
+            logging.info(
+                "Starting scraper %s for website %s",
+                scraper.strategy.__name__,
+                scraper.strategy.website.name,
+            )
+            yield scraper
+
+    def _running(self, deadline: Optional[float] = None) -> bool:
+        """Whether to go on with the next batch, unless the daemon
+        is shutting down, or the time budget of the run is spent
+        """
+        if self._stopping.is_set():
+            return False
+        if deadline is not None and time.monotonic() >= deadline:
+            logging.info("The time budget of the run is spent")
+            return False
+        return True
+
+    def _scheduled_run(self, job: ApplictionConfig.Schedule.Job) -> Callable[[], None]:
+        configured = (
+            self.config.strategies.crawlers
+            if job.command == "links"
+            else self.config.strategies.scrapers
+        )
+        strategy = job.strategy or configured.get(job.website)
+        if strategy is None:
+            raise ValueError(
+                f"No {job.command} strategy is configured for {job.website.value}"
+            )
+        strategies = {job.website.value: strategy}
+        if job.command == "links":
+            return lambda: self.links(job.n_links, job.batch_size, strategies)
+        return lambda: self.details(
+            job.batch_size, strategies, budget_minutes=job.budget_minutes
+        )
+
+    @contextlib.contextmanager
+    def _warm_resources(self) -> Iterator[None]:
+        """Keeps the resources opened by a job thread of the daemon
+        open until the thread ends
+        """
+        assert self._warm is not None
+        with contextlib.ExitStack() as stack:
+            self._warm.stack = stack
+            self._warm.resources = {}
+            yield
+
+    @contextlib.contextmanager
+    def _resource(
+        self, key: Hashable, open_resource: Callable[[], ContextManager[T]]
+    ) -> Iterator[T]:
+        """Opens the resource for the block, or in a job thread of the daemon,
+        once for all the runs of the job
+        """
+        if self._warm is None or not hasattr(self._warm, "stack"):
+            with open_resource() as resource:
+                yield resource
+            return
+        if key not in self._warm.resources:
+            self._warm.resources[key] = self._warm.stack.enter_context(open_resource())
+        yield self._warm.resources[key]
+
+    def _batch_sizer(
+        self, name: str, batch_size: int, adaptive: Optional[bool]
+    ) -> AdaptiveBatchSizer:
+        settings = self.config.batching
+        if not (settings.adaptive if adaptive is None else adaptive):
+            return AdaptiveBatchSizer.fixed(name, batch_size)
+        return AdaptiveBatchSizer(
+            name,
+            batch_size,
+            minimum=settings.minimum,
+            maximum=settings.maximum,
+            target_seconds=settings.target_seconds,
+            memory_ceiling_mb=settings.memory_ceiling_mb,
+            max_error_rate=settings.max_error_rate,
+            trace_memory=settings.trace_memory,
+        )
+
+    def _start_profiling(
+        self,
+        profile: Union[bool, str, Tuple[str, ...]],
+        every_nth_batch: Optional[int],
+        mode: Optional[str],
+    ) -> None:
+        settings = self.config.profiling
+        stages: Tuple[str, ...]
+        if isinstance(profile, bool):
+            stages = profiling.STAGES if profile else ()
+        elif isinstance(profile, str):
+            stages = (profile,)
+        else:
+            stages = profile
+        if unknown := set(stages) - set(profiling.STAGES):
+            raise ValueError(
+                f"Unknown stages {', '.join(sorted(unknown))}, "
+                f"the stages are {', '.join(profiling.STAGES)}"
+            )
+        mode = mode or settings.mode
+        if mode not in ("sampling", "cprofile"):
+            raise ValueError(f"Unknown profiling mode {mode}")
+
+        run = f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        profiling.configure(
+            profiling.Settings(
+                output_dir=settings.output_dir / run,
+                stages=frozenset(stages),
+                mode=typing.cast(typing.Literal["sampling", "cprofile"], mode),
+                every_nth_batch=every_nth_batch or settings.every_nth_batch,
+                sample_interval_seconds=settings.sample_interval_ms / 1000,
+            )
+        )
+        # the profiles of the last batches, which may not be complete
+        atexit.register(profiling.flush)
+
+    @contextlib.contextmanager
+    def _link_repository(
+        self, website_identifier: WebsiteIdentifier
+    ) -> Iterator[JobLinkRepository]:
+        if self.config.persistence.backend == "duckdb":
+            from persistence.duckdb import DuckDbJobLinkRepository
 
-                    detail_batch: Tuple[JobDetails, ...] = scraper.scrape(links=batch)
-                    logging.info(
-                        "Extracted %i details for %s",
-                        len(batch),
-                        scraper.strategy.website.name,
+            with self._resource(
+                "duckdb links",
+                lambda: DuckDbJobLinkRepository(
+                    self.config.persistence.duckdb.db_file_location
+                ),
+            ) as link_repository:
+                yield link_repository
+            return
+
+        location = self._sqlite_location(website_identifier)
+        with self._resource(
+            ("sqlite links", location), lambda: SqliteJobLinkRepository(location)
+        ) as sqlite_link_repository:
+            yield sqlite_link_repository
+
+    @contextlib.contextmanager
+    def _work_queue(
+        self, remote: bool, website_identifier: WebsiteIdentifier
+    ) -> Iterator[Tuple[WorkQueue, JobDetailsRepository]]:
+        if remote:
+            from persistence import coordinator
+
+            settings = self.config.work_queue.coordinator
+            with self._resource(
+                "coordinator",
+                lambda: contextlib.nullcontext(
+                    coordinator.connect(
+                        (settings.host, settings.port), self._coordinator_authkey()
                     )
-                    details_repository.save_batch(detail_batch)
+                ),
+            ) as remote_queue:
+                yield remote_queue
+            return
+
+        db_file_location = self._sqlite_location(website_identifier)
+        with self._resource(
+            ("sqlite queue", db_file_location),
+            lambda: self._local_work_queue(db_file_location),
+        ) as work_queue, self._resource(
+            ("sqlite details", db_file_location),
+            lambda: SqliteJobDetailsRepository(db_file_location),
+        ) as details_repository:
+            yield work_queue, details_repository
+
+    @contextlib.contextmanager
+    def _details_reader(
+        self,
+    ) -> Iterator["SqliteJobDetailsRepository | SqliteShardView"]:
+        """Reads the details of all websites, from their own databases
+        if they are sharded
+        """
+        if not self.config.persistence.sqlite.sharded:
+            with SqliteJobDetailsRepository(
+                self.config.persistence.sqlite.db_file_location
+            ) as details_repository:
+                yield details_repository
+            return
+
+        from persistence.shards import SqliteShardView
+
+        with SqliteShardView(
+            self.config.persistence.sqlite.db_file_location
+        ) as shard_view:
+            yield shard_view
+
+    def _sqlite_location(self, website_identifier: WebsiteIdentifier) -> pathlib.Path:
+        settings = self.config.persistence.sqlite
+        if not settings.sharded:
+            return settings.db_file_location
+
+        from persistence.shards import shard_location
+
+        return shard_location(settings.db_file_location, website_identifier)
+
+    def _sqlite_locations(self) -> Tuple[pathlib.Path, ...]:
+        """The SQLite database, or the databases of the websites if sharded"""
+        settings = self.config.persistence.sqlite
+        if not settings.sharded:
+            return (settings.db_file_location,)
+
+        from persistence.shards import existing_shards
+
+        return tuple(existing_shards(settings.db_file_location).values())
+
+    def _probe(self, website: WebsiteIdentifier) -> "LivenessProbe | None":
+        settings = self.config.probe
+        if website not in settings.websites:
+            return None
+
+        from scrapers.probe import LivenessProbe
+
+        return LivenessProbe(
+            website,
+            n_workers=settings.workers,
+            method=settings.method,
+            timeout=settings.timeout_seconds,
+        )
+
+    def _local_work_queue(self, db_file_location: pathlib.Path) -> SqliteJobLinkQueue:
+        settings = self.config.work_queue
+        return SqliteJobLinkQueue(
+            db_file_location,
+            retry_delay_seconds=settings.retry_delay_seconds,
+            max_retry_delay_seconds=settings.max_retry_delay_seconds,
+            max_attempts=settings.max_attempts,
+        )
+
+    def _coordinator_authkey(self) -> bytes:
+        authkey = self.config.work_queue.coordinator.authkey
+        if not authkey:
+            raise ValueError(
+                "The coordinator needs a secret key, set in the "
+                f"{AUTHKEY_VARIABLE} variable or in [work_queue.coordinator]"
+            )
+        return authkey.encode()
+
+    @staticmethod
+    def _select(
+        overrides: Optional[Mapping[str, str]],
+        configured: Mapping[WebsiteIdentifier, str],
+    ) -> Mapping[WebsiteIdentifier, str]:
+        """The strategies passed on the command line replace the configured ones"""
+        if overrides is None:
+            return configured
+        return {WebsiteIdentifier(website): name for website, name in overrides.items()}
+
+
+@contextlib.contextmanager
+def _heartbeat(
+    work_queue: WorkQueue, worker_id: str, lease_seconds: float
+) -> Iterator[None]:
+    """Keeps the leases of the worker alive while the block runs"""
+    stopped = threading.Event()
+
+    def beat() -> None:
+        while not stopped.wait(lease_seconds / 3):
+            work_queue.heartbeat(worker_id, lease_seconds)
+
+    thread = threading.Thread(target=beat, name="heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def _describe(job_details: JobDetails) -> str:
+    return "\t".join(
+        (
+            job_details.id,
+            job_details.title,
+            job_details.company,
+            f"{job_details.latitude}, {job_details.longitude}",
+        )
+    )
 
 
 def run():
@@ -0,0 +1,213 @@
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import typing
+
+from annotated_types import Ge, Gt
+
+MB = 1024 * 1024
+
+
+class AdaptiveBatchSizer:
+    """Chooses the size of the next batch from how the previous ones went.
+
+    The batch grows while batches take less than the target time, and
+    shrinks when they take longer, when too many of their items fail,
+    or when the memory of the process gets close to the ceiling. The size
+    changes by at most `growth` or `shrink` times per batch, and stays
+    between the bounds. With equal bounds, the size is fixed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: typing.Annotated[int, Gt(0)],
+        minimum: typing.Annotated[int, Gt(0)] = 1,
+        maximum: typing.Annotated[int, Gt(0)] = 1000,
+        target_seconds: typing.Annotated[float, Gt(0)] = 30,
+        memory_ceiling_mb: typing.Annotated[float, Gt(0)] = 2048,
+        max_error_rate: typing.Annotated[float, Ge(0)] = 0.5,
+        trace_memory: bool = False,
+        growth: typing.Annotated[float, Gt(1)] = 2,
+        shrink: typing.Annotated[float, Gt(0)] = 0.5,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        name : str
+            What is batched, for the logs
+        initial : int
+            The size of the first batch
+        minimum, maximum : int
+            The bounds of the size
+        target_seconds : float
+            How long a batch should take, i.e. how often the results are committed
+        memory_ceiling_mb : float
+            The resident memory of the process that batches should stay under
+        max_error_rate : float
+            The share of failed items above which the batches shrink
+        trace_memory : bool
+            Measure the memory each item takes with `tracemalloc`, which is
+            precise but slows down the allocations, instead of only watching
+            the resident memory of the process
+        growth, shrink : float
+            The largest factors the size changes by after a batch
+        """
+        self.name = name
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.target_seconds = target_seconds
+        self.memory_ceiling = memory_ceiling_mb * MB
+        self.max_error_rate = max_error_rate
+        self.trace_memory = trace_memory
+        self.growth = growth
+        self.shrink = shrink
+
+    @classmethod
+    def fixed(
+        cls, name: str, size: typing.Annotated[int, Gt(0)]
+    ) -> "AdaptiveBatchSizer":
+        return cls(name, size, minimum=size, maximum=size)
+
+    @property
+    def is_fixed(self) -> bool:
+        return self.minimum == self.maximum
+
+    def measure(self) -> "BatchMeasurement":
+        """Measures the batch run in the `with` block, which then
+        has to be recorded with the number of its items and failures
+        """
+        return BatchMeasurement(self)
+
+    def record(
+        self,
+        n_items: int,
+        seconds: float,
+        n_errors: int = 0,
+        bytes_per_item: float | None = None,
+    ) -> int:
+        """Adjusts the size after a batch, and returns the new size"""
+        if self.is_fixed or n_items == 0:
+            return self.size
+
+        rss = resident_memory()
+        reasons = []
+        limits = [self.size * self.growth]
+
+        seconds_per_item = seconds / n_items
+        if seconds_per_item > 0:
+            limits.append(self.target_seconds / seconds_per_item)
+        reasons.append(
+            f"{seconds:.1f}s for {n_items} (target {self.target_seconds:.0f}s)"
+        )
+
+        error_rate = n_errors / n_items
+        if error_rate > self.max_error_rate:
+            limits.append(self.size * self.shrink)
+            reasons.append(f"{error_rate:.0%} errors (max {self.max_error_rate:.0%})")
+
+        if rss is not None and rss > self.memory_ceiling:
+            limits.append(self.size * self.shrink)
+        elif rss is not None and bytes_per_item:
+            # the batch size that fills the memory left under the ceiling
+            limits.append((self.memory_ceiling - rss) / bytes_per_item)
+        if rss is not None:
+            reasons.append(
+                f"RSS {rss / MB:.0f}MB of {self.memory_ceiling / MB:.0f}MB"
+                + (
+                    f", {bytes_per_item / 1024:.0f}KB per item"
+                    if bytes_per_item
+                    else ""
+                )
+            )
+
+        size = int(
+            min(max(min(limits), self.size * self.shrink), self.size * self.growth)
+        )
+        size = min(max(size, self.minimum), self.maximum)
+        if size != self.size:
+            logging.info(
+                "Changing the %s batch size from %i to %i: %s",
+                self.name,
+                self.size,
+                size,
+                ", ".join(reasons),
+            )
+        else:
+            logging.debug(
+                "Keeping the %s batch size at %i: %s",
+                self.name,
+                self.size,
+                ", ".join(reasons),
+            )
+        self.size = size
+        return size
+
+
+class BatchMeasurement:
+    """Times a batch, and measures how much memory it takes: with
+    `tracemalloc` if the sizer traces memory, or else from the growth
+    of the resident memory
+    """
+
+    def __init__(self, sizer: AdaptiveBatchSizer) -> None:
+        self.sizer = sizer
+        self.start = 0.0
+        self.seconds = 0.0
+        self.bytes = 0
+        self._started_tracing = False
+        self._rss_before: int | None = None
+
+    def __enter__(self) -> "BatchMeasurement":
+        if self.sizer.is_fixed:
+            pass
+        elif not self.sizer.trace_memory:
+            self._rss_before = resident_memory()
+        else:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            self._traced_before = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: object) -> typing.Literal[False]:
+        self.seconds = time.perf_counter() - self.start
+        if self._rss_before is not None:
+            self.bytes = max(0, (resident_memory() or 0) - self._rss_before)
+        elif self.sizer.trace_memory and not self.sizer.is_fixed:
+            self.bytes = tracemalloc.get_traced_memory()[1] - self._traced_before
+            if self._started_tracing:
+                tracemalloc.stop()
+        return False
+
+    def record(self, n_items: int, n_errors: int = 0) -> int:
+        """Records the batch measured in the `with` block to the sizer"""
+        return self.sizer.record(
+            n_items,
+            self.seconds,
+            n_errors,
+            self.bytes / n_items if self.bytes and n_items else None,
+        )
+
+
+def resident_memory() -> int | None:
+    """The resident memory of the process in bytes, or on systems without
+    `/proc`, the peak resident memory"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, ValueError):
+        return None
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -1,8 +1,12 @@
+import os
 import pathlib
 import sys
-from typing import Literal
+from typing import Annotated, Dict, List, Literal, Optional
 
 import pydantic
+from annotated_types import Ge, Gt
+
+from models import WebsiteIdentifier
 
 if sys.version_info >= (3, 11):
     import tomllib
@@ -12,6 +16,10 @@ else:
 
 DEFAULT_CONFIG_LOCATION = pathlib.Path("config.toml")
 
+AUTHKEY_VARIABLE = "ASIA_JOBS_SCRAPER_AUTHKEY"
+"""The environment variable with the key of the coordinator,
+when it is not set in `config.toml`"""
+
 
 class ApplictionConfig(pydantic.BaseModel):
     """Contains configuration values for this application.
@@ -19,6 +27,34 @@ class ApplictionConfig(pydantic.BaseModel):
     """
 
     persistence: "Persistence"
+    scraping: "Scraping" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.Scraping()
+    )
+    selenium: "Selenium" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.Selenium()
+    )
+    probe: "Probe" = pydantic.Field(default_factory=lambda: ApplictionConfig.Probe())
+    strategies: "Strategies" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.Strategies()
+    )
+    work_queue: "WorkQueue" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.WorkQueue()
+    )
+    batching: "Batching" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.Batching()
+    )
+    profiling: "Profiling" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.Profiling()
+    )
+    schedule: "Schedule" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.Schedule()
+    )
+    query_server: "QueryServer" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.QueryServer()
+    )
+    logging: "Logging" = pydantic.Field(
+        default_factory=lambda: ApplictionConfig.Logging()
+    )
     log_level: (
         Literal["INFO"] | Literal["WARNING"] | Literal["DEBUG"] | Literal["ERROR"]
     )
@@ -26,7 +62,13 @@ class ApplictionConfig(pydantic.BaseModel):
     class Persistence(pydantic.BaseModel):
         """Persistence-related/database configuration"""
 
+        backend: Literal["sqlite"] | Literal["duckdb"] = "sqlite"
+        """Where the links and the details are stored. The work queue,
+        the coordinator and the spatial queries are only available with SQLite."""
         sqlite: "Sqlite"
+        duckdb: "DuckDb" = pydantic.Field(
+            default_factory=lambda: ApplictionConfig.Persistence.DuckDb()
+        )
 
         class Sqlite(pydantic.BaseModel):
             """The application's persistence is running on SQLite:
@@ -34,6 +76,181 @@ class ApplictionConfig(pydantic.BaseModel):
             """
 
             db_file_location: pathlib.Path
+            sharded: bool = False
+            """Store every website in its own database next to this one,
+            e.g. `jobs.careerviet.db`, so that the websites are written to
+            without waiting for each other"""
+
+        class DuckDb(pydantic.BaseModel):
+            """The columnar database for analytical queries"""
+
+            db_file_location: pathlib.Path = pathlib.Path("jobs.duckdb")
+
+    class Scraping(pydantic.BaseModel):
+        """Job details scraping configuration"""
+
+        fetch_workers: Annotated[int, Gt(0)] = 8
+        """Number of threads downloading the job pages"""
+        parse_workers: Annotated[int, Ge(0)] = pydantic.Field(
+            default_factory=lambda: os.cpu_count() or 1
+        )
+        """Number of processes parsing the downloaded pages
+        (0 parses them in the main process)"""
+        parse_chunksize: Annotated[int, Gt(0)] = 4
+        """Number of downloaded pages handed off to a parsing process at once"""
+        incremental_parse: bool = False
+        """Parse the pages while downloading them, in the downloading threads,
+        and stop downloading once all their fields have been parsed"""
+
+    class Batching(pydantic.BaseModel):
+        """Adaptive batch sizing: the `batch_size` passed to `links` and `details`
+        is the size of the first batch, and the next ones are sized to take
+        about `target_seconds` each, without the memory going over the ceiling
+        """
+
+        adaptive: bool = False
+        minimum: Annotated[int, Gt(0)] = 10
+        maximum: Annotated[int, Gt(0)] = 1000
+        target_seconds: Annotated[float, Gt(0)] = 30
+        """How long a batch should take, i.e. how often the results are saved"""
+        memory_ceiling_mb: Annotated[float, Gt(0)] = 2048
+        """The resident memory of the process the batches should stay under"""
+        max_error_rate: Annotated[float, Ge(0)] = 0.5
+        """The share of failed links in a batch above which the batches shrink"""
+        trace_memory: bool = False
+        """Measure the memory taken by each item with `tracemalloc`,
+        which is precise, but slows the scraping down"""
+
+    class Schedule(pydantic.BaseModel):
+        """The jobs run again and again by the `serve` daemon"""
+
+        jitter_seconds: Annotated[float, Ge(0)] = 60
+        """The largest random delay added to the interval of every job"""
+        jobs: List["Job"] = []
+
+        class Job(pydantic.BaseModel):
+            command: Literal["links"] | Literal["details"]
+            website: WebsiteIdentifier
+            every_minutes: Annotated[float, Gt(0)]
+            """How long after the start of a run the next one starts,
+            or right after it ends, if it took longer"""
+            batch_size: Annotated[int, Gt(0)] = 100
+            n_links: Annotated[int, Gt(0)] = 1000
+            """The number of links to go through, for the `links` command"""
+            strategy: Optional[str] = None
+            """The strategy to use instead of the one in `[strategies]`"""
+            budget_minutes: Optional[Annotated[float, Gt(0)]] = None
+            """How long a `details` run may go on, e.g. less than the interval"""
+
+    class QueryServer(pydantic.BaseModel):
+        """The local HTTP server reading the SQLite database for other programs"""
+
+        host: str = "127.0.0.1"
+        port: int = 8080
+        connections: Annotated[int, Gt(0)] = 4
+        """Number of read-only connections, i.e. of queries run at once"""
+        cache_size: Annotated[int, Ge(0)] = 1024
+        """Number of responses cached until the next write to the database"""
+        max_page_size: Annotated[int, Gt(0)] = 500
+
+    class Logging(pydantic.BaseModel):
+        """How the logs are written, next to the `log_level`"""
+
+        mode: Literal["rich"] | Literal["queue"] = "rich"
+        """Render the logs to the console in the threads that log them,
+        or only queue them there, and write them from a background thread,
+        which does not hold up the scraping"""
+        format: Literal["text"] | Literal["json"] = "text"
+        """The format of the logs written in the `queue` mode,
+        `json` writes one JSON object per line"""
+        file: Optional[pathlib.Path] = None
+        """Where the logs are written in the `queue` mode,
+        by default the standard error"""
+        max_per_second: Annotated[float, Ge(0)] = 20
+        """How many records of each message below `WARNING`, e.g. the one
+        logged for every link, are written per second (0 writes all of them)"""
+
+    class Profiling(pydantic.BaseModel):
+        """Profiling of the stages of the pipeline, switched on with `--profile`"""
+
+        mode: Literal["sampling"] | Literal["cprofile"] = "sampling"
+        """Sample the stacks of the profiled stages, which is cheap enough
+        for production runs, or also profile them with `cProfile`,
+        which is exact but slows them down"""
+        every_nth_batch: Annotated[int, Gt(0)] = 10
+        """Only every Nth batch is profiled"""
+        sample_interval_ms: Annotated[float, Gt(0)] = 5
+        output_dir: pathlib.Path = pathlib.Path("profiles")
+        """Every run writes its profiles into a new directory in this one"""
+
+    class Selenium(pydantic.BaseModel):
+        """Configuration of the browsers used by the Selenium strategies"""
+
+        pool_size: Annotated[int, Ge(0)] = 1
+        """Number of idle browsers kept warm between batches and runs"""
+        tabs: Annotated[int, Gt(0)] = 4
+        """Number of pages loaded at once in the tabs of every browser,
+        by the `selenium_tabs` strategies"""
+        tab_timeout_seconds: Annotated[float, Gt(0)] = 30
+        """How long a page loading in a tab may take before it is skipped"""
+
+    class Probe(pydantic.BaseModel):
+        """Configuration of the liveness probe, which drops the links
+        to expired job offers before their details are scraped
+        """
+
+        websites: List[WebsiteIdentifier] = []
+        """The websites whose links are probed"""
+        workers: Annotated[int, Gt(0)] = 32
+        """Number of links probed at once"""
+        method: Literal["head"] | Literal["range"] = "head"
+        """Probe with HEAD requests, or with GET requests of the first byte"""
+        timeout_seconds: Annotated[float, Gt(0)] = 10
+
+    class Strategies(pydantic.BaseModel):
+        """The strategy used for each website, by its name in `registry.py`.
+        Websites that are not listed are not crawled/scraped.
+        """
+
+        crawlers: Dict[WebsiteIdentifier, str] = {
+            WebsiteIdentifier.SARAMIN: "selenium_sequential",
+            WebsiteIdentifier.CAREERVIET: "selenium_sequential",
+        }
+        scrapers: Dict[WebsiteIdentifier, str] = {
+            WebsiteIdentifier.CAREERVIET: "requests_parallel",
+        }
+
+    class WorkQueue(pydantic.BaseModel):
+        """Configuration of the queue splitting the links between the workers
+        scraping the job details
+        """
+
+        lease_seconds: Annotated[float, Gt(0)] = 600
+        """How long a claimed link stays with a worker that stops sending
+        heartbeats, before other workers can claim it"""
+        retry_delay_seconds: Annotated[float, Ge(0)] = 3600
+        """Delay before retrying a link after its first transient failure,
+        doubled after every following failure"""
+        max_retry_delay_seconds: Annotated[float, Ge(0)] = 7 * 24 * 3600
+        """The longest delay before retrying a link"""
+        max_attempts: Annotated[int, Gt(0)] = 5
+        """Number of transient failures after which a link is given up on"""
+        coordinator: "Coordinator" = pydantic.Field(
+            default_factory=lambda: ApplictionConfig.WorkQueue.Coordinator()
+        )
+
+        class Coordinator(pydantic.BaseModel):
+            """The process sharing the queue and the database of one machine
+            with the workers on other machines
+            """
+
+            host: str = "127.0.0.1"
+            port: int = 50_000
+            authkey: Optional[str] = pydantic.Field(
+                default_factory=lambda: os.environ.get(AUTHKEY_VARIABLE)
+            )
+            """The secret shared by the coordinator and its workers, which
+            has to be set, e.g. in the `ASIA_JOBS_SCRAPER_AUTHKEY` variable"""
 
     @classmethod
     def load(
@@ -6,6 +6,8 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 
+import drivers
+from config import ApplictionConfig
 from crawlers.strategies.selenium_strategy import SequentialSeleniumLinkCrawlingStrategy
 from models import JobLink, WebsiteIdentifier
 
@@ -73,3 +75,9 @@ class CareervietSeleniumSequentialLinkCrawler(SequentialSeleniumLinkCrawlingStra
                     str(href),
                     CareervietSeleniumSequentialLinkCrawler.website,
                 )
+
+
+def init_careerviet_selenium_sequential_crawler(
+    config: ApplictionConfig,
+) -> CareervietSeleniumSequentialLinkCrawler:
+    return CareervietSeleniumSequentialLinkCrawler(drivers.shared_pool(config))
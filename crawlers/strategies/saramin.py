@@ -12,6 +12,8 @@ from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support import ui
 
+import drivers
+from config import ApplictionConfig
 from crawlers.strategies.selenium_strategy import SequentialSeleniumLinkCrawlingStrategy
 from models import JobLink, WebsiteIdentifier
 
@@ -130,3 +132,9 @@ class SaraminSeleniumSequentialLinkCrawler(SequentialSeleniumLinkCrawlingStrateg
                     str(href),
                     SaraminSeleniumSequentialLinkCrawler.website,
                 )
+
+
+def init_saramin_selenium_sequential_crawler(
+    config: ApplictionConfig,
+) -> SaraminSeleniumSequentialLinkCrawler:
+    return SaraminSeleniumSequentialLinkCrawler(drivers.shared_pool(config))
@@ -2,10 +2,8 @@ import logging
 from itertools import batched, islice
 from typing import (
     Annotated,
-    Callable,
     ClassVar,
     Generator,
-    List,
     Protocol,
     Tuple,
     runtime_checkable,
@@ -13,9 +11,10 @@ from typing import (
 
 from annotated_types import Gt
 from selenium import webdriver
-from selenium.webdriver.common.options import BaseOptions
 
+import profiling
 from crawlers.strategy import LinkCrawlingStrategy
+from drivers import DriverPool
 from models import JobLink
 
 
@@ -33,14 +32,10 @@ class SequentialSeleniumLinkCrawlingStrategy(LinkCrawlingStrategy, Protocol):
     """
 
     __name__: ClassVar[str]
-    init_driver: Callable
+    driver_pool: DriverPool
 
-    def __init__(
-        self,
-        driver_type: type[webdriver.Remote],
-        driver_options: BaseOptions | List[BaseOptions] | None,
-    ):
-        self.init_driver = lambda: driver_type(options=driver_options)
+    def __init__(self, driver_pool: DriverPool):
+        self.driver_pool = driver_pool
 
     def __call__(
         self,
@@ -48,12 +43,16 @@ class SequentialSeleniumLinkCrawlingStrategy(LinkCrawlingStrategy, Protocol):
         batch_size: Annotated[int, Gt(0)],
         n_links_to_read: Annotated[int, Gt(0)],
     ) -> Generator[Tuple[JobLink, ...], None, None]:
-        with self.init_driver() as driver:
+        with self.driver_pool.acquire() as driver:
             links: islice[JobLink] = islice(
                 (
                     link
-                    for _ in self.iterate_pages(driver)
-                    for link in self.iterate_links(driver)
+                    for _ in profiling.iterate(
+                        profiling.PAGE_ITERATION, self.iterate_pages(driver)
+                    )
+                    for link in profiling.iterate(
+                        profiling.LINK_EXTRACTION, self.iterate_links(driver)
+                    )
                 ),
                 n_links_to_read,
             )
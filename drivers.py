@@ -0,0 +1,201 @@
+import atexit
+import contextlib
+import logging
+import threading
+import time
+import typing
+from typing import Dict, Generator, List, Sequence, Tuple
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver import Firefox, FirefoxOptions, Remote
+from selenium.webdriver.common.options import ArgOptions, BaseOptions
+
+if typing.TYPE_CHECKING:
+    from config import ApplictionConfig
+
+
+def headless_firefox() -> Tuple[type[Remote], ArgOptions]:
+    """The driver type and options used by all Selenium strategies"""
+    options = FirefoxOptions()
+    options.add_argument("--headless")
+    return Firefox, options
+
+
+class DriverPool:
+    """Keeps warm browsers alive between batches, crawls and scrapes,
+    so that the browser start-up is paid once per process rather than
+    once per batch.
+
+    A driver is reset (cookies, storage, extra windows) when it is
+    returned to the pool, and health-checked before it is handed out again;
+    drivers that fail either step are quit and replaced with new ones.
+    """
+
+    def __init__(
+        self,
+        driver_type: type[Remote],
+        driver_options: BaseOptions | List[BaseOptions] | None,
+        max_idle: int = 1,
+    ) -> None:
+        self.driver_type = driver_type
+        self.driver_options = driver_options
+        self.max_idle = max_idle
+        self._idle: List[Remote] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "DriverPool":
+        return self
+
+    def __exit__(self, *_: object) -> typing.Literal[False]:
+        self.close()
+        return False
+
+    @contextlib.contextmanager
+    def acquire(self) -> Generator[Remote, None, None]:
+        driver = self._take()
+        try:
+            yield driver
+        finally:
+            self._give_back(driver)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            _quit(driver)
+
+    def _take(self) -> Remote:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                driver = self._idle.pop()
+            if _is_healthy(driver):
+                return driver
+            logging.warning("Replacing an unresponsive browser")
+            _quit(driver)
+
+        logging.info("Starting a new %s browser", self.driver_type.__name__)
+        return self.driver_type(options=self.driver_options)
+
+    def _give_back(self, driver: Remote) -> None:
+        try:
+            _reset(driver)
+        except WebDriverException as e:
+            logging.warning("Could not reset the browser, quitting it: %s", e)
+            _quit(driver)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(driver)
+                return
+        _quit(driver)
+
+
+def load_in_tabs(
+    driver: Remote,
+    urls: Sequence[str],
+    n_tabs: int,
+    timeout_seconds: float = 30,
+    poll_seconds: float = 0.05,
+) -> Generator[Tuple[int, bool], None, None]:
+    """Loads the pages in up to `n_tabs` tabs of the browser at once, so that
+    the browser is not idle while a page waits on the network.
+
+    The navigations are started without waiting for them. The index of every
+    page is yielded as soon as its tab has finished loading it, with the driver
+    switched to that tab, so that the page can be read before the tab is
+    reused for the next page. Pages that do not load within the timeout are
+    stopped, and yielded with `False`.
+    """
+    pending = iter(enumerate(urls))
+    # the index of the page loading in every tab, and when it was started
+    loading: Dict[str, Tuple[int, float]] = {}
+
+    def start(handle: str) -> None:
+        if (page := next(pending, None)) is None:
+            return
+        index, url = page
+        driver.switch_to.window(handle)
+        # the marker is gone once the next page has replaced this one
+        driver.execute_script(
+            "window.__loadingNext = true; window.location.href = arguments[0];",
+            url,
+        )
+        loading[handle] = (index, time.monotonic())
+
+    while len(driver.window_handles) < min(n_tabs, len(urls)):
+        driver.switch_to.new_window("tab")
+    for handle in driver.window_handles[:n_tabs]:
+        start(handle)
+
+    while loading:
+        any_loaded = False
+        for handle, (index, started) in list(loading.items()):
+            driver.switch_to.window(handle)
+            try:
+                loaded = driver.execute_script(
+                    "return window.__loadingNext === undefined"
+                    " && document.readyState === 'complete';"
+                )
+            except WebDriverException:
+                # the page was being replaced while the script ran
+                loaded = False
+            if not loaded and time.monotonic() - started < timeout_seconds:
+                continue
+            if not loaded:
+                driver.execute_script("window.stop();")
+            del loading[handle]
+            any_loaded = True
+            yield index, bool(loaded)
+            start(handle)
+        if not any_loaded:
+            time.sleep(poll_seconds)
+
+
+def _reset(driver: Remote) -> None:
+    """Brings the driver back to a clean state, as if it was just started"""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+    driver.delete_all_cookies()
+    # the storage is per-origin, so it has to be cleared before leaving the page
+    driver.execute_script(
+        "try { window.localStorage.clear(); window.sessionStorage.clear(); }"
+        " catch (e) {}"
+    )
+    driver.get("about:blank")
+
+
+def _is_healthy(driver: Remote) -> bool:
+    try:
+        return driver.execute_script("return 1") == 1
+    except WebDriverException:
+        return False
+
+
+def _quit(driver: Remote) -> None:
+    try:
+        driver.quit()
+    except WebDriverException as e:
+        logging.warning("Could not quit the browser: %s", e)
+
+
+_shared_pool: DriverPool | None = None
+
+
+def shared_pool(config: "ApplictionConfig") -> DriverPool:
+    """The pool of headless browsers shared by all Selenium strategies
+    of the process. The browsers are quit when the process exits.
+    """
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = DriverPool(
+            *headless_firefox(), max_idle=config.selenium.pool_size
+        )
+        atexit.register(_shared_pool.close)
+    return _shared_pool
@@ -0,0 +1,147 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import typing
+
+if typing.TYPE_CHECKING:
+    from config import ApplictionConfig
+
+# the attributes of every record, which are not extra fields
+RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime", "suppressed"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON, with the fields passed
+    in `extra` next to the standard ones
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line: typing.Dict[str, typing.Any] = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, datetime.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if suppressed := getattr(record, "suppressed", 0):
+            line["suppressed"] = suppressed
+        if record.exc_info:
+            line["exception"] = self.formatException(record.exc_info)
+        line.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        return json.dumps(line, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most `max_per_second` records of each message below
+    `WARNING`, e.g. one per scraped link, and counts the dropped ones
+    into the `suppressed` attribute of the next record let through
+    """
+
+    def __init__(self, max_per_second: float) -> None:
+        super().__init__()
+        self.interval = 1 / max_per_second
+        self.lock = threading.Lock()
+        # the time the next record of a message is let through,
+        # and the number of its records dropped since the last one
+        self.messages: typing.Dict[typing.Tuple[str, int], typing.List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            state = self.messages.setdefault(key, [0.0, 0])
+            if now < state[0]:
+                state[1] += 1
+                return False
+            record.suppressed = int(state[1])
+            self.messages[key] = [now + self.interval, 0]
+        return True
+
+
+class SuppressedCountFormatter(logging.Formatter):
+    """Appends the number of similar records dropped by the rate limit"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        formatted = super().format(record)
+        if suppressed := getattr(record, "suppressed", 0):
+            formatted += f" ({suppressed} similar messages suppressed)"
+        return formatted
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues the records as they are, so that the messages are formatted
+    by the listener thread instead of the logging one. The queue stays in
+    the process, so the records do not have to be pickled.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure(config: "ApplictionConfig") -> None:
+    """Sets the handlers of the root logger up, as configured.
+
+    By default, the records are rendered to the console by `rich`, in the
+    thread that logs them. With the `queue` mode, the threads only put the
+    records into a queue, and a listener thread formats and writes them,
+    as text or as JSON lines.
+    """
+    settings = config.logging
+    output: logging.Handler
+    if settings.mode == "rich":
+        # rich is only needed once the application runs, not on import
+        from rich.logging import RichHandler
+
+        output = RichHandler(rich_tracebacks=True)
+        output.setFormatter(
+            SuppressedCountFormatter(
+                "%(name)s - %(levelname)s - %(message)s", datefmt="[%X]"
+            )
+        )
+    else:
+        output = (
+            logging.FileHandler(settings.file, encoding="utf-8")
+            if settings.file is not None
+            else logging.StreamHandler(sys.stderr)
+        )
+        output.setFormatter(
+            JsonFormatter()
+            if settings.format == "json"
+            else SuppressedCountFormatter(
+                "%(asctime)s %(name)s - %(levelname)s - %(message)s"
+            )
+        )
+
+    handler = output if settings.mode == "rich" else _start_listener(output)
+    if settings.max_per_second > 0:
+        handler.addFilter(RateLimitFilter(settings.max_per_second))
+    logging.basicConfig(level=config.log_level, handlers=[handler], force=True)
+
+
+def _start_listener(output: logging.Handler) -> logging.Handler:
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        records, output, respect_handler_level=True
+    )
+    listener.start()
+    # writes the records still in the queue
+    atexit.register(listener.stop)
+
+    return _DeferredQueueHandler(records)
@@ -1,7 +1,8 @@
 import dataclasses
 import enum
-from datetime import datetime, timezone
-from typing import Optional
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Sequence, Tuple
 
 
 class WebsiteIdentifier(enum.Enum):
@@ -9,15 +10,56 @@ class WebsiteIdentifier(enum.Enum):
     CAREERVIET = "careerviet"
 
 
-@dataclasses.dataclass
+WEBSITE_IDENTIFIERS: Dict[str, WebsiteIdentifier] = {
+    website_identifier.value: website_identifier
+    for website_identifier in WebsiteIdentifier
+}
+"""The websites by their stored values, a faster lookup than `WebsiteIdentifier(...)`
+for every row read"""
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def now() -> int:
+    """The current time, in microseconds since the epoch"""
+    return time.time_ns() // 1000
+
+
+def format_timestamp(timestamp: int) -> str:
+    """The ISO 8601 form of a timestamp in microseconds, in the local timezone,
+    as it is stored and shown
+    """
+    return (EPOCH + timestamp * ONE_MICROSECOND).astimezone().isoformat()
+
+
+def parse_timestamp(timestamp: str) -> int:
+    """The timestamp in microseconds of its ISO 8601 form"""
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    # the integer arithmetic keeps the microseconds exact
+    return (moment - EPOCH) // ONE_MICROSECOND
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class JobLink:
     id: str
     title: str
     link: str
     website_identifier: WebsiteIdentifier
 
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[str]]) -> Tuple["JobLink", ...]:
+        """Builds the links of `(id, title, link, website_identifier)` rows"""
+        return tuple(
+            cls(id_, title, link, WEBSITE_IDENTIFIERS[website])
+            for id_, title, link, website in rows
+        )
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class JobDetails:
     id: str
     title: str
@@ -25,6 +67,19 @@ class JobDetails:
     location: Optional[str]
     salary_information: Optional[str]
     description: str
-    access_date: str = dataclasses.field(
-        default_factory=lambda: datetime.now(timezone.utc).astimezone().isoformat()
-    )
+    access_date: int = dataclasses.field(default_factory=now)
+    """When the details were scraped, in microseconds since the epoch,
+    see `format_timestamp`"""
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ScrapingFailure:
+    """A job link whose details could not be scraped.
+    Permanent failures, like expired job offers, are never retried.
+    """
+
+    id: str
+    reason: str
+    permanent: bool
@@ -0,0 +1,33 @@
+import re
+import unicodedata
+
+# the legal forms written around the names, e.g. "Công ty TNHH X" or "(주)X";
+# the longer forms come first, so that they are removed whole
+LEGAL_FORMS = re.compile(
+    r"""
+    \b(?:
+        công\s+ty\s+(?:cổ\s+phần|tnhh|trách\s+nhiệm\s+hữu\s+hạn)
+        (?:\s+(?:mtv|một\s+thành\s+viên|\d+\s+thành\s+viên))?
+        |công\s+ty|ctcp|cty|tnhh(?:\s+mtv)?|tập\s+đoàn
+        |co\.?,?\s*ltd\.?|company\s+limited|corporation|corp\.?|ltd\.?
+        |jsc|inc\.?|llc|limited
+    )(?!\w)
+    |주식회사|유한회사|\(\s*(?:주|유)\s*\)|㈜
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+PUNCTUATION = re.compile(r"[^\w&+]+")
+
+
+def normalize_company(name: str) -> str:
+    """The key that the variants of a company's name have in common, e.g. `x`
+    for "Công ty TNHH X", "CÔNG TY TNHH X " and "X Co., Ltd", and `삼성전자`
+    for "(주)삼성전자" and "삼성전자 주식회사": the lowercase name, without
+    its legal form, punctuation, or repeated spaces. A name that is only
+    a legal form is kept as it is.
+    """
+    # the composed forms, so that the accents of Vietnamese names are matched
+    composed = unicodedata.normalize("NFKC", name).casefold()
+    key = PUNCTUATION.sub(" ", LEGAL_FORMS.sub(" ", composed)).strip()
+    return key or PUNCTUATION.sub(" ", composed).strip()
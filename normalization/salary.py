@@ -0,0 +1,131 @@
+import re
+import typing
+
+VERSION = 2
+"""Stored with the normalized salaries; bumping it makes the backfill
+normalize all the salaries again with the updated rules"""
+
+Period = typing.Literal["hour", "day", "week", "month", "year"]
+
+
+class Salary(typing.NamedTuple):
+    """The salary information of a job offer, as amounts of a currency.
+    All fields are `None` for salaries that are negotiable or not stated.
+    """
+
+    min_amount: float | None
+    max_amount: float | None
+    currency: str | None
+    period: Period | None
+
+
+UNKNOWN = Salary(None, None, None, None)
+
+# the multiplier and the currency written with an amount, e.g. "15 Tr", "300만원"
+UNITS: typing.Dict[str, typing.Tuple[float, str | None]] = {
+    "tr": (1e6, "VND"),
+    "triệu": (1e6, "VND"),
+    "tỷ": (1e9, "VND"),
+    "k": (1e3, None),
+    "천": (1e3, "KRW"),
+    "만": (1e4, "KRW"),
+    "억": (1e8, "KRW"),
+}
+
+CURRENCIES: typing.Tuple[typing.Tuple[re.Pattern[str], str], ...] = (
+    (re.compile(r"vn[dđ]|₫|\bđồng\b|\d\s*đ\b", re.IGNORECASE), "VND"),
+    (re.compile(r"usd|\$", re.IGNORECASE), "USD"),
+    (re.compile(r"원|krw|₩", re.IGNORECASE), "KRW"),
+)
+
+PERIODS: typing.Tuple[typing.Tuple[re.Pattern[str], Period], ...] = (
+    (re.compile(r"시급|/\s*(?:giờ|hour|h)\b|per hour", re.IGNORECASE), "hour"),
+    (re.compile(r"일급|/\s*(?:ngày|day)\b|per day", re.IGNORECASE), "day"),
+    (re.compile(r"주급|/\s*(?:tuần|week)\b|per week", re.IGNORECASE), "week"),
+    (
+        re.compile(r"월급|월\s*\d|/\s*(?:tháng|month)\b|per month", re.IGNORECASE),
+        "month",
+    ),
+    (re.compile(r"연봉|/\s*(?:năm|year)\b|per year", re.IGNORECASE), "year"),
+)
+
+# the salaries of these currencies are quoted per month unless stated otherwise
+DEFAULT_PERIODS: typing.Dict[str, Period] = {"VND": "month"}
+
+AT_LEAST = re.compile(r"trên|từ|tối thiểu|이상|over|from|at least|\+", re.IGNORECASE)
+AT_MOST = re.compile(r"lên đến|tới|đến|tối đa|이하|까지|up\s*to|max", re.IGNORECASE)
+
+# the Latin units are not the start of a word, like the "k" of "KRW" or the "tr"
+# of "trên", while the Korean ones are followed by the currency, e.g. "만원"
+AMOUNT = re.compile(
+    r"(?P<number>\d+(?:[.,]\d+)*)\s*"
+    r"(?P<unit>(?:triệu|tr|tỷ|k)(?![^\W\d_])|천|만|억)?",
+    re.IGNORECASE,
+)
+
+
+def normalize_salary(salary_information: str | None) -> Salary:
+    """Turns the salary information of a job offer, as written on any of the
+    websites, into amounts, e.g. "Lương: 10 Tr - 15 Tr VND" into
+    `Salary(10_000_000, 15_000_000, "VND", "month")`
+    and "연봉 3,000~4,000만원" into `Salary(30_000_000, 40_000_000, "KRW", "year")`.
+    Salaries without amounts, like "Thỏa thuận" or "회사내규에 따름", are unknown.
+    """
+    if not salary_information:
+        return UNKNOWN
+
+    amounts: typing.List[typing.Tuple[float, str | None]] = []
+    currency: str | None = None
+    previous_end = -1
+    for match in AMOUNT.finditer(salary_information):
+        start, end = match.span()
+        number = _parse_number(match["number"])
+        multiplier, unit_currency = UNITS.get((match["unit"] or "").lower(), (1, None))
+        currency = currency or unit_currency
+        # "1억 2,000만원" is a single amount
+        if (
+            amounts
+            and amounts[-1][1] == "억"
+            and match["unit"] in ("천", "만")
+            and not salary_information[previous_end:start].strip()
+        ):
+            amounts[-1] = (amounts[-1][0] + number * multiplier, "억")
+        else:
+            amounts.append((number * multiplier, match["unit"]))
+        previous_end = end
+    if not amounts:
+        return UNKNOWN
+
+    # in "10 - 15 Tr" or "3,000~4,000만원" the unit of the maximum applies to both
+    if len(amounts) >= 2 and amounts[0][1] is None and amounts[1][1] is not None:
+        multiplier = UNITS[amounts[1][1].lower()][0]
+        amounts[0] = (amounts[0][0] * multiplier, amounts[1][1])
+
+    currency = next(
+        (name for pattern, name in CURRENCIES if pattern.search(salary_information)),
+        currency,
+    )
+    period = next(
+        (name for pattern, name in PERIODS if pattern.search(salary_information)),
+        DEFAULT_PERIODS.get(currency) if currency is not None else None,
+    )
+
+    if len(amounts) >= 2:
+        low, high = sorted((amounts[0][0], amounts[1][0]))
+        return Salary(low, high, currency, period)
+    amount = amounts[0][0]
+    if AT_LEAST.search(salary_information):
+        return Salary(amount, None, currency, period)
+    if AT_MOST.search(salary_information):
+        return Salary(None, amount, currency, period)
+    return Salary(amount, amount, currency, period)
+
+
+def _parse_number(number: str) -> float:
+    """Reads both "1,500.5" and "1.500,5"; a separator followed by
+    exactly three digits separates the thousands
+    """
+    *groups, last = re.split(r"[.,]", number)
+    if len(last) == 3 or not groups:
+        return float("".join(groups) + last)
+    return float("".join(groups) + "." + last)
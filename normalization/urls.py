@@ -0,0 +1,74 @@
+import typing
+import urllib.parse
+
+from models import WebsiteIdentifier
+
+# the parameters added by ads and newsletters, which never change the page
+TRACKING_PARAMETERS = frozenset({"fbclid", "gclid", "msclkid", "ref", "source"})
+TRACKING_PREFIXES = ("utm_",)
+
+SARAMIN_VIEW_PATH = "/zf_user/jobs/view"
+# the pages showing a single job offer, e.g. from the lists or the searches
+SARAMIN_VIEW_PATHS = frozenset({SARAMIN_VIEW_PATH, "/zf_user/jobs/relay/view"})
+
+
+def canonical_url(url: str, website_identifier: WebsiteIdentifier) -> str:
+    """The one URL of a job offer linked with different parameters,
+    or from different lists, e.g. for
+
+    - Saramin, `https://www.saramin.co.kr/zf_user/jobs/view?rec_idx=123` for
+      `.../jobs/relay/view?view_type=list&rec_idx=123&location=ts&searchword=...`
+    - Careerviet, the URL without its query, e.g. `?src=search&utm_source=...`
+
+    and, for any website, the URL without its fragment, tracking parameters,
+    default port, and with a lowercase scheme and host
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port is not None and (scheme, parts.port) not in (
+        ("http", 80),
+        ("https", 443),
+    ):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = _QUERIES[website_identifier](
+        path, urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    )
+    if website_identifier is WebsiteIdentifier.SARAMIN and path in SARAMIN_VIEW_PATHS:
+        path = SARAMIN_VIEW_PATH
+    return urllib.parse.urlunsplit(
+        (scheme, host, path, urllib.parse.urlencode(query), "")
+    )
+
+
+Parameters = typing.List[typing.Tuple[str, str]]
+
+
+def _without_tracking(path: str, parameters: Parameters) -> Parameters:
+    return sorted(
+        (name, value)
+        for name, value in parameters
+        if name.lower() not in TRACKING_PARAMETERS
+        and not name.lower().startswith(TRACKING_PREFIXES)
+    )
+
+
+def _saramin_query(path: str, parameters: Parameters) -> Parameters:
+    # the other parameters of a job offer only describe where it was listed
+    if path in SARAMIN_VIEW_PATHS:
+        return [(name, value) for name, value in parameters if name == "rec_idx"][:1]
+    return _without_tracking(path, parameters)
+
+
+def _careerviet_query(path: str, parameters: Parameters) -> Parameters:
+    # the job offers are identified by their paths, e.g. `/vi/.../35C1A2B3.html`
+    return []
+
+
+_QUERIES: typing.Dict[
+    WebsiteIdentifier, typing.Callable[[str, Parameters], Parameters]
+] = {
+    WebsiteIdentifier.SARAMIN: _saramin_query,
+    WebsiteIdentifier.CAREERVIET: _careerviet_query,
+}
@@ -2,7 +2,7 @@ import typing
 
 from annotated_types import Ge
 
-from models import JobDetails, JobLink, WebsiteIdentifier
+from models import JobDetails, JobLink, ScrapingFailure, WebsiteIdentifier
 
 
 class JobLinkRepository(typing.Protocol):
@@ -20,3 +20,40 @@ class JobLinkRepository(typing.Protocol):
 
 class JobDetailsRepository(typing.Protocol):
     def save_batch(self, job_details_batch: typing.Tuple[JobDetails, ...]) -> None: ...
+
+
+class WorkQueue(typing.Protocol):
+    """Hands out the saved job links to the workers scraping their details,
+    so that several workers can split the links without scraping any twice.
+
+    A claimed link is leased to the worker until the lease expires, after which
+    it can be claimed by another worker, unless the worker has kept the lease
+    alive with heartbeats, or has completed or released the link.
+
+    Failed links are never handed out again if the failure is permanent,
+    and only after a growing delay otherwise.
+    """
+
+    def enqueue(self, website_identifier: WebsiteIdentifier) -> int: ...
+
+    def requeue_done(self, website_identifier: WebsiteIdentifier) -> int: ...
+
+    def claim(
+        self,
+        website_identifier: WebsiteIdentifier,
+        worker_id: str,
+        batch_size: typing.Annotated[int, Ge(0)],
+        lease_seconds: float,
+    ) -> typing.Tuple[JobLink, ...]: ...
+
+    def heartbeat(self, worker_id: str, lease_seconds: float) -> int: ...
+
+    def complete(self, worker_id: str, ids: typing.Tuple[str, ...]) -> int: ...
+
+    def release(self, worker_id: str, ids: typing.Tuple[str, ...]) -> int: ...
+
+    def fail(
+        self, worker_id: str, failures: typing.Tuple[ScrapingFailure, ...]
+    ) -> int: ...
+
+    def reclaim_expired(self) -> int: ...
@@ -0,0 +1,55 @@
+import logging
+import typing
+from multiprocessing.managers import BaseManager
+
+from persistence import JobDetailsRepository, WorkQueue
+
+Address = typing.Tuple[str, int]
+
+
+class _CoordinatorServer(BaseManager):
+    pass
+
+
+class _CoordinatorClient(BaseManager):
+    pass
+
+
+_CoordinatorClient.register("work_queue")
+_CoordinatorClient.register("details_repository")
+
+
+def serve(
+    work_queue: WorkQueue,
+    details_repository: JobDetailsRepository,
+    address: Address,
+    authkey: bytes,
+) -> None:
+    """Shares the work queue and the details repository of this machine's
+    database with the workers on other machines, until interrupted.
+
+    Every worker connection is served in its own thread, so the queue
+    and the repository have to be safe to call from several threads.
+    """
+    _CoordinatorServer.register("work_queue", callable=lambda: work_queue)
+    _CoordinatorServer.register(
+        "details_repository", callable=lambda: details_repository
+    )
+    server = _CoordinatorServer(address=address, authkey=authkey).get_server()
+    logging.info("Coordinating the workers at %s:%i", *address)
+    server.serve_forever()
+
+
+def connect(
+    address: Address, authkey: bytes
+) -> typing.Tuple[WorkQueue, JobDetailsRepository]:
+    """Returns proxies of the work queue and the details repository
+    shared by the coordinator at `address`
+    """
+    manager = _CoordinatorClient(address=address, authkey=authkey)
+    manager.connect()
+    logging.info("Connected to the coordinator at %s:%i", *address)
+    return (
+        typing.cast(WorkQueue, getattr(manager, "work_queue")()),
+        typing.cast(JobDetailsRepository, getattr(manager, "details_repository")()),
+    )
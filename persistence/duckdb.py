@@ -0,0 +1,581 @@
+import logging
+import pathlib
+import sqlite3
+import time
+import typing
+from types import TracebackType
+
+import duckdb
+import pyarrow as pa
+from annotated_types import Ge
+
+from models import (
+    JobDetails,
+    JobLink,
+    ScrapingFailure,
+    WebsiteIdentifier,
+    format_timestamp,
+)
+from normalization import salary
+from persistence import JobDetailsRepository, JobLinkRepository
+from persistence.sqlite import (
+    SqliteJobDetailsRepository,
+    SqliteJobLinkQueue,
+    SqliteJobLinkRepository,
+    _hash_content,
+    content_diff,
+    content_hash,
+)
+
+LINKS_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("link", pa.string()),
+        ("website_identifier", pa.string()),
+    ]
+)
+
+DETAILS_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("company", pa.string()),
+        ("location", pa.string()),
+        ("salary_information", pa.string()),
+        ("description", pa.string()),
+        ("access_date", pa.string()),
+        ("content_hash", pa.string()),
+        ("salary_min", pa.float64()),
+        ("salary_max", pa.float64()),
+        ("salary_currency", pa.string()),
+        ("salary_period", pa.string()),
+        ("salary_version", pa.int32()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+    ]
+)
+
+HISTORY_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("changed_at", pa.string()),
+        ("previous_hash", pa.string()),
+        ("content_hash", pa.string()),
+        ("diff", pa.string()),
+    ]
+)
+
+FAILURES_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("reason", pa.string()),
+        ("permanent", pa.bool_()),
+    ]
+)
+
+
+class DuckDbJobLinkRepository(JobLinkRepository):
+    """Stores the links in a DuckDB file, which is columnar,
+    so that the analytical queries scan only the columns they use.
+
+    A DuckDB file can be opened for writing by one process at a time.
+    """
+
+    LINKS_TABLE_NAME = "job_links"
+
+    def __init__(self, db_file_location: pathlib.Path) -> None:
+        self.connection = duckdb.connect(str(db_file_location))
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DuckDbJobLinkRepository.LINKS_TABLE_NAME} (
+                id VARCHAR PRIMARY KEY,
+                title VARCHAR NOT NULL,
+                link VARCHAR NOT NULL,
+                website_identifier VARCHAR NOT NULL
+            )
+            """)
+
+    def __enter__(self) -> "DuckDbJobLinkRepository":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> typing.Literal[False]:
+        self.connection.close()
+        return False
+
+    def save_batch(self, job_link_batch: typing.Tuple[JobLink, ...]) -> None:
+        logging.info("Saving %i job links", len(job_link_batch))
+        n_saved = append(
+            self.connection,
+            DuckDbJobLinkRepository.LINKS_TABLE_NAME,
+            pa.Table.from_pylist(
+                [
+                    {
+                        "id": job_link.id,
+                        "title": job_link.title,
+                        "link": job_link.link,
+                        "website_identifier": job_link.website_identifier.value,
+                    }
+                    for job_link in job_link_batch
+                ],
+                schema=LINKS_SCHEMA,
+            ),
+            "INSERT OR IGNORE",
+        )
+        logging.info(
+            "Saved %i new job links (%i duplicates)",
+            n_saved,
+            len(job_link_batch) - n_saved,
+        )
+
+    def get_batch(
+        self,
+        website_identifier: WebsiteIdentifier,
+        batch_size: typing.Annotated[int, Ge(0)],
+        offset: typing.Annotated[int, Ge(0)],
+    ) -> typing.Tuple[JobLink, ...]:
+        rows = self.connection.execute(
+            f"""SELECT id, title, link, website_identifier
+            FROM {DuckDbJobLinkRepository.LINKS_TABLE_NAME}
+            WHERE website_identifier = ?
+            ORDER BY id
+            LIMIT ? OFFSET ?""",
+            (website_identifier.value, batch_size, offset),
+        ).fetchall()
+        return JobLink.from_rows(rows)
+
+    def count(self, website_identifier: WebsiteIdentifier) -> int:
+        row = self.connection.execute(
+            f"""SELECT COUNT(*) FROM {DuckDbJobLinkRepository.LINKS_TABLE_NAME}
+            WHERE website_identifier = ?""",
+            (website_identifier.value,),
+        ).fetchone()
+        return int(row[0]) if row is not None else 0
+
+
+class DuckDbJobDetailsRepository(JobDetailsRepository):
+    """Stores the details in a DuckDB file, like `SqliteJobDetailsRepository`
+    does in SQLite: unchanged details are not written again, and the changes
+    are recorded in the history table.
+
+    The links that failed are recorded like `SqliteJobLinkQueue` does, and
+    are left out of `unscraped` once given up on, or until they are retried.
+    """
+
+    DETAILS_TABLE_NAME = "job_details"
+    HISTORY_TABLE_NAME = "job_details_history"
+    STATUS_TABLE_NAME = SqliteJobLinkQueue.STATUS_TABLE_NAME
+
+    def __init__(
+        self,
+        db_file_location: pathlib.Path,
+        retry_delay_seconds: float = 3600,
+        max_retry_delay_seconds: float = 7 * 24 * 3600,
+        max_attempts: int = 5,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        db_file_location : pathlib.Path
+            The database with the job details
+        retry_delay_seconds : float
+            The delay before a link is retried after its first transient failure.
+            The delay doubles after every following failure.
+        max_retry_delay_seconds : float
+            The longest delay before a link is retried
+        max_attempts : int
+            The number of transient failures after which a link is given up on
+        """
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self.max_attempts = max_attempts
+        self.connection = duckdb.connect(str(db_file_location))
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DuckDbJobDetailsRepository.DETAILS_TABLE_NAME} (
+                id VARCHAR PRIMARY KEY,
+                title VARCHAR NOT NULL,
+                company VARCHAR NOT NULL,
+                location VARCHAR,
+                salary_information VARCHAR,
+                description VARCHAR NOT NULL,
+                access_date TIMESTAMPTZ NOT NULL,
+                content_hash VARCHAR NOT NULL,
+                salary_min DOUBLE,
+                salary_max DOUBLE,
+                salary_currency VARCHAR,
+                salary_period VARCHAR,
+                salary_version INTEGER,
+                latitude DOUBLE,
+                longitude DOUBLE
+            )
+            """)
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DuckDbJobDetailsRepository.HISTORY_TABLE_NAME} (
+                id VARCHAR NOT NULL,
+                changed_at TIMESTAMPTZ NOT NULL,
+                previous_hash VARCHAR NOT NULL,
+                content_hash VARCHAR NOT NULL,
+                diff VARCHAR NOT NULL
+            )
+            """)
+        # 'expired' and 'failed' links are tombstones, 'retry' links wait
+        # until `next_retry_at`
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DuckDbJobDetailsRepository.STATUS_TABLE_NAME} (
+                id VARCHAR PRIMARY KEY,
+                status VARCHAR NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_retry_at DOUBLE,
+                last_error VARCHAR,
+                updated_at DOUBLE NOT NULL
+            )
+            """)
+
+    def __enter__(self) -> "DuckDbJobDetailsRepository":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> typing.Literal[False]:
+        self.connection.close()
+        return False
+
+    def save_batch(self, job_details_batch: typing.Tuple[JobDetails, ...]) -> None:
+        """Appends the new and the changed details in one Arrow batch,
+        and their changes in another
+        """
+        logging.info("Saving %i job details", len(job_details_batch))
+        fields = SqliteJobDetailsRepository.CONTENT_FIELDS
+        # the last details of a job in the batch win, like they would when upserted
+        hashed = {
+            job_details.id: (job_details, content_hash(job_details))
+            for job_details in job_details_batch
+        }
+
+        batch_ids = pa.table({"id": pa.array(list(hashed), pa.string())})
+        self.connection.register("batch_ids", batch_ids)
+        try:
+            stored = {
+                id_: (previous_hash, dict(zip(fields, previous_values)))
+                for id_, previous_hash, *previous_values in self.connection.execute(
+                    f"""SELECT id, content_hash, {", ".join(fields)}
+                    FROM {DuckDbJobDetailsRepository.DETAILS_TABLE_NAME}
+                    WHERE id IN (SELECT id FROM batch_ids)"""
+                ).fetchall()
+            }
+        finally:
+            self.connection.unregister("batch_ids")
+
+        # compared by content, as the stored hash may be one of fewer fields
+        changed = {
+            id_: (job_details, hash_)
+            for id_, (job_details, hash_) in hashed.items()
+            if id_ not in stored or _hash_content(stored[id_][1]) != hash_
+        }
+        history = [
+            {
+                "id": id_,
+                "changed_at": format_timestamp(job_details.access_date),
+                "previous_hash": stored[id_][0],
+                "content_hash": hash_,
+                "diff": content_diff(stored[id_][1], job_details),
+            }
+            for id_, (job_details, hash_) in changed.items()
+            if id_ in stored
+        ]
+
+        self.connection.begin()
+        try:
+            append(
+                self.connection,
+                DuckDbJobDetailsRepository.DETAILS_TABLE_NAME,
+                details_table(
+                    (job_details, hash_) for job_details, hash_ in changed.values()
+                ),
+                "INSERT OR REPLACE",
+            )
+            append(
+                self.connection,
+                DuckDbJobDetailsRepository.HISTORY_TABLE_NAME,
+                pa.Table.from_pylist(history, schema=HISTORY_SCHEMA),
+            )
+            # the links waiting for a retry have now been scraped
+            self.connection.register("batch_ids", batch_ids)
+            try:
+                self.connection.execute(
+                    f"""DELETE FROM {DuckDbJobDetailsRepository.STATUS_TABLE_NAME}
+                    WHERE id IN (SELECT id FROM batch_ids)"""
+                )
+            finally:
+                self.connection.unregister("batch_ids")
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+
+        logging.info(
+            "Saved %i new and %i changed job details (%i unchanged)",
+            len(changed) - len(history),
+            len(history),
+            len(job_details_batch) - len(changed),
+        )
+
+    def fail(self, failures: typing.Tuple[ScrapingFailure, ...]) -> None:
+        """Tombstones the links that failed permanently, and schedules
+        the other failed links for a retry with an exponential backoff,
+        like `SqliteJobLinkQueue.fail`
+        """
+        if not failures:
+            return
+        status_table = DuckDbJobDetailsRepository.STATUS_TABLE_NAME
+        # the last failure of a link in the batch wins, as a row is upserted once
+        batch = pa.Table.from_pylist(
+            [
+                {
+                    "id": failure.id,
+                    "reason": failure.reason,
+                    "permanent": failure.permanent,
+                }
+                for failure in {failure.id: failure for failure in failures}.values()
+            ],
+            schema=FAILURES_SCHEMA,
+        )
+        self.connection.register("batch", batch)
+        try:
+            # `attempts` on the right-hand side is the number of previous attempts
+            self.connection.execute(
+                f"""INSERT INTO {status_table}
+                SELECT id,
+                    CASE
+                        WHEN permanent THEN 'expired'
+                        WHEN $max_attempts <= 1 THEN 'failed'
+                        ELSE 'retry'
+                    END,
+                    1,
+                    CASE WHEN permanent THEN NULL ELSE $now + $delay END,
+                    reason,
+                    $now
+                FROM batch
+                ON CONFLICT (id) DO UPDATE SET
+                status = CASE
+                    WHEN excluded.status = 'expired' THEN 'expired'
+                    WHEN attempts + 1 >= $max_attempts THEN 'failed'
+                    ELSE 'retry'
+                END,
+                attempts = attempts + 1,
+                next_retry_at = CASE
+                    WHEN excluded.status = 'expired' THEN NULL
+                    ELSE $now + LEAST($delay * (1 << attempts), $max_delay)
+                END,
+                last_error = excluded.last_error,
+                updated_at = excluded.updated_at
+                """,
+                {
+                    "now": time.time(),
+                    "delay": self.retry_delay_seconds,
+                    "max_delay": self.max_retry_delay_seconds,
+                    "max_attempts": self.max_attempts,
+                },
+            )
+        finally:
+            self.connection.unregister("batch")
+        n_permanent = sum(failure.permanent for failure in failures)
+        logging.info(
+            "Recorded %i expired links and %i links to retry",
+            n_permanent,
+            len(failures) - n_permanent,
+        )
+
+    def unscraped(
+        self, links: typing.Tuple[JobLink, ...], rescrape: bool = False
+    ) -> typing.Tuple[JobLink, ...]:
+        """The links whose details have not been saved yet, or all of them
+        with `rescrape`, without the links that were given up on
+        or are waiting for a retry
+        """
+        self.connection.register(
+            "batch_ids",
+            pa.table({"id": pa.array([link.id for link in links], pa.string())}),
+        )
+        try:
+            skipped = {
+                row[0]
+                for row in self.connection.execute(
+                    f"""SELECT id FROM {DuckDbJobDetailsRepository.STATUS_TABLE_NAME}
+                    WHERE id IN (SELECT id FROM batch_ids)
+                    AND (status != 'retry' OR next_retry_at > ?)""",
+                    (time.time(),),
+                ).fetchall()
+            }
+            if not rescrape:
+                skipped.update(row[0] for row in self.connection.execute(f"""SELECT id
+                        FROM {DuckDbJobDetailsRepository.DETAILS_TABLE_NAME}
+                        WHERE id IN (SELECT id FROM batch_ids)""").fetchall())
+        finally:
+            self.connection.unregister("batch_ids")
+        return tuple(link for link in links if link.id not in skipped)
+
+
+def details_table(
+    hashed: typing.Iterable[typing.Tuple[JobDetails, str]],
+) -> pa.Table:
+    """The Arrow batch of the details, with their hashes and normalized salaries"""
+    rows = []
+    for job_details, hash_ in hashed:
+        normalized = salary.normalize_salary(job_details.salary_information)
+        rows.append(
+            {
+                "id": job_details.id,
+                "title": job_details.title,
+                "company": job_details.company,
+                "location": job_details.location,
+                "salary_information": job_details.salary_information,
+                "description": job_details.description,
+                "access_date": format_timestamp(job_details.access_date),
+                "content_hash": hash_,
+                "salary_min": normalized.min_amount,
+                "salary_max": normalized.max_amount,
+                "salary_currency": normalized.currency,
+                "salary_period": normalized.period,
+                "salary_version": salary.VERSION,
+                "latitude": job_details.latitude,
+                "longitude": job_details.longitude,
+            }
+        )
+    return pa.Table.from_pylist(rows, schema=DETAILS_SCHEMA)
+
+
+def append(
+    connection: duckdb.DuckDBPyConnection,
+    table: str,
+    batch: pa.Table,
+    insert: str = "INSERT",
+) -> int:
+    """Inserts the whole Arrow batch with a single statement, which DuckDB
+    reads column by column, instead of binding the parameters row by row.
+    Returns the number of inserted rows.
+    """
+    if batch.num_rows == 0:
+        return 0
+    connection.register("batch", batch)
+    try:
+        columns = ", ".join(batch.column_names)
+        result = connection.execute(
+            f"{insert} INTO {table} ({columns}) SELECT {columns} FROM batch"
+        ).fetchone()
+    finally:
+        connection.unregister("batch")
+    return int(result[0]) if result is not None else 0
+
+
+def migrate_from_sqlite(
+    sqlite_file_location: pathlib.Path,
+    duckdb_file_location: pathlib.Path,
+    batch_size: typing.Annotated[int, Ge(1)] = 50_000,
+) -> None:
+    """Copies the links, the details and the history of the details
+    from the SQLite database to the DuckDB one, in Arrow batches.
+    The rows already in the DuckDB database are replaced, and so is the history
+    of the copied jobs.
+    """
+    # brings the SQLite tables up to date with the columns copied below
+    with SqliteJobLinkRepository(sqlite_file_location), SqliteJobDetailsRepository(
+        sqlite_file_location
+    ):
+        pass
+
+    source = sqlite3.connect(sqlite_file_location)
+    with DuckDbJobLinkRepository(
+        duckdb_file_location
+    ) as link_repository, DuckDbJobDetailsRepository(
+        duckdb_file_location
+    ) as details_repository:
+        fields = SqliteJobDetailsRepository.CONTENT_FIELDS
+        copies: typing.Tuple[
+            typing.Tuple[duckdb.DuckDBPyConnection, str, str, pa.Schema], ...
+        ] = (
+            (
+                link_repository.connection,
+                DuckDbJobLinkRepository.LINKS_TABLE_NAME,
+                f"""SELECT id, title, link, website_identifier
+                FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME}""",
+                LINKS_SCHEMA,
+            ),
+            (
+                details_repository.connection,
+                DuckDbJobDetailsRepository.DETAILS_TABLE_NAME,
+                f"""SELECT {", ".join(field.name for field in DETAILS_SCHEMA)}
+                FROM {SqliteJobDetailsRepository.DETAILS_TABLE_NAME}""",
+                DETAILS_SCHEMA,
+            ),
+            (
+                details_repository.connection,
+                DuckDbJobDetailsRepository.HISTORY_TABLE_NAME,
+                f"""SELECT {", ".join(field.name for field in HISTORY_SCHEMA)}
+                FROM {SqliteJobDetailsRepository.HISTORY_TABLE_NAME}""",
+                HISTORY_SCHEMA,
+            ),
+        )
+        # the history of the copied jobs replaces theirs, like the other rows do,
+        # so that copying again does not repeat it
+        history_ids = source.execute(f"""SELECT DISTINCT id
+            FROM {SqliteJobDetailsRepository.HISTORY_TABLE_NAME}""")
+        while ids := history_ids.fetchmany(batch_size):
+            details_repository.connection.register(
+                "batch_ids",
+                pa.table({"id": pa.array([row[0] for row in ids], pa.string())}),
+            )
+            try:
+                details_repository.connection.execute(
+                    f"""DELETE FROM {DuckDbJobDetailsRepository.HISTORY_TABLE_NAME}
+                    WHERE id IN (SELECT id FROM batch_ids)"""
+                )
+            finally:
+                details_repository.connection.unregister("batch_ids")
+        for connection, table, query, schema in copies:
+            cursor = source.execute(query)
+            n_copied = 0
+            while rows := cursor.fetchmany(batch_size):
+                records = [dict(zip(schema.names, row)) for row in rows]
+                if schema is DETAILS_SCHEMA:
+                    for record in records:
+                        _fill_legacy_details(record, fields)
+                append(
+                    connection,
+                    table,
+                    pa.Table.from_pylist(records, schema=schema),
+                    "INSERT" if schema is HISTORY_SCHEMA else "INSERT OR REPLACE",
+                )
+                n_copied += len(rows)
+                logging.info("Copied %i rows of %s", n_copied, table)
+    source.close()
+
+
+def _fill_legacy_details(
+    record: typing.Dict[str, typing.Any], fields: typing.Tuple[str, ...]
+) -> None:
+    """Hashes and normalizes the rows that were saved before the
+    hashes and the normalized salaries were introduced
+    """
+    if record["content_hash"] is None:
+        record["content_hash"] = _hash_content(
+            {field: record[field] for field in fields}
+        )
+    if record["salary_version"] != salary.VERSION:
+        normalized = salary.normalize_salary(record["salary_information"])
+        record["salary_min"], record["salary_max"] = (
+            normalized.min_amount,
+            normalized.max_amount,
+        )
+        record["salary_currency"], record["salary_period"] = (
+            normalized.currency,
+            normalized.period,
+        )
+        record["salary_version"] = salary.VERSION
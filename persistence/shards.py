@@ -0,0 +1,215 @@
+import logging
+import pathlib
+import sqlite3
+import typing
+import urllib.parse
+from types import TracebackType
+
+from annotated_types import Ge
+
+from models import JobDetails, WebsiteIdentifier
+from persistence.sqlite import (
+    SqliteJobDetailsRepository,
+    SqliteJobLinkRepository,
+    connect,
+    find_near,
+    find_within,
+)
+
+# the tables that the read view unites, and that are merged for exports
+TABLES = (
+    SqliteJobLinkRepository.LINKS_TABLE_NAME,
+    SqliteJobDetailsRepository.DETAILS_TABLE_NAME,
+    SqliteJobDetailsRepository.HISTORY_TABLE_NAME,
+)
+
+# the ids of the companies of the database, which differ between the shards
+LOCAL_COLUMNS = frozenset({"company_id"})
+
+
+def shard_location(
+    db_file_location: pathlib.Path, website_identifier: WebsiteIdentifier
+) -> pathlib.Path:
+    """The database of a single website, next to the configured one,
+    e.g. `jobs.careerviet.db` for `jobs.db`
+    """
+    return db_file_location.with_name(
+        f"{db_file_location.stem}.{website_identifier.value}{db_file_location.suffix}"
+    )
+
+
+def existing_shards(
+    db_file_location: pathlib.Path,
+) -> typing.Dict[WebsiteIdentifier, pathlib.Path]:
+    return {
+        website_identifier: location
+        for website_identifier in WebsiteIdentifier
+        if (location := shard_location(db_file_location, website_identifier)).exists()
+    }
+
+
+class SqliteShardView:
+    """Reads the per-website databases as one: they are attached read-only
+    to an in-memory database, whose temporary views unite their tables
+    under the usual table names, e.g. `SELECT * FROM job_details`.
+    """
+
+    def __init__(self, db_file_location: pathlib.Path) -> None:
+        self.shards = existing_shards(db_file_location)
+        # the query server hands the view out to its threads
+        self.connection = sqlite3.connect(
+            "file::memory:", uri=True, check_same_thread=False
+        )
+        for website_identifier, location in self.shards.items():
+            self.connection.execute(
+                "ATTACH DATABASE ? AS ?",
+                (
+                    f"file:{urllib.parse.quote(str(location.resolve()))}?mode=ro",
+                    website_identifier.value,
+                ),
+            )
+        # the shards that have each table
+        self.schemas = {table: self._create_view(table) for table in TABLES}
+
+    def __enter__(self) -> "SqliteShardView":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> typing.Literal[False]:
+        self.connection.close()
+        return False
+
+    def within(
+        self, south: float, west: float, north: float, east: float
+    ) -> typing.Tuple[JobDetails, ...]:
+        """The details of the jobs of all websites located in the bounding box,
+        looked up in the spatial index of every shard
+        """
+        return tuple(
+            job_details
+            for schema in self.schemas[SqliteJobDetailsRepository.DETAILS_TABLE_NAME]
+            for job_details in find_within(
+                self.connection, schema, south, west, north, east
+            )
+        )
+
+    def near(
+        self, latitude: float, longitude: float, km: typing.Annotated[float, Ge(0)]
+    ) -> typing.Tuple[typing.Tuple[JobDetails, float], ...]:
+        """The details of the jobs of all websites located within `km` kilometres
+        of the point, with their distances, nearest first
+        """
+        return find_near(self.within, latitude, longitude, km)
+
+    def _create_view(self, table: str) -> typing.List[str]:
+        shard_columns = {
+            website_identifier.value: [
+                row[1]
+                for row in self.connection.execute(
+                    f'PRAGMA "{website_identifier.value}".table_info({table})'
+                )
+            ]
+            for website_identifier in self.shards
+        }
+        # the shards that have the table, e.g. not the ones of websites that
+        # were only crawled, and the columns they all have, in case some were
+        # created by an older version of the application and not migrated yet
+        schemas = [schema for schema, columns in shard_columns.items() if columns]
+        if not schemas:
+            return schemas
+        selected = ", ".join(
+            column
+            for column in shard_columns[schemas[0]]
+            if column not in LOCAL_COLUMNS
+            and all(column in shard_columns[schema] for schema in schemas)
+        )
+        self.connection.execute(
+            f"CREATE TEMP VIEW {table} AS "
+            + " UNION ALL ".join(
+                f'SELECT {selected} FROM "{schema}".{table}' for schema in schemas
+            )
+        )
+        return schemas
+
+
+def merge_shards(
+    db_file_location: pathlib.Path, target: pathlib.Path, vacuum: bool = False
+) -> int:
+    """Copies the links, the details and their history from all the shards
+    into a single database, e.g. for an export, replacing the rows that are
+    already there, and assigns the companies of the copied details in it.
+    With `vacuum`, the shards are also compacted.
+    Returns the number of copied details.
+    """
+    # creates the tables of the target, and migrates the ones of the shards
+    shards = existing_shards(db_file_location)
+    for location in (target, *shards.values()):
+        with SqliteJobLinkRepository(location), SqliteJobDetailsRepository(location):
+            pass
+
+    connection = connect(target)
+    columns = {
+        table: [
+            row[1]
+            for row in connection.execute(f"PRAGMA table_info({table})")
+            if row[1] not in LOCAL_COLUMNS
+        ]
+        for table in TABLES
+    }
+    links = SqliteJobLinkRepository.LINKS_TABLE_NAME
+    details = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
+    history = SqliteJobDetailsRepository.HISTORY_TABLE_NAME
+    n_merged = 0
+    for website_identifier, location in shards.items():
+        connection.execute("ATTACH DATABASE ? AS shard", (str(location),))
+        with connection:
+            connection.execute(f"""
+                INSERT OR REPLACE INTO main.{links} ({", ".join(columns[links])})
+                SELECT {", ".join(columns[links])} FROM shard.{links}
+                """)
+            # an upsert, which the triggers of the spatial index follow
+            result = connection.execute(f"""
+                INSERT INTO main.{details} ({", ".join(columns[details])})
+                SELECT {", ".join(columns[details])} FROM shard.{details} WHERE true
+                ON CONFLICT(id) DO UPDATE SET
+                {", ".join(
+                    f"{column} = excluded.{column}"
+                    for column in columns[details]
+                    if column != "id"
+                )},
+                company_id = NULL
+                """)
+            n_shard = result.rowcount
+            connection.execute(f"""
+                DELETE FROM main.{history}
+                WHERE id IN (SELECT id FROM shard.{history})
+                """)
+            connection.execute(f"""
+                INSERT INTO main.{history} ({", ".join(columns[history])})
+                SELECT {", ".join(columns[history])} FROM shard.{history}
+                """)
+        connection.execute("DETACH DATABASE shard")
+        n_merged += n_shard
+        logging.info(
+            "Merged %i job details of %s into %s",
+            n_shard,
+            website_identifier.value,
+            target,
+        )
+
+        if vacuum:
+            shard = connect(location)
+            shard.execute("VACUUM")
+            shard.close()
+            logging.info("Compacted %s", location)
+    connection.close()
+
+    # the replaced details are counted again under their companies
+    with SqliteJobDetailsRepository(target) as details_repository:
+        details_repository.backfill_companies(batch_size=10_000)
+        details_repository.recount_companies()
+    return n_merged
@@ -1,28 +1,180 @@
+import collections
+import difflib
+import hashlib
+import json
 import logging
+import math
 import pathlib
+import re
 import sqlite3
+import threading
+import time
 import typing
+from itertools import islice
 from types import TracebackType
 
 from annotated_types import Ge
 
-from models import JobDetails, JobLink, WebsiteIdentifier
-from persistence import JobDetailsRepository, JobLinkRepository
+from models import (
+    WEBSITE_IDENTIFIERS,
+    JobDetails,
+    JobLink,
+    ScrapingFailure,
+    WebsiteIdentifier,
+    format_timestamp,
+    now,
+    parse_timestamp,
+)
+from normalization import companies, salary, urls
+from persistence import JobDetailsRepository, JobLinkRepository, WorkQueue
+
+BUSY_TIMEOUT_SECONDS = 30
+
+
+def job_link_row(cursor: sqlite3.Cursor, row: typing.Tuple[str, ...]) -> JobLink:
+    """A row factory building the links directly from the
+    `id, title, link, website_identifier` rows
+    """
+    id_, title, link, website = row
+    return JobLink(id_, title, link, WEBSITE_IDENTIFIERS[website])
+
+
+def job_details_row(
+    cursor: sqlite3.Cursor, row: typing.Tuple[typing.Any, ...]
+) -> JobDetails:
+    """A row factory building the details directly from the
+    `DETAILS_COLUMNS` rows
+    """
+    (
+        id_,
+        title,
+        company,
+        location,
+        salary_information,
+        description,
+        access_date,
+        latitude,
+        longitude,
+    ) = row
+    return JobDetails(
+        id_,
+        title,
+        company,
+        location,
+        salary_information,
+        description,
+        parse_timestamp(access_date),
+        latitude,
+        longitude,
+    )
+
+
+def connect(
+    db_file_location: pathlib.Path, check_same_thread: bool = True
+) -> sqlite3.Connection:
+    """Opens the database in the WAL mode, so that the readers do not block
+    the writer, with a timeout long enough for several processes to take turns
+    writing to it.
+    """
+    connection = sqlite3.connect(
+        db_file_location,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        check_same_thread=check_same_thread,
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+def add_missing_columns(
+    connection: sqlite3.Connection, table: str, columns: typing.Dict[str, str]
+) -> typing.List[str]:
+    """Migrates a table created by an older version of the application,
+    by adding the `{name: declaration}` columns it does not have yet
+
+    Returns
+    -------
+    The names of the added columns
+    """
+    existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+    added = [name for name in columns if name not in existing]
+    for name in added:
+        connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {columns[name]}")
+    return added
+
+
+def create_links_table(connection: sqlite3.Connection) -> None:
+    """Creates or migrates the links table, including for the work queue,
+    which only queues the links with a canonical URL.
+
+    A link with the canonical URL of another link of its website is not saved.
+    The links saved before the canonical URLs are given theirs, except the
+    duplicates, which keep none, once, when the column is added.
+
+    `first_seen` and `last_seen` are the times, in microseconds since the epoch,
+    of the first and the last crawls that found a link. They are unknown for
+    the links saved before they were recorded.
+    """
+    table = SqliteJobLinkRepository.LINKS_TABLE_NAME
+    connection.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            link TEXT NOT NULL,
+            website_identifier TEXT NOT NULL,
+            canonical_url TEXT,
+            first_seen INTEGER,
+            last_seen INTEGER
+        )
+        """)
+    # the column is added and the links given their canonical URLs at once, and
+    # by a single process, so that the duplicates are not looked at again
+    connection.execute("BEGIN IMMEDIATE")
+    added = add_missing_columns(
+        connection,
+        table,
+        {"canonical_url": "TEXT", "first_seen": "INTEGER", "last_seen": "INTEGER"},
+    )
+    connection.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS {table}_canonical_url
+        ON {table} (website_identifier, canonical_url)
+        """)
+    connection.execute(f"""
+        CREATE INDEX IF NOT EXISTS {table}_first_seen
+        ON {table} (website_identifier, first_seen)
+        """)
+    connection.create_function(
+        "canonical_url",
+        2,
+        lambda link, website: urls.canonical_url(link, WEBSITE_IDENTIFIERS[website]),
+        deterministic=True,
+    )
+    backfilled = 0
+    if "canonical_url" in added:
+        # the first saved of the duplicates keeps the canonical URL
+        backfilled = connection.execute(f"""
+            UPDATE OR IGNORE {table}
+            SET canonical_url = canonical_url(link, website_identifier)
+            """).rowcount
+    connection.commit()
+    if backfilled > 0:
+        logging.info("Gave canonical URLs to %i job links", backfilled)
 
 
 class SqliteJobLinkRepository(JobLinkRepository):
     LINKS_TABLE_NAME = "job_links"
 
     def __init__(self, db_file_location: pathlib.Path) -> None:
-        self.connection = sqlite3.connect(db_file_location)
-        self.connection.execute(f"""
-            CREATE TABLE IF NOT EXISTS {SqliteJobLinkRepository.LINKS_TABLE_NAME} (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                link TEXT NOT NULL,
-                website_identifier TEXT NOT NULL
-            )
-            """)
+        self.connection = connect(db_file_location)
+        create_links_table(self.connection)
+
+    @classmethod
+    def reader(cls, connection: sqlite3.Connection) -> "SqliteJobLinkRepository":
+        """Reads the links through a connection opened elsewhere,
+        e.g. a read-only one, without creating or migrating the table
+        """
+        repository = cls.__new__(cls)
+        repository.connection = connection
+        return repository
 
     def __enter__(self) -> "SqliteJobLinkRepository":
         return self
@@ -37,28 +189,40 @@ class SqliteJobLinkRepository(JobLinkRepository):
         return False
 
     def save_batch(self, job_link_batch: typing.Tuple[JobLink, ...]) -> None:
-        logging.info(f"Saving {len(job_link_batch)} job links")
+        logging.info("Saving %i job links", len(job_link_batch))
+        table = SqliteJobLinkRepository.LINKS_TABLE_NAME
+        seen = now()
+        rows = [
+            (
+                job_link.id,
+                job_link.title,
+                job_link.link,
+                job_link.website_identifier.value,
+                urls.canonical_url(job_link.link, job_link.website_identifier),
+            )
+            for job_link in job_link_batch
+        ]
         cursor = self.connection.cursor()
+        # the duplicates within the batch, and of the saved links,
+        # are ignored by the unique index of the canonical URLs
         result = cursor.executemany(
-            "INSERT OR IGNORE INTO"
-            f" {SqliteJobLinkRepository.LINKS_TABLE_NAME} VALUES(?, ?, ?, ?)",
-            [
-                (
-                    job_link.id,
-                    job_link.title,
-                    job_link.link,
-                    job_link.website_identifier.value,
-                )
-                for job_link in job_link_batch
-            ],
+            f"""INSERT OR IGNORE INTO {table}
+            (id, title, link, website_identifier, canonical_url, first_seen, last_seen)
+            VALUES(?, ?, ?, ?, ?, ?, ?)""",
+            [(*row, seen, seen) for row in rows],
+        )
+        n_new = result.rowcount
+        # the links found again, under their ids or their canonical URLs
+        cursor.executemany(
+            f"""UPDATE {table} SET last_seen = ?
+            WHERE id = ? OR (website_identifier = ? AND canonical_url = ?)""",
+            [(seen, id_, website, canonical) for id_, _, _, website, canonical in rows],
         )
         self.connection.commit()
 
-        n_duplicates: int = len(job_link_batch) - result.rowcount
+        n_duplicates: int = len(job_link_batch) - n_new
 
-        logging.info(
-            f"Saved {result.rowcount} new job links ({n_duplicates} duplicates)"
-        )
+        logging.info("Saved %i new job links (%i duplicates)", n_new, n_duplicates)
 
         cursor.close()
 
@@ -69,16 +233,19 @@ class SqliteJobLinkRepository(JobLinkRepository):
         offset: typing.Annotated[int, Ge(0)],
     ) -> typing.Tuple[JobLink, ...]:
         cursor = self.connection.cursor()
+        cursor.row_factory = job_link_row
         cursor.execute(
-            f"""SELECT * FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME}
+            f"""SELECT id, title, link, website_identifier
+            FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME}
             WHERE website_identifier = ?
+            ORDER BY first_seen DESC, id
             LIMIT ? OFFSET ?""",
             (website_identifier.value, batch_size, offset),
         )
-        rows = cursor.fetchall()
+        links: typing.List[JobLink] = cursor.fetchall()
         cursor.close()
 
-        return tuple(JobLink(*row) for row in rows)
+        return tuple(links)
 
     def count(self, website_identifier: WebsiteIdentifier) -> int:
         cursor = self.connection.cursor()
@@ -94,9 +261,29 @@ class SqliteJobLinkRepository(JobLinkRepository):
 
 class SqliteJobDetailsRepository(JobDetailsRepository):
     DETAILS_TABLE_NAME = "job_details"
+    HISTORY_TABLE_NAME = "job_details_history"
+    GEO_INDEX_NAME = "job_details_geo"
+    # the R*Tree is keyed by integers, which the text ids are mapped to
+    GEO_KEYS_TABLE_NAME = "job_details_geo_keys"
+    COMPANIES_TABLE_NAME = "companies"
+    # the company names as they were scraped, and their companies
+    ALIASES_TABLE_NAME = "company_aliases"
+    CONTENT_FIELDS = (
+        "title",
+        "company",
+        "location",
+        "salary_information",
+        "description",
+        "latitude",
+        "longitude",
+    )
 
     def __init__(self, db_file_location: pathlib.Path) -> None:
-        self.connection = sqlite3.connect(db_file_location)
+        # the coordinator calls the repository from the threads serving the workers
+        self.connection = connect(db_file_location, check_same_thread=False)
+        self.lock = threading.Lock()
+        # the alias map, filled as the names are seen
+        self.company_ids: typing.Dict[str, int] = {}
         self.connection.execute(f"""
             CREATE TABLE IF NOT EXISTS {SqliteJobDetailsRepository.DETAILS_TABLE_NAME} (
                 id TEXT PRIMARY KEY,
@@ -106,9 +293,66 @@ class SqliteJobDetailsRepository(JobDetailsRepository):
                 salary_information TEXT,
                 description TEXT NOT NULL,
                 access_date TEXT NOT NULL,
-                FOREIGN KEY (id) REFERENCES job_links(id)
+                content_hash TEXT,
+                salary_min REAL,
+                salary_max REAL,
+                salary_currency TEXT,
+                salary_period TEXT,
+                salary_version INTEGER,
+                latitude REAL,
+                longitude REAL,
+                company_id INTEGER,
+                FOREIGN KEY (id) REFERENCES job_links(id),
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            )
+            """)
+        add_missing_columns(
+            self.connection,
+            SqliteJobDetailsRepository.DETAILS_TABLE_NAME,
+            {
+                "content_hash": "TEXT",
+                "salary_min": "REAL",
+                "salary_max": "REAL",
+                "salary_currency": "TEXT",
+                "salary_period": "TEXT",
+                "salary_version": "INTEGER",
+                "latitude": "REAL",
+                "longitude": "REAL",
+                "company_id": "INTEGER REFERENCES companies(id)",
+            },
+        )
+        self._create_geo_index()
+        self._create_companies()
+        details_table = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
+        # for the listings of the latest details; the dates are stored with the
+        # offset of the timezone they were written in, so they are ordered in UTC
+        self.connection.execute(f"DROP INDEX IF EXISTS {details_table}_access_date")
+        self.connection.execute(f"""
+            CREATE INDEX IF NOT EXISTS {details_table}_access_day
+            ON {details_table} (julianday(access_date))
+            """)
+        # for the salary range queries, e.g. the jobs paying 20-30M VND a month
+        for bound in ("min", "max"):
+            self.connection.execute(f"""
+                CREATE INDEX IF NOT EXISTS {details_table}_salary_{bound}
+                ON {details_table} (salary_currency, salary_period, salary_{bound})
+                """)
+        history_table = SqliteJobDetailsRepository.HISTORY_TABLE_NAME
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {history_table} (
+                id TEXT NOT NULL,
+                changed_at TEXT NOT NULL,
+                previous_hash TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                diff TEXT NOT NULL,
+                FOREIGN KEY (id) REFERENCES job_details(id)
             )
             """)
+        self.connection.execute(f"""
+            CREATE INDEX IF NOT EXISTS {history_table}_id
+            ON {history_table} (id, changed_at)
+            """)
+        self.connection.commit()
 
     def __enter__(self) -> "SqliteJobDetailsRepository":
         return self
@@ -123,38 +367,952 @@ class SqliteJobDetailsRepository(JobDetailsRepository):
         return False
 
     def save_batch(self, job_details_batch: typing.Tuple[JobDetails, ...]) -> None:
-        logging.info(f"Saving {len(job_details_batch)} job links")
-        cursor = self.connection.cursor()
+        """Writes the new details, and the details whose content has changed
+        since they were last saved, recording the changes in the history table.
+        The details that have not changed are not written at all.
+        """
+        logging.info("Saving %i job details", len(job_details_batch))
         table = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
-        result = cursor.executemany(
-            f"""INSERT INTO {table} VALUES(?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(id) DO UPDATE SET
-            title = excluded.title,
-            company = excluded.company,
-            location = excluded.location,
-            salary_information = excluded.salary_information,
-            description = excluded.description,
-            access_date = excluded.access_date
-            """,
+        # the last details of a job in the batch win, like they would when upserted
+        hashed = {
+            job_details.id: (job_details, content_hash(job_details))
+            for job_details in job_details_batch
+        }
+
+        with self.lock:
+            cursor = self.connection.cursor()
+            stored = cursor.execute(
+                f"""SELECT id, content_hash, company_id FROM {table}
+                WHERE id IN ({", ".join("?" * len(hashed))})""",
+                tuple(hashed),
+            ).fetchall()
+            stored_hashes = {id_: hash_ for id_, hash_, _ in stored}
+            stored_companies = {id_: company_id for id_, _, company_id in stored}
+            changed = {
+                id_: (job_details, hash_)
+                for id_, (job_details, hash_) in hashed.items()
+                if id_ not in stored_hashes or stored_hashes[id_] != hash_
+            }
+            history = self._history(
+                cursor,
+                {id_: hashed[id_] for id_ in changed if id_ in stored_hashes},
+            )
+            # rows saved before the hashes were introduced, or hashed with fewer
+            # fields, may not have changed
+            unchanged_legacy = {
+                id_ for id_, previous in history.items() if previous is None
+            }
+            written = {
+                id_: job_details
+                for id_, (job_details, _) in changed.items()
+                if id_ not in unchanged_legacy
+            }
+            company_ids = self._company_ids(
+                cursor, [job_details.company for job_details in written.values()]
+            )
+            # the postings move to their new companies
+            postings: typing.Counter[int] = collections.Counter()
+            for id_, job_details in written.items():
+                company_id = company_ids[job_details.company]
+                previous_company_id = stored_companies.get(id_)
+                if previous_company_id != company_id:
+                    postings[company_id] += 1
+                    if previous_company_id is not None:
+                        postings[previous_company_id] -= 1
+            self._update_companies(
+                cursor,
+                postings,
+                {
+                    company_ids[job_details.company]: job_details.access_date
+                    for job_details in sorted(
+                        written.values(), key=lambda details: details.access_date
+                    )
+                },
+            )
+
+            cursor.executemany(
+                f"""INSERT INTO {table} (
+                    id, title, company, location, salary_information,
+                    description, access_date, content_hash,
+                    salary_min, salary_max, salary_currency, salary_period,
+                    salary_version, latitude, longitude, company_id
+                )
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                title = excluded.title,
+                company = excluded.company,
+                location = excluded.location,
+                salary_information = excluded.salary_information,
+                description = excluded.description,
+                access_date = excluded.access_date,
+                content_hash = excluded.content_hash,
+                salary_min = excluded.salary_min,
+                salary_max = excluded.salary_max,
+                salary_currency = excluded.salary_currency,
+                salary_period = excluded.salary_period,
+                salary_version = excluded.salary_version,
+                latitude = excluded.latitude,
+                longitude = excluded.longitude,
+                company_id = excluded.company_id
+                """,
+                [
+                    (
+                        job_details.id,
+                        job_details.title,
+                        job_details.company,
+                        job_details.location,
+                        job_details.salary_information,
+                        job_details.description,
+                        format_timestamp(job_details.access_date),
+                        hash_,
+                        *salary.normalize_salary(job_details.salary_information),
+                        salary.VERSION,
+                        job_details.latitude,
+                        job_details.longitude,
+                        company_ids[job_details.company],
+                    )
+                    for id_, (job_details, hash_) in changed.items()
+                    if id_ not in unchanged_legacy
+                ],
+            )
+            cursor.executemany(
+                f"UPDATE {table} SET content_hash = ? WHERE id = ?",
+                [(hashed[id_][1], id_) for id_ in unchanged_legacy],
+            )
+            cursor.executemany(
+                f"""INSERT INTO {SqliteJobDetailsRepository.HISTORY_TABLE_NAME}
+                VALUES(?, ?, ?, ?, ?)""",
+                [
+                    (id_, format_timestamp(hashed[id_][0].access_date), *change)
+                    for id_, change in history.items()
+                    if change is not None
+                ],
+            )
+            self.connection.commit()
+            cursor.close()
+
+        n_new = len(changed) - len(history)
+        n_changed = len(history) - len(unchanged_legacy)
+        logging.info(
+            "Saved %i new and %i changed job details (%i unchanged)",
+            n_new,
+            n_changed,
+            len(job_details_batch) - n_new - n_changed,
+        )
+
+    def backfill_salaries(self, batch_size: typing.Annotated[int, Ge(1)]) -> int:
+        """Normalizes the salaries of the rows saved before the salaries were
+        normalized, or with an older version of the normalizer.
+        Returns the number of normalized rows.
+        """
+        table = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
+        n_normalized = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    f"""SELECT id, salary_information FROM {table}
+                    WHERE salary_version IS NULL OR salary_version != ?
+                    LIMIT ?""",
+                    (salary.VERSION, batch_size),
+                ).fetchall()
+                self.connection.executemany(
+                    f"""UPDATE {table} SET
+                    salary_min = ?, salary_max = ?, salary_currency = ?,
+                    salary_period = ?, salary_version = ?
+                    WHERE id = ?""",
+                    [
+                        (
+                            *salary.normalize_salary(salary_information),
+                            salary.VERSION,
+                            id_,
+                        )
+                        for id_, salary_information in rows
+                    ],
+                )
+                self.connection.commit()
+            if not rows:
+                return n_normalized
+            n_normalized += len(rows)
+            logging.info("Normalized the salaries of %i job details", n_normalized)
+
+    def backfill_coordinates(self, batch_size: typing.Annotated[int, Ge(1)]) -> int:
+        """Moves the `lat ...; long ...` out of the location of the rows saved
+        before the coordinates had their own columns, into the columns, and
+        hashes the rows again, as their details are now scraped without them.
+        Returns the number of rows with coordinates found.
+        """
+        table = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
+        fields = SqliteJobDetailsRepository.CONTENT_FIELDS
+        n_found = 0
+        last_rowid = 0
+        while True:
+            with self.lock:
+                rows = self.connection.execute(
+                    f"""SELECT rowid, id, {", ".join(fields)} FROM {table}
+                    WHERE rowid > ? AND latitude IS NULL AND location LIKE '%lat %'
+                    ORDER BY rowid LIMIT ?""",
+                    (last_rowid, batch_size),
+                ).fetchall()
+                moved = []
+                for _, id_, *values in rows:
+                    content = dict(zip(fields, values))
+                    match = LEGACY_COORDINATES.search(content["location"])
+                    if match is None:
+                        continue
+                    content["location"] = content["location"][: match.start()] + ")"
+                    content["latitude"] = float(match[1])
+                    content["longitude"] = float(match[2])
+                    moved.append(
+                        (
+                            content["latitude"],
+                            content["longitude"],
+                            content["location"],
+                            _hash_content(content),
+                            id_,
+                        )
+                    )
+                self.connection.executemany(
+                    f"""UPDATE {table}
+                    SET latitude = ?, longitude = ?, location = ?, content_hash = ?
+                    WHERE id = ?""",
+                    moved,
+                )
+                self.connection.commit()
+            if not rows:
+                return n_found
+            last_rowid = rows[-1][0]
+            n_found += len(moved)
+            logging.info("Found the coordinates of %i job details", n_found)
+
+    def backfill_companies(self, batch_size: typing.Annotated[int, Ge(1)]) -> int:
+        """Assigns their companies to the rows saved before the companies
+        were normalized, and counts them in the postings of the companies.
+        Returns the number of rows assigned.
+        """
+        table = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
+        n_assigned = 0
+        while True:
+            with self.lock:
+                cursor = self.connection.cursor()
+                rows = cursor.execute(
+                    f"""SELECT id, company, access_date FROM {table}
+                    WHERE company_id IS NULL ORDER BY rowid LIMIT ?""",
+                    (batch_size,),
+                ).fetchall()
+                company_ids = self._company_ids(
+                    cursor, [company for _, company, _ in rows]
+                )
+                latest: typing.Dict[int, int] = {}
+                for _, company, access_date in rows:
+                    company_id = company_ids[company]
+                    latest[company_id] = max(
+                        latest.get(company_id, 0), parse_timestamp(access_date)
+                    )
+                self._update_companies(
+                    cursor,
+                    collections.Counter(company_ids[company] for _, company, _ in rows),
+                    latest,
+                )
+                cursor.executemany(
+                    f"UPDATE {table} SET company_id = ? WHERE id = ?",
+                    [(company_ids[company], id_) for id_, company, _ in rows],
+                )
+                self.connection.commit()
+                cursor.close()
+            if not rows:
+                return n_assigned
+            n_assigned += len(rows)
+            logging.info("Assigned the companies of %i job details", n_assigned)
+
+    def recount_companies(self) -> None:
+        """Counts the postings of every company again, e.g. after the details
+        were changed by another program than the repository
+        """
+        with self.lock:
+            self.connection.execute(f"""
+                UPDATE {SqliteJobDetailsRepository.COMPANIES_TABLE_NAME}
+                SET n_postings = (
+                    SELECT COUNT(*)
+                    FROM {SqliteJobDetailsRepository.DETAILS_TABLE_NAME} details
+                    WHERE details.company_id = companies.id
+                )
+                """)
+            self.connection.commit()
+
+    def top_companies(
+        self, limit: typing.Annotated[int, Ge(0)]
+    ) -> typing.Tuple[typing.Tuple[str, int, int | None], ...]:
+        """The `(name, postings, latest access date)` of the companies
+        with the most postings, read from their precomputed counts
+        """
+        with self.lock:
+            return tuple(
+                self.connection.execute(
+                    f"""SELECT name, n_postings, latest_access
+                    FROM {SqliteJobDetailsRepository.COMPANIES_TABLE_NAME}
+                    ORDER BY n_postings DESC LIMIT ?""",
+                    (limit,),
+                ).fetchall()
+            )
+
+    def company(self, name: str) -> typing.Tuple[str, int, int | None] | None:
+        """The `(name, postings, latest access date)` of the company,
+        under any of the variants of its name
+        """
+        with self.lock:
+            row: typing.Tuple[str, int, int | None] | None = self.connection.execute(
+                f"""SELECT name, n_postings, latest_access
+                FROM {SqliteJobDetailsRepository.COMPANIES_TABLE_NAME}
+                WHERE normalized_name = ?""",
+                (companies.normalize_company(name),),
+            ).fetchone()
+        return row
+
+    def within(
+        self, south: float, west: float, north: float, east: float
+    ) -> typing.Tuple[JobDetails, ...]:
+        """The details of the jobs located in the bounding box"""
+        with self.lock:
+            return find_within(self.connection, "main", south, west, north, east)
+
+    def near(
+        self, latitude: float, longitude: float, km: typing.Annotated[float, Ge(0)]
+    ) -> typing.Tuple[typing.Tuple[JobDetails, float], ...]:
+        """The details of the jobs located within `km` kilometres of the point,
+        with their distances, nearest first
+        """
+        return find_near(self.within, latitude, longitude, km)
+
+    def _create_geo_index(self) -> None:
+        """Creates the R*Tree index of the coordinates, which triggers keep
+        up to date with the details table, and indexes the existing rows
+        """
+        table = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
+        geo = SqliteJobDetailsRepository.GEO_INDEX_NAME
+        keys = SqliteJobDetailsRepository.GEO_KEYS_TABLE_NAME
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {keys} (
+                key INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE
+            )
+            """)
+        self.connection.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {geo} USING rtree(
+                key, min_latitude, max_latitude, min_longitude, max_longitude
+            )
+            """)
+        index_new = f"""
+            INSERT INTO {keys} (id) SELECT NEW.id
+            WHERE NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+            -- not OR IGNORE, which the upserts would override
+            AND NOT EXISTS (SELECT 1 FROM {keys} WHERE id = NEW.id);
+            INSERT INTO {geo}
+            SELECT key, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+            FROM {keys}
+            WHERE id = NEW.id
+            AND NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+            """
+        self.connection.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {geo}_insert AFTER INSERT ON {table}
+            BEGIN
+                {index_new}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {geo}_update
+            AFTER UPDATE OF latitude, longitude ON {table}
+            BEGIN
+                DELETE FROM {geo}
+                WHERE key = (SELECT key FROM {keys} WHERE id = OLD.id);
+                {index_new}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {geo}_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM {geo}
+                WHERE key = (SELECT key FROM {keys} WHERE id = OLD.id);
+                DELETE FROM {keys} WHERE id = OLD.id;
+            END;
+            """)
+
+    def _create_companies(self) -> None:
+        """Creates the companies, with the number of their postings and the
+        last time one of them was scraped, kept up to date by `save_batch`,
+        and the aliases of their names
+        """
+        table = SqliteJobDetailsRepository.COMPANIES_TABLE_NAME
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                normalized_name TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                n_postings INTEGER NOT NULL DEFAULT 0,
+                latest_access INTEGER
+            )
+            """)
+        self.connection.execute(f"""
+            CREATE INDEX IF NOT EXISTS {table}_n_postings ON {table} (n_postings)
+            """)
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SqliteJobDetailsRepository.ALIASES_TABLE_NAME} (
+                alias TEXT PRIMARY KEY,
+                company_id INTEGER NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES {table}(id)
+            ) WITHOUT ROWID
+            """)
+        details_table = SqliteJobDetailsRepository.DETAILS_TABLE_NAME
+        self.connection.execute(f"""
+            CREATE INDEX IF NOT EXISTS {details_table}_company_id
+            ON {details_table} (company_id)
+            """)
+
+    def _company_ids(
+        self, cursor: sqlite3.Cursor, names: typing.Iterable[str]
+    ) -> typing.Dict[str, int]:
+        """The ids of the companies of the names, looked up in the alias map,
+        or in the aliases table, or created, named after the first of their
+        aliases in the order of the names
+        """
+        # without the repeated names, in their order
+        unique = list(dict.fromkeys(names))
+        missing = [name for name in unique if name not in self.company_ids]
+        if missing:
+            self.company_ids.update(
+                cursor.execute(
+                    f"""SELECT alias, company_id
+                    FROM {SqliteJobDetailsRepository.ALIASES_TABLE_NAME}
+                    WHERE alias IN ({", ".join("?" * len(missing))})""",
+                    missing,
+                ).fetchall()
+            )
+        for name in missing:
+            if name in self.company_ids:
+                continue
+            (company_id,) = cursor.execute(
+                f"""INSERT INTO {SqliteJobDetailsRepository.COMPANIES_TABLE_NAME}
+                (normalized_name, name) VALUES(?, ?)
+                ON CONFLICT(normalized_name) DO UPDATE SET name = name
+                RETURNING id""",
+                (companies.normalize_company(name), name.strip()),
+            ).fetchone()
+            cursor.execute(
+                "INSERT OR IGNORE INTO"
+                f" {SqliteJobDetailsRepository.ALIASES_TABLE_NAME} VALUES(?, ?)",
+                (name, company_id),
+            )
+            self.company_ids[name] = company_id
+        return {name: self.company_ids[name] for name in unique}
+
+    @staticmethod
+    def _update_companies(
+        cursor: sqlite3.Cursor,
+        postings: typing.Mapping[int, int],
+        latest: typing.Mapping[int, int],
+    ) -> None:
+        """Adds to the number of postings of the companies,
+        and moves their latest access dates forward
+        """
+        cursor.executemany(
+            f"""UPDATE {SqliteJobDetailsRepository.COMPANIES_TABLE_NAME}
+            SET n_postings = n_postings + ?,
+                latest_access = max(coalesce(latest_access, 0), coalesce(?, 0))
+            WHERE id = ?""",
             [
+                (postings.get(company_id, 0), latest.get(company_id), company_id)
+                for company_id in postings.keys() | latest.keys()
+            ],
+        )
+
+    def _history(
+        self,
+        cursor: sqlite3.Cursor,
+        changed: typing.Dict[str, typing.Tuple[JobDetails, str]],
+    ) -> typing.Dict[str, typing.Tuple[str, str, str] | None]:
+        """For each changed row, returns its `(previous_hash, hash, diff)`
+        history entry, or `None` if its content has not changed, but the stored
+        row has no hash yet, or one of fewer fields
+        """
+        fields = SqliteJobDetailsRepository.CONTENT_FIELDS
+        rows = cursor.execute(
+            f"""SELECT id, content_hash, {", ".join(fields)}
+            FROM {SqliteJobDetailsRepository.DETAILS_TABLE_NAME}
+            WHERE id IN ({", ".join("?" * len(changed))})""",
+            tuple(changed),
+        ).fetchall()
+
+        history: typing.Dict[str, typing.Tuple[str, str, str] | None] = {}
+        for id_, previous_hash, *previous_values in rows:
+            job_details, hash_ = changed[id_]
+            previous = dict(zip(fields, previous_values))
+            history[id_] = (
                 (
-                    job_details.id,
-                    job_details.title,
-                    job_details.company,
-                    job_details.location,
-                    job_details.salary_information,
-                    job_details.description,
-                    job_details.access_date,
+                    previous_hash or _hash_content(previous),
+                    hash_,
+                    content_diff(previous, job_details),
                 )
-                for job_details in job_details_batch
-            ],
+                if _hash_content(previous) != hash_
+                else None
+            )
+        return history
+
+
+DETAILS_COLUMNS = """details.id, details.title, details.company, details.location,
+    details.salary_information, details.description, details.access_date,
+    details.latitude, details.longitude"""
+"""The columns of the details table, in the order of the `JobDetails` fields"""
+
+KM_PER_DEGREE = 111.195
+"""The length of a degree of latitude, or of longitude at the equator"""
+
+# how the coordinates were written in the location before they had columns
+LEGACY_COORDINATES = re.compile(r"; lat (-?[0-9.]+); long (-?[0-9.]+)\)$")
+
+
+def find_within(
+    connection: sqlite3.Connection,
+    schema: str,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+) -> typing.Tuple[JobDetails, ...]:
+    """The details of the jobs located in the bounding box,
+    looked up in the spatial index of the database attached as `schema`
+    """
+    cursor = connection.cursor()
+    cursor.row_factory = job_details_row
+    rows: typing.List[JobDetails] = cursor.execute(
+        f"""SELECT {DETAILS_COLUMNS}
+        FROM "{schema}".{SqliteJobDetailsRepository.GEO_INDEX_NAME} geo
+        JOIN "{schema}".{SqliteJobDetailsRepository.GEO_KEYS_TABLE_NAME} keys
+        ON keys.key = geo.key
+        JOIN "{schema}".{SqliteJobDetailsRepository.DETAILS_TABLE_NAME} details
+        ON details.id = keys.id
+        WHERE geo.max_latitude >= ? AND geo.min_latitude <= ?
+        AND geo.max_longitude >= ? AND geo.min_longitude <= ?
+        -- the index stores the coordinates rounded outwards
+        AND details.latitude BETWEEN ? AND ?
+        AND details.longitude BETWEEN ? AND ?""",
+        (south, north, west, east, south, north, west, east),
+    ).fetchall()
+    cursor.close()
+    return tuple(rows)
+
+
+def find_near(
+    within: typing.Callable[
+        [float, float, float, float], typing.Tuple[JobDetails, ...]
+    ],
+    latitude: float,
+    longitude: float,
+    km: typing.Annotated[float, Ge(0)],
+) -> typing.Tuple[typing.Tuple[JobDetails, float], ...]:
+    """The details of the jobs located within `km` kilometres of the point,
+    with their distances, nearest first, given how to find the jobs
+    within a bounding box
+    """
+    # the bounding box of the circle is looked up in the index,
+    # and its corners are filtered out by the exact distance
+    d_latitude = km / KM_PER_DEGREE
+    d_longitude = km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    candidates = within(
+        latitude - d_latitude,
+        longitude - d_longitude,
+        latitude + d_latitude,
+        longitude + d_longitude,
+    )
+    return tuple(
+        sorted(
+            (
+                (job_details, distance)
+                for job_details in candidates
+                if (
+                    distance := distance_km(
+                        latitude,
+                        longitude,
+                        typing.cast(float, job_details.latitude),
+                        typing.cast(float, job_details.longitude),
+                    )
+                )
+                <= km
+            ),
+            key=lambda job_details_distance: job_details_distance[1],
+        )
+    )
+
+
+def distance_km(
+    latitude: float, longitude: float, other_latitude: float, other_longitude: float
+) -> float:
+    """The great-circle distance between two points"""
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    d_phi = other_phi - phi
+    d_lambda = math.radians(other_longitude - longitude)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi) * math.cos(other_phi) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * math.degrees(math.asin(min(1.0, math.sqrt(a)))) * KM_PER_DEGREE
+
+
+def content_hash(job_details: JobDetails) -> str:
+    """The hash of the scraped content of the details, without the access date"""
+    return _hash_content(
+        {
+            field: getattr(job_details, field)
+            for field in SqliteJobDetailsRepository.CONTENT_FIELDS
+        }
+    )
+
+
+def _hash_content(content: typing.Dict[str, typing.Any]) -> str:
+    serialized = json.dumps(
+        [content[field] for field in SqliteJobDetailsRepository.CONTENT_FIELDS],
+        ensure_ascii=False,
+    )
+    return hashlib.blake2b(serialized.encode(), digest_size=16).hexdigest()
+
+
+def content_diff(
+    previous: typing.Dict[str, typing.Any], job_details: JobDetails
+) -> str:
+    """A compact JSON description of the change: the previous value of each
+    changed short field, and a line diff of the description
+    """
+    diff: typing.Dict[str, typing.Any] = {}
+    for field in SqliteJobDetailsRepository.CONTENT_FIELDS:
+        old, new = previous[field], getattr(job_details, field)
+        if old == new:
+            continue
+        if field == "description":
+            # without the `---`/`+++` file header lines
+            diff[field] = "\n".join(
+                islice(
+                    difflib.unified_diff(
+                        (old or "").splitlines(),
+                        (new or "").splitlines(),
+                        lineterm="",
+                        n=0,
+                    ),
+                    2,
+                    None,
+                )
+            )
+        else:
+            diff[field] = old
+    return json.dumps(diff, ensure_ascii=False)
+
+
+class SqliteJobLinkQueue(WorkQueue):
+    """The links are claimed freshest first: the ones never scraped by when
+    they were first seen, newest first, then the ones re-queued to be scraped
+    again by when they were last seen, so that a run that cannot go through
+    the whole queue gets the job offers least likely to have expired.
+    """
+
+    QUEUE_TABLE_NAME = "job_link_queue"
+    STATUS_TABLE_NAME = "job_link_status"
+
+    def __init__(
+        self,
+        db_file_location: pathlib.Path,
+        retry_delay_seconds: float = 3600,
+        max_retry_delay_seconds: float = 7 * 24 * 3600,
+        max_attempts: int = 5,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        db_file_location : pathlib.Path
+            The database with the job links
+        retry_delay_seconds : float
+            The delay before a link is retried after its first transient failure.
+            The delay doubles after every following failure.
+        max_retry_delay_seconds : float
+            The longest delay before a link is retried
+        max_attempts : int
+            The number of transient failures after which a link is given up on
+        """
+        # the coordinator calls the queue from the threads serving the workers
+        self.connection = connect(db_file_location, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.retry_delay_seconds = retry_delay_seconds
+        self.max_retry_delay_seconds = max_retry_delay_seconds
+        self.max_attempts = max_attempts
+        create_links_table(self.connection)
+        table = SqliteJobLinkQueue.QUEUE_TABLE_NAME
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id TEXT PRIMARY KEY,
+                website_identifier TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                completed_at REAL,
+                rescrape INTEGER NOT NULL DEFAULT 0,
+                seen_at INTEGER,
+                FOREIGN KEY (id) REFERENCES job_links(id)
+            )
+            """)
+        add_missing_columns(
+            self.connection,
+            table,
+            {"rescrape": "INTEGER NOT NULL DEFAULT 0", "seen_at": "INTEGER"},
         )
+        self.connection.execute(f"""
+            CREATE INDEX IF NOT EXISTS {table}_claimable
+            ON {table} (website_identifier, status, lease_expires_at)
+            """)
+        # the order in which the pending links are claimed
+        self.connection.execute(f"""
+            CREATE INDEX IF NOT EXISTS {table}_priority
+            ON {table} (website_identifier, status, rescrape, seen_at DESC)
+            """)
+        self.connection.execute(f"""
+            CREATE INDEX IF NOT EXISTS {table}_worker ON {table} (worker_id)
+            """)
+        # 'expired' and 'failed' links are tombstones, 'retry' links wait
+        # until `next_retry_at`
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SqliteJobLinkQueue.STATUS_TABLE_NAME} (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_retry_at REAL,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                FOREIGN KEY (id) REFERENCES job_links(id)
+            )
+            """)
         self.connection.commit()
 
-        n_duplicates: int = len(job_details_batch) - result.rowcount
+    def __enter__(self) -> "SqliteJobLinkQueue":
+        return self
 
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> typing.Literal[False]:
+        self.connection.close()
+        return False
+
+    def enqueue(self, website_identifier: WebsiteIdentifier) -> int:
+        """Adds the saved links that have never been queued,
+        except the duplicates saved before the canonical URLs
+        """
+        with self.lock:
+            result = self.connection.execute(
+                f"""INSERT OR IGNORE INTO {SqliteJobLinkQueue.QUEUE_TABLE_NAME}
+                (id, website_identifier, seen_at)
+                SELECT id, website_identifier, first_seen
+                FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME}
+                WHERE website_identifier = ? AND canonical_url IS NOT NULL""",
+                (website_identifier.value,),
+            )
+            self.connection.commit()
         logging.info(
-            f"Saved {result.rowcount} new job links ({n_duplicates} duplicates)"
+            "Queued %i new %s links", result.rowcount, website_identifier.value
         )
+        return result.rowcount
 
-        cursor.close()
+    def requeue_done(self, website_identifier: WebsiteIdentifier) -> int:
+        """Puts the links whose details have already been scraped back in the queue,
+        after the ones never scraped
+        """
+        queue = SqliteJobLinkQueue.QUEUE_TABLE_NAME
+        with self.lock:
+            result = self.connection.execute(
+                f"""UPDATE {queue}
+                SET status = 'pending', completed_at = NULL, rescrape = 1,
+                    seen_at = (
+                        SELECT last_seen
+                        FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME} l
+                        WHERE l.id = {queue}.id
+                    )
+                WHERE website_identifier = ? AND status = 'done'""",
+                (website_identifier.value,),
+            )
+            self.connection.commit()
+        logging.info(
+            "Re-queued %i scraped %s links", result.rowcount, website_identifier.value
+        )
+        return result.rowcount
+
+    def claim(
+        self,
+        website_identifier: WebsiteIdentifier,
+        worker_id: str,
+        batch_size: typing.Annotated[int, Ge(0)],
+        lease_seconds: float,
+    ) -> typing.Tuple[JobLink, ...]:
+        """Leases up to `batch_size` pending links, or links whose lease has
+        expired, to the worker, freshest first. The links are picked and leased
+        in a single transaction, so two workers never claim the same link.
+        """
+        now = time.time()
+        queue = SqliteJobLinkQueue.QUEUE_TABLE_NAME
+        with self.lock:
+            # the expired leases are made pending first, so that the pending
+            # links can be picked in the order of the priority index
+            self.connection.execute(
+                f"""UPDATE {queue}
+                SET status = 'pending', worker_id = NULL, lease_expires_at = NULL
+                WHERE website_identifier = ? AND status = 'leased'
+                AND lease_expires_at < ?""",
+                (website_identifier.value, now),
+            )
+            claimed_ids = self.connection.execute(
+                f"""UPDATE {queue}
+                SET status = 'leased', worker_id = ?, lease_expires_at = ?,
+                    attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM {queue}
+                    WHERE website_identifier = ? AND status = 'pending'
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {SqliteJobLinkQueue.STATUS_TABLE_NAME} s
+                        WHERE s.id = {queue}.id
+                        AND (s.status != 'retry' OR s.next_retry_at > ?)
+                    )
+                    ORDER BY rescrape, seen_at DESC
+                    LIMIT ?
+                )
+                RETURNING id""",
+                (
+                    worker_id,
+                    now + lease_seconds,
+                    website_identifier.value,
+                    now,
+                    batch_size,
+                ),
+            ).fetchall()
+            self.connection.commit()
+
+            cursor = self.connection.cursor()
+            cursor.row_factory = job_link_row
+            links: typing.List[JobLink] = cursor.execute(
+                f"""SELECT id, title, link, website_identifier
+                FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME}
+                WHERE id IN ({", ".join("?" * len(claimed_ids))})""",
+                tuple(id_ for (id_,) in claimed_ids),
+            ).fetchall()
+            cursor.close()
+
+        logging.info("Worker %s claimed %i links", worker_id, len(links))
+        return tuple(links)
+
+    def heartbeat(self, worker_id: str, lease_seconds: float) -> int:
+        """Extends the leases of all links held by the worker"""
+        with self.lock:
+            result = self.connection.execute(
+                f"""UPDATE {SqliteJobLinkQueue.QUEUE_TABLE_NAME}
+                SET lease_expires_at = ?
+                WHERE worker_id = ? AND status = 'leased'""",
+                (time.time() + lease_seconds, worker_id),
+            )
+            self.connection.commit()
+        return result.rowcount
+
+    def complete(self, worker_id: str, ids: typing.Tuple[str, ...]) -> int:
+        with self.lock:
+            self.connection.executemany(
+                f"DELETE FROM {SqliteJobLinkQueue.STATUS_TABLE_NAME} WHERE id = ?",
+                [(id_,) for id_ in ids],
+            )
+            self.connection.commit()
+        return self._finish(worker_id, ids, "done", time.time())
+
+    def fail(self, worker_id: str, failures: typing.Tuple[ScrapingFailure, ...]) -> int:
+        """Tombstones the links that failed permanently, and schedules
+        the other failed links for a retry with an exponential backoff
+        """
+        now = time.time()
+        status_table = SqliteJobLinkQueue.STATUS_TABLE_NAME
+        permanent = [failure for failure in failures if failure.permanent]
+        transient = [failure for failure in failures if not failure.permanent]
+        with self.lock:
+            self.connection.executemany(
+                f"""INSERT INTO {status_table} VALUES(?, 'expired', 1, NULL, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                status = 'expired',
+                attempts = attempts + 1,
+                next_retry_at = NULL,
+                last_error = excluded.last_error,
+                updated_at = excluded.updated_at
+                """,
+                [(failure.id, failure.reason, now) for failure in permanent],
+            )
+            # `attempts` on the right-hand side is the number of previous attempts
+            self.connection.executemany(
+                f"""INSERT INTO {status_table} VALUES(
+                    :id, CASE WHEN :max_attempts <= 1 THEN 'failed' ELSE 'retry' END,
+                    1, :now + :delay, :reason, :now
+                )
+                ON CONFLICT(id) DO UPDATE SET
+                status = CASE
+                    WHEN attempts + 1 >= :max_attempts THEN 'failed' ELSE 'retry'
+                END,
+                attempts = attempts + 1,
+                next_retry_at = :now + MIN(:delay * (1 << attempts), :max_delay),
+                last_error = excluded.last_error,
+                updated_at = excluded.updated_at
+                """,
+                [
+                    {
+                        "id": failure.id,
+                        "reason": failure.reason,
+                        "now": now,
+                        "delay": self.retry_delay_seconds,
+                        "max_delay": self.max_retry_delay_seconds,
+                        "max_attempts": self.max_attempts,
+                    }
+                    for failure in transient
+                ],
+            )
+            self.connection.commit()
+
+        logging.info(
+            "Recorded %i expired links and %i links to retry",
+            len(permanent),
+            len(transient),
+        )
+        return self._finish(
+            worker_id, tuple(failure.id for failure in permanent), "done", now
+        ) + self._finish(
+            worker_id, tuple(failure.id for failure in transient), "pending", None
+        )
+
+    def release(self, worker_id: str, ids: typing.Tuple[str, ...]) -> int:
+        """Gives the links back to the queue without completing them"""
+        return self._finish(worker_id, ids, "pending", None)
+
+    def reclaim_expired(self) -> int:
+        """Returns the links whose lease has expired to the queue"""
+        with self.lock:
+            result = self.connection.execute(
+                f"""UPDATE {SqliteJobLinkQueue.QUEUE_TABLE_NAME}
+                SET status = 'pending', worker_id = NULL, lease_expires_at = NULL
+                WHERE status = 'leased' AND lease_expires_at < ?""",
+                (time.time(),),
+            )
+            self.connection.commit()
+        if result.rowcount > 0:
+            logging.warning("Reclaimed %i links with expired leases", result.rowcount)
+        return result.rowcount
+
+    def _finish(
+        self,
+        worker_id: str,
+        ids: typing.Tuple[str, ...],
+        status: str,
+        completed_at: float | None,
+    ) -> int:
+        with self.lock:
+            result = self.connection.executemany(
+                f"""UPDATE {SqliteJobLinkQueue.QUEUE_TABLE_NAME}
+                SET status = ?, completed_at = ?,
+                    worker_id = NULL, lease_expires_at = NULL
+                WHERE id = ? AND worker_id = ? AND status = 'leased'""",
+                [(status, completed_at, id_, worker_id) for id_ in ids],
+            )
+            self.connection.commit()
+        return result.rowcount
@@ -0,0 +1,251 @@
+import collections
+import contextlib
+import cProfile
+import dataclasses
+import logging
+import os
+import pathlib
+import pstats
+import sys
+import threading
+import time
+import typing
+
+PAGE_ITERATION = "page_iteration"
+LINK_EXTRACTION = "link_extraction"
+FETCH = "fetch"
+PARSE = "parse"
+REPOSITORY_WRITE = "repository_write"
+STAGES = (PAGE_ITERATION, LINK_EXTRACTION, FETCH, PARSE, REPOSITORY_WRITE)
+
+T = typing.TypeVar("T")
+R = typing.TypeVar("R")
+
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    """The code marks its stages with `profiling.stage(...)`, which does nothing
+    unless profiling is configured. When it is, the stages of every Nth batch
+    are profiled, and each process writes to the output directory:
+
+    - `<stage>.<pid>.collapsed`: the stacks sampled in the stage, in the
+      collapsed format of flamegraph.pl and speedscope, with the stage as
+      the root frame, so that the files of all stages and processes can be
+      concatenated into one flamegraph
+    - `<stage>.<pid>.prof`: with the `cprofile` mode, the `pstats` of the stage
+    """
+
+    output_dir: pathlib.Path
+    stages: typing.FrozenSet[str] = frozenset(STAGES)
+    mode: typing.Literal["sampling", "cprofile"] = "sampling"
+    """With `cprofile`, the stages are also deterministically profiled,
+    which is slower, and sees one thread at a time"""
+    every_nth_batch: int = 1
+    sample_interval_seconds: float = 0.005
+
+
+class _Profiler:
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.batch_index = -1
+        # whether the batch of each thread is profiled, as the jobs of the daemon
+        # run their batches in threads of their own
+        self.batch_thread = threading.local()
+        # the innermost profiled stage of each thread
+        self.active: typing.Dict[int, str] = {}
+        self.stacks: typing.Dict[str, typing.Counter[str]] = collections.defaultdict(
+            collections.Counter
+        )
+        self.stats: typing.Dict[str, pstats.Stats] = {}
+        self.profiling_thread = threading.local()
+        self.sampler = threading.Thread(
+            target=self._sample, name="profiling-sampler", daemon=True
+        )
+        self.sampler.start()
+
+    @property
+    def sampled(self) -> bool:
+        """Whether the batch of the current thread is profiled"""
+        return bool(getattr(self.batch_thread, "sampled", True))
+
+    @sampled.setter
+    def sampled(self, sampled: bool) -> None:
+        self.batch_thread.sampled = sampled
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> typing.Iterator[None]:
+        thread = threading.get_ident()
+        outer = self.active.get(thread)
+        self.active[thread] = name
+        profile = self._start_profile() if self.settings.mode == "cprofile" else None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                self._stop_profile(name, profile)
+            if outer is None:
+                del self.active[thread]
+            else:
+                self.active[thread] = outer
+
+    def flush(self) -> None:
+        """Writes the profiles collected so far, replacing the older files"""
+        directory = self.settings.output_dir
+        directory.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        with self.lock:
+            stacks = {name: counter.copy() for name, counter in self.stacks.items()}
+            for name, stats in self.stats.items():
+                stats.dump_stats(directory / f"{name}.{pid}.prof")
+        for name, counter in stacks.items():
+            with open(directory / f"{name}.{pid}.collapsed", "w") as collapsed:
+                for stack, count in counter.items():
+                    collapsed.write(f"{stack} {count}\n")
+
+    def _start_profile(self) -> cProfile.Profile | None:
+        # a thread runs one profile at a time, and since Python 3.12,
+        # a process too, so the stages that overlap are not profiled
+        if getattr(self.profiling_thread, "busy", False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None
+        self.profiling_thread.busy = True
+        return profile
+
+    def _stop_profile(self, name: str, profile: cProfile.Profile) -> None:
+        profile.disable()
+        self.profiling_thread.busy = False
+        with self.lock:
+            if name in self.stats:
+                self.stats[name].add(profile)
+            else:
+                self.stats[name] = pstats.Stats(profile)
+
+    def _sample(self) -> None:
+        while True:
+            time.sleep(self.settings.sample_interval_seconds)
+            if not self.active:
+                continue
+            frames = sys._current_frames()
+            with self.lock:
+                for thread, name in list(self.active.items()):
+                    if (frame := frames.get(thread)) is not None:
+                        self.stacks[name][_collapse(name, frame)] += 1
+
+
+def _collapse(stage: str, frame: typing.Any) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ";".join((stage, *reversed(names)))
+
+
+_profiler: _Profiler | None = None
+
+
+def configure(settings: Settings | None) -> None:
+    """Switches the profiling on in this process, e.g. in the initializer
+    of a pool of processes, with the settings of the parent process
+    """
+    global _profiler
+    # a forked process inherits the profiles, but not the sampling thread
+    if settings is None or (_profiler is not None and _profiler.pid == os.getpid()):
+        return
+    _profiler = _Profiler(settings)
+    logging.info(
+        "Profiling %s of every %i. batch to %s",
+        ", ".join(sorted(settings.stages)),
+        settings.every_nth_batch,
+        settings.output_dir,
+    )
+
+
+def settings() -> Settings | None:
+    """The settings of this process, to configure other processes with"""
+    return _profiler.settings if _profiler is not None else None
+
+
+def is_sampled() -> bool:
+    """Whether the batch of the current thread is profiled"""
+    return _profiler is not None and _profiler.sampled
+
+
+def in_batch(function: typing.Callable[[T], R]) -> typing.Callable[[T], R]:
+    """Wraps the function, so that it is profiled as part of the batch of the
+    current thread when it is called in another one, e.g. of a pool
+    """
+    if _profiler is None:
+        return function
+    profiler, sampled = _profiler, _profiler.sampled
+
+    def in_sampled_batch(argument: T) -> R:
+        outer = profiler.sampled
+        profiler.sampled = sampled
+        try:
+            return function(argument)
+        finally:
+            profiler.sampled = outer
+
+    return in_sampled_batch
+
+
+@contextlib.contextmanager
+def stage(name: str) -> typing.Iterator[None]:
+    """Profiles the block as the given stage, if profiling is on,
+    the stage was chosen, and the current batch is profiled
+    """
+    if (
+        _profiler is None
+        or not _profiler.sampled
+        or name not in _profiler.settings.stages
+    ):
+        yield
+        return
+    with _profiler.stage(name):
+        yield
+
+
+def iterate(name: str, iterable: typing.Iterable[T]) -> typing.Iterator[T]:
+    """Profiles the retrieval of every item of a lazy iterable as the stage"""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+@contextlib.contextmanager
+def batch(sampled: bool | None = None) -> typing.Iterator[None]:
+    """Marks a batch, so that only every Nth batch is profiled,
+    unless `sampled` says whether it is, e.g. in a worker process.
+    The profiles are written after every profiled batch,
+    so that they survive runs that are interrupted.
+    """
+    if _profiler is None:
+        yield
+        return
+    if sampled is None:
+        with _profiler.lock:
+            _profiler.batch_index += 1
+            sampled = _profiler.batch_index % _profiler.settings.every_nth_batch == 0
+    _profiler.sampled = sampled
+    try:
+        yield
+    finally:
+        if sampled:
+            _profiler.flush()
+
+
+def flush() -> None:
+    if _profiler is not None:
+        _profiler.flush()
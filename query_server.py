@@ -0,0 +1,372 @@
+import collections
+import contextlib
+import dataclasses
+import datetime
+import hashlib
+import http
+import http.server
+import json
+import logging
+import pathlib
+import queue
+import sqlite3
+import threading
+import typing
+import urllib.parse
+
+from models import (
+    WEBSITE_IDENTIFIERS,
+    JobDetails,
+    JobLink,
+    WebsiteIdentifier,
+    format_timestamp,
+)
+from persistence.sqlite import (
+    DETAILS_COLUMNS,
+    SqliteJobDetailsRepository,
+    SqliteJobLinkRepository,
+    job_details_row,
+    job_link_row,
+)
+
+
+class Response(typing.NamedTuple):
+    status: http.HTTPStatus
+    body: bytes
+    etag: str
+
+
+class ConnectionPool:
+    """Read-only connections to the database, opened when first needed, and
+    handed to one thread at a time. In the WAL mode, they read the last
+    committed data without blocking the writers, or being blocked by them.
+    """
+
+    def __init__(
+        self, open_connection: typing.Callable[[], sqlite3.Connection], size: int
+    ) -> None:
+        self.open_connection = open_connection
+        self.idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self.available = threading.BoundedSemaphore(size)
+
+    @contextlib.contextmanager
+    def connection(self) -> typing.Iterator[sqlite3.Connection]:
+        with self.available:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                connection = self.open_connection()
+            try:
+                yield connection
+            finally:
+                self.idle.put(connection)
+
+    def close(self) -> None:
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+class ResponseCache:
+    """The least recently used responses, all dropped when the database
+    is written to, which `PRAGMA data_version` tells
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.version: typing.Tuple[int, ...] = ()
+        self.responses: collections.OrderedDict[str, Response] = (
+            collections.OrderedDict()
+        )
+
+    def get(self, key: str, version: typing.Tuple[int, ...]) -> Response | None:
+        with self.lock:
+            if version != self.version:
+                self.responses.clear()
+                self.version = version
+                return None
+            response = self.responses.get(key)
+            if response is not None:
+                self.responses.move_to_end(key)
+            return response
+
+    def put(
+        self, key: str, version: typing.Tuple[int, ...], response: Response
+    ) -> None:
+        with self.lock:
+            if version != self.version or self.max_size == 0:
+                return
+            self.responses[key] = response
+            if len(self.responses) > self.max_size:
+                self.responses.popitem(last=False)
+
+
+class QueryServer:
+    """Serves the links and the details of the database as JSON over HTTP:
+
+    - `/links/<id>` and `/details/<id>`
+    - `/links?website=...&limit=...&offset=...`, the newest first
+    - `/details?website=...&since=...&until=...&limit=...&offset=...`,
+      the latest scraped first, between ISO 8601 dates or times, in UTC
+      unless they have an offset
+    - `/count?website=...`, the number of links
+
+    The responses carry an `ETag`, and a request with a matching
+    `If-None-Match` gets a `304 Not Modified` without the body.
+    """
+
+    def __init__(
+        self,
+        db_file_location: pathlib.Path,
+        sharded: bool = False,
+        connections: int = 4,
+        cache_size: int = 1024,
+        max_page_size: int = 500,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        db_file_location : pathlib.Path
+            The database, or next to which the databases of the websites are
+        sharded : bool
+            Read the databases of the websites through a view uniting them
+        connections : int
+            The number of queries run at once
+        cache_size : int
+            The number of responses cached until the next write
+        max_page_size : int
+            The largest `limit` of the listings
+        """
+        self.db_file_location = db_file_location
+        self.sharded = sharded
+        self.max_page_size = max_page_size
+        self.pool = ConnectionPool(self._open_connection, connections)
+        self.cache = ResponseCache(cache_size)
+        # the connection telling whether the database has been written to,
+        # as its data version only changes with the commits of the others
+        self.version_lock = threading.Lock()
+        self.version_connection = self._open_connection()
+        self.schemas = [
+            row[1]
+            for row in self.version_connection.execute("PRAGMA database_list")
+            if row[1] != "temp" and (not sharded or row[1] != "main")
+        ]
+
+    def respond(self, target: str) -> Response:
+        """The response to a GET request, with a JSON body"""
+        version = self._data_version()
+        cached = self.cache.get(target, version)
+        if cached is not None:
+            return cached
+        url = urllib.parse.urlsplit(target)
+        parameters = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            status, body = self._route(
+                [
+                    urllib.parse.unquote(segment)
+                    for segment in url.path.rstrip("/").split("/")[1:]
+                ],
+                parameters,
+            )
+        except ValueError as e:
+            status, body = http.HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        encoded = json.dumps(body, ensure_ascii=False, default=_json_default).encode()
+        response = Response(
+            status,
+            encoded,
+            f'"{hashlib.blake2b(encoded, digest_size=16).hexdigest()}"',
+        )
+        if status == http.HTTPStatus.OK:
+            self.cache.put(target, version, response)
+        return response
+
+    def serve(self, address: typing.Tuple[str, int]) -> None:
+        """Serves the requests, each in its own thread, until interrupted"""
+        handler = type("Handler", (_Handler,), {"query_server": self})
+        with http.server.ThreadingHTTPServer(address, handler) as server:
+            logging.info("Serving the database at http://%s:%i", *address)
+            try:
+                server.serve_forever()
+            finally:
+                self.pool.close()
+                self.version_connection.close()
+
+    def _route(
+        self, path: typing.List[str], parameters: typing.Dict[str, str]
+    ) -> typing.Tuple[http.HTTPStatus, typing.Any]:
+        match path:
+            case ["links", id_]:
+                return _found(self._link(id_))
+            case ["details", id_]:
+                return _found(self._details(id_))
+            case ["links"]:
+                return http.HTTPStatus.OK, self._links(parameters)
+            case ["details"]:
+                return http.HTTPStatus.OK, self._latest_details(parameters)
+            case ["count"]:
+                website = _website(parameters)
+                with self.pool.connection() as connection:
+                    count = SqliteJobLinkRepository.reader(connection).count(website)
+                return http.HTTPStatus.OK, {"website": website, "count": count}
+        return http.HTTPStatus.NOT_FOUND, {"error": "Not found"}
+
+    def _link(self, id_: str) -> JobLink | None:
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.row_factory = job_link_row
+            link: JobLink | None = cursor.execute(
+                f"""SELECT id, title, link, website_identifier
+                FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME} WHERE id = ?""",
+                (id_,),
+            ).fetchone()
+        return link
+
+    def _details(self, id_: str) -> JobDetails | None:
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.row_factory = job_details_row
+            details: JobDetails | None = cursor.execute(
+                f"""SELECT {DETAILS_COLUMNS}
+                FROM {SqliteJobDetailsRepository.DETAILS_TABLE_NAME} details
+                WHERE id = ?""",
+                (id_,),
+            ).fetchone()
+        return details
+
+    def _links(self, parameters: typing.Dict[str, str]) -> typing.Dict[str, typing.Any]:
+        website = _website(parameters)
+        limit, offset = self._page(parameters)
+        with self.pool.connection() as connection:
+            links = SqliteJobLinkRepository.reader(connection).get_batch(
+                website, limit, offset
+            )
+        return {"limit": limit, "offset": offset, "items": links}
+
+    def _latest_details(
+        self, parameters: typing.Dict[str, str]
+    ) -> typing.Dict[str, typing.Any]:
+        limit, offset = self._page(parameters)
+        # compared in UTC, as the dates are stored in the timezone of the writer
+        conditions = ["true"]
+        arguments: typing.List[typing.Any] = []
+        for parameter, operator in (("since", ">="), ("until", "<")):
+            if parameter in parameters:
+                conditions.append(
+                    f"julianday(details.access_date) {operator} julianday(?)"
+                )
+                arguments.append(_moment(parameters, parameter))
+        if "website" in parameters:
+            conditions.append(f"""details.id IN (
+                    SELECT id FROM {SqliteJobLinkRepository.LINKS_TABLE_NAME}
+                    WHERE website_identifier = ?
+                )""")
+            arguments.append(_website(parameters).value)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.row_factory = job_details_row
+            details: typing.List[JobDetails] = cursor.execute(
+                f"""SELECT {DETAILS_COLUMNS}
+                FROM {SqliteJobDetailsRepository.DETAILS_TABLE_NAME} details
+                WHERE {" AND ".join(conditions)}
+                ORDER BY julianday(details.access_date) DESC
+                LIMIT ? OFFSET ?""",
+                (*arguments, limit, offset),
+            ).fetchall()
+        return {"limit": limit, "offset": offset, "items": details}
+
+    def _page(self, parameters: typing.Dict[str, str]) -> typing.Tuple[int, int]:
+        limit = int(parameters.get("limit", 100))
+        offset = int(parameters.get("offset", 0))
+        if not 0 <= limit <= self.max_page_size or offset < 0:
+            raise ValueError(
+                f"The limit is from 0 to {self.max_page_size},"
+                " and the offset is not negative"
+            )
+        return limit, offset
+
+    def _data_version(self) -> typing.Tuple[int, ...]:
+        with self.version_lock:
+            return tuple(
+                self.version_connection.execute(
+                    f'PRAGMA "{schema}".data_version'
+                ).fetchone()[0]
+                for schema in self.schemas
+            )
+
+    def _open_connection(self) -> sqlite3.Connection:
+        if self.sharded:
+            # SqliteShardView attaches the databases read-only
+            from persistence.shards import SqliteShardView
+
+            return SqliteShardView(self.db_file_location).connection
+        return sqlite3.connect(
+            f"file:{urllib.parse.quote(str(self.db_file_location.resolve()))}"
+            "?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    query_server: QueryServer
+
+    def do_GET(self) -> None:
+        status, body, etag = self.query_server.respond(self.path)
+        if status == http.HTTPStatus.OK and etag in self.headers.get(
+            "If-None-Match", ""
+        ):
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: typing.Any) -> None:
+        logging.debug(format, *args)
+
+
+def _found(
+    item: JobLink | JobDetails | None,
+) -> typing.Tuple[http.HTTPStatus, typing.Any]:
+    if item is None:
+        return http.HTTPStatus.NOT_FOUND, {"error": "Not found"}
+    return http.HTTPStatus.OK, item
+
+
+def _website(parameters: typing.Dict[str, str]) -> WebsiteIdentifier:
+    website = parameters.get("website")
+    if website not in WEBSITE_IDENTIFIERS:
+        raise ValueError(
+            f"The website is one of {', '.join(WEBSITE_IDENTIFIERS)}, not {website}"
+        )
+    return WEBSITE_IDENTIFIERS[website]
+
+
+def _moment(parameters: typing.Dict[str, str], parameter: str) -> str:
+    """The ISO 8601 date or time of the parameter, in UTC unless it has
+    an offset, as SQLite reads it
+    """
+    try:
+        moment = datetime.datetime.fromisoformat(parameters[parameter])
+    except ValueError:
+        raise ValueError(
+            f"The {parameter} is an ISO 8601 date or time,"
+            f" not {parameters[parameter]}"
+        )
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.isoformat()
+
+
+def _json_default(value: typing.Any) -> typing.Any:
+    if isinstance(value, WebsiteIdentifier):
+        return value.value
+    fields = dataclasses.asdict(value)
+    if isinstance(value, JobDetails):
+        fields["access_date"] = format_timestamp(value.access_date)
+    return fields
@@ -0,0 +1,94 @@
+import importlib
+import typing
+
+from crawlers.strategy import LinkCrawlingStrategy
+from models import WebsiteIdentifier
+from scrapers.strategy import DetailScrapingStrategy
+
+if typing.TYPE_CHECKING:
+    from config import ApplictionConfig
+
+T = typing.TypeVar("T")
+
+
+class StrategyRegistry(typing.Generic[T]):
+    """Records the strategies available for each website by name, and imports
+    them only when they are loaded, so that e.g. Selenium is never imported
+    by a command that does not use a browser.
+
+    Every strategy is registered as the import path of its factory,
+    `"package.module:function"`, where the function takes the application
+    config and returns the strategy.
+    """
+
+    def __init__(self, kind: str) -> None:
+        self.kind = kind
+        self._factories: typing.Dict[WebsiteIdentifier, typing.Dict[str, str]] = {}
+
+    def register(self, website: WebsiteIdentifier, name: str, factory: str) -> None:
+        self._factories.setdefault(website, {})[name] = factory
+
+    def names(self, website: WebsiteIdentifier) -> typing.Tuple[str, ...]:
+        return tuple(self._factories.get(website, {}))
+
+    def load(
+        self, website: WebsiteIdentifier, name: str
+    ) -> typing.Callable[["ApplictionConfig"], T]:
+        """Imports the module of the strategy and returns its factory"""
+        try:
+            factory = self._factories[website][name]
+        except KeyError:
+            raise ValueError(
+                f"Unknown {self.kind} strategy `{name}` for {website.value}."
+                f" Available: {', '.join(self.names(website)) or 'none'}"
+            )
+
+        module_name, _, attribute = factory.partition(":")
+        return typing.cast(
+            typing.Callable[["ApplictionConfig"], T],
+            getattr(importlib.import_module(module_name), attribute),
+        )
+
+    def build(
+        self,
+        selection: typing.Mapping[WebsiteIdentifier, str],
+        config: "ApplictionConfig",
+    ) -> typing.Generator[T, None, None]:
+        """Lazily builds the selected strategy of every website in `selection`"""
+        for website, name in selection.items():
+            yield self.load(website, name)(config)
+
+
+CRAWLERS: StrategyRegistry[LinkCrawlingStrategy] = StrategyRegistry("crawler")
+CRAWLERS.register(
+    WebsiteIdentifier.SARAMIN,
+    "selenium_sequential",
+    "crawlers.strategies.saramin:init_saramin_selenium_sequential_crawler",
+)
+CRAWLERS.register(
+    WebsiteIdentifier.CAREERVIET,
+    "selenium_sequential",
+    "crawlers.strategies.careerviet:init_careerviet_selenium_sequential_crawler",
+)
+
+SCRAPERS: StrategyRegistry[DetailScrapingStrategy] = StrategyRegistry("scraper")
+SCRAPERS.register(
+    WebsiteIdentifier.SARAMIN,
+    "selenium_sequential",
+    "scrapers.strategies.saramin:init_saramin_selenium_sequential_scraper",
+)
+SCRAPERS.register(
+    WebsiteIdentifier.SARAMIN,
+    "selenium_tabs",
+    "scrapers.strategies.saramin:init_saramin_selenium_tabs_scraper",
+)
+SCRAPERS.register(
+    WebsiteIdentifier.CAREERVIET,
+    "requests_sequential",
+    "scrapers.strategies.careerviet:init_careerviet_requests_sequential_scraper",
+)
+SCRAPERS.register(
+    WebsiteIdentifier.CAREERVIET,
+    "requests_parallel",
+    "scrapers.strategies.careerviet:init_careerviet_requests_parallel_scraper",
+)
@@ -0,0 +1,94 @@
+import contextlib
+import dataclasses
+import logging
+import random
+import threading
+import time
+import typing
+
+
+@dataclasses.dataclass(frozen=True)
+class Job:
+    name: str
+    interval_seconds: float
+    run: typing.Callable[[], None]
+
+
+class Scheduler:
+    """Runs every job in its own thread, again and again, `interval_seconds`
+    after the start of its previous run, plus a random jitter, so that the
+    jobs do not all hit the websites at the same time. A run that takes longer
+    than the interval delays the next one, so the runs of a job never overlap.
+    """
+
+    def __init__(
+        self,
+        jobs: typing.Sequence[Job],
+        jitter_seconds: float = 0,
+        thread_context: typing.Callable[
+            [], typing.ContextManager[None]
+        ] = contextlib.nullcontext,
+        stopping: typing.Optional[threading.Event] = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        jobs : Sequence[Job]
+        jitter_seconds : float
+            The largest random delay added to every interval,
+            and before the first run of every job
+        thread_context : Callable[[], ContextManager[None]]
+            Entered once by every job thread around all its runs,
+            e.g. to keep the resources of the job open between the runs
+        stopping : threading.Event, optional
+            Set when the scheduler stops, before it waits for the runs
+            in progress, e.g. for the jobs to cut their runs short
+        """
+        self.jobs = jobs
+        self.jitter_seconds = jitter_seconds
+        self.thread_context = thread_context
+        self.stopping = stopping if stopping is not None else threading.Event()
+
+    def run(self) -> None:
+        """Runs the jobs until `stop` is called, or until interrupted,
+        and then waits for the runs in progress to finish
+        """
+        threads = [
+            threading.Thread(target=self._loop, args=(job,), name=job.name)
+            for job in self.jobs
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self.stopping.wait()
+        except KeyboardInterrupt:
+            self.stop()
+        finally:
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+    def stop(self) -> None:
+        logging.info("Stopping after the runs in progress")
+        self.stopping.set()
+
+    def _loop(self, job: Job) -> None:
+        with self.thread_context():
+            delay = random.uniform(0, self.jitter_seconds)
+            while not self.stopping.wait(delay):
+                logging.info("Running the %s job", job.name)
+                started = time.monotonic()
+                try:
+                    job.run()
+                except Exception:
+                    logging.exception("The %s job failed", job.name)
+                seconds = time.monotonic() - started
+                delay = max(0, job.interval_seconds - seconds) + random.uniform(
+                    0, self.jitter_seconds
+                )
+                logging.info(
+                    "The %s job took %.0fs, running it again in %.0fs",
+                    job.name,
+                    seconds,
+                    delay,
+                )
@@ -3,7 +3,8 @@ import logging
 
 class PageExpired(Exception):
     def __init__(self, url: str):
-        self.url = str
+        super().__init__(url)
+        self.url = url
 
     def __str__(self):
         return f"The page at {self.url} is no longer available."
@@ -0,0 +1,15 @@
+import typing
+
+
+class MissingFields(ValueError):
+    """A page did not contain the fields required by its extraction spec,
+    because it has an unusual structure or was not fully loaded
+    """
+
+    def __init__(self, url: str, fields: typing.Tuple[str, ...]):
+        super().__init__(url, fields)
+        self.url = url
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return f"The page at {self.url} is missing {', '.join(self.fields)}"
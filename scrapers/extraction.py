@@ -0,0 +1,258 @@
+import dataclasses
+import enum
+import logging
+import threading
+import time
+import typing
+
+from lxml import etree
+
+from models import WebsiteIdentifier
+from scrapers.errors import MissingFields
+
+
+class Extract(enum.Enum):
+    """How the value of a field is taken from the first node matched by its XPath"""
+
+    TEXT = "text"
+    """The text of the element, or of its first child if it has none.
+    Attribute and string XPath results are taken as they are."""
+    TEXT_CONTENT = "text_content"
+    """All the text inside the element, with the whitespace collapsed"""
+    HTML = "html"
+    """The element serialized as HTML"""
+    EXISTS = "exists"
+    """Whether the XPath matched anything"""
+
+
+@dataclasses.dataclass(frozen=True)
+class FieldSpec:
+    name: str
+    selectors: typing.Tuple[str, ...]
+    """The primary XPath, followed by the fallbacks tried in order"""
+    extract: Extract = Extract.TEXT
+    post: typing.Callable[[typing.Any], typing.Any] | None = None
+    """Turns the extracted value into the value of the field. If it raises
+    `ValueError` or `IndexError`, the next selector is tried."""
+    required: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class ExtractionSpec:
+    """Declares which fields to extract from the pages of a website, and how.
+    Adding a website only takes a new spec; the evaluation is shared.
+    """
+
+    website: WebsiteIdentifier
+    fields: typing.Tuple[FieldSpec, ...]
+    stream_until: str | None = None
+    """An XPath matching an element that starts after everything the primary
+    selectors match. Once it has been parsed, a page that is streamed into
+    the parser does not have to be read any further."""
+
+    def compile(self) -> "CompiledSpec":
+        return CompiledSpec(self)
+
+
+@dataclasses.dataclass
+class FieldStats:
+    evaluations: int = 0
+    hits: typing.List[int] = dataclasses.field(default_factory=list)
+    """The number of hits of each selector of the field"""
+    seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return sum(self.hits) / self.evaluations if self.evaluations else 0.0
+
+    def merge(self, other: "FieldStats") -> None:
+        self.evaluations += other.evaluations
+        self.seconds += other.seconds
+        self.hits = [mine + theirs for mine, theirs in zip(self.hits, other.hits)]
+
+
+Extracted = typing.Dict[str, typing.Any]
+
+
+class CompiledSpec:
+    """An extraction spec with its XPaths compiled once, keeping timing and
+    hit-rate counters for every field. Each field is evaluated with its own
+    XPath over the document, and with its fallbacks only when that one misses.
+
+    The counters are shared by the threads extracting with the same spec,
+    and are updated under a lock, once per document.
+    """
+
+    def __init__(self, spec: ExtractionSpec) -> None:
+        self.spec = spec
+        self.xpaths: typing.Tuple[typing.Tuple[etree.XPath, ...], ...] = tuple(
+            tuple(etree.XPath(selector) for selector in field.selectors)
+            for field in spec.fields
+        )
+        self.stream_until: etree.XPath | None = (
+            etree.XPath(spec.stream_until) if spec.stream_until is not None else None
+        )
+        self.lock = threading.Lock()
+        self.stats: typing.Dict[str, FieldStats] = {}
+        self.reset_stats()
+
+    def evaluate(self, dom: etree._Element) -> Extracted:
+        """Extracts the fields from the document, trying the selectors
+        of each field in order. The missing fields are `None`.
+        """
+        values: Extracted = {}
+        hits: typing.List[int | None] = []
+        elapsed: typing.List[float] = []
+        for field, xpaths in zip(self.spec.fields, self.xpaths):
+            start = time.perf_counter()
+            values[field.name] = None
+            hits.append(None)
+            for i, xpath in enumerate(xpaths):
+                value = _extract(xpath(dom), field)
+                if value is not None:
+                    values[field.name] = value
+                    hits[-1] = i
+                    break
+            elapsed.append(time.perf_counter() - start)
+        self._record(hits, elapsed)
+        return values
+
+    def evaluate_stream(
+        self, chunks: typing.Iterator[bytes], encoding: str | None = None
+    ) -> typing.Tuple[Extracted | None, bytes]:
+        """Feeds the chunks of a page into an incremental parser, and stops
+        reading them as soon as the `stream_until` element has been parsed.
+        The fields are then extracted with their primary selectors from
+        the part of the page parsed so far.
+
+        Returns the fields, or `None` if a fallback selector would be needed,
+        or a required field is missing, so that the whole page has to be parsed.
+        Also returns the bytes read, which the rest of the chunks
+        completes into the whole page.
+        """
+        if self.stream_until is None:
+            return None, b"".join(chunks)
+
+        parser = etree.HTMLPullParser(events=("start",), encoding=encoding)
+        read: typing.List[bytes] = []
+        element: etree._Element | None = None
+        for chunk in chunks:
+            read.append(chunk)
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                pass
+            if element is not None and self.stream_until(element.getroottree()):
+                break
+        else:
+            return None, b"".join(read)
+
+        return self._evaluate_primary(parser.close()), b"".join(read)
+
+    def _evaluate_primary(self, dom: etree._Element) -> Extracted | None:
+        values: Extracted = {}
+        elapsed: typing.List[float] = []
+        for field, xpaths in zip(self.spec.fields, self.xpaths):
+            start = time.perf_counter()
+            value = _extract(xpaths[0](dom), field)
+            elapsed.append(time.perf_counter() - start)
+            if value is None and (field.required or len(xpaths) > 1):
+                return None
+            values[field.name] = value
+
+        # only the pages that are not parsed again are counted
+        self._record(
+            [0 if value is not None else None for value in values.values()], elapsed
+        )
+        return values
+
+    def _record(
+        self, hits: typing.List[int | None], elapsed: typing.List[float]
+    ) -> None:
+        """Counts the evaluation of a document: the selector that hit each
+        field, if any, and the time each field took
+        """
+        with self.lock:
+            for field, hit, seconds in zip(self.spec.fields, hits, elapsed):
+                stats = self.stats[field.name]
+                stats.evaluations += 1
+                stats.seconds += seconds
+                if hit is not None:
+                    stats.hits[hit] += 1
+
+    def require(self, values: Extracted, url: str) -> Extracted:
+        """Raises `MissingFields` if any required field is missing"""
+        if missing := tuple(
+            field.name
+            for field in self.spec.fields
+            if field.required and values[field.name] is None
+        ):
+            raise MissingFields(url, missing)
+        return values
+
+    def reset_stats(self) -> typing.Dict[str, FieldStats]:
+        """Starts the counters over, returning their previous values"""
+        with self.lock:
+            previous, self.stats = self.stats, {
+                field.name: FieldStats(hits=[0] * len(field.selectors))
+                for field in self.spec.fields
+            }
+        return previous
+
+    def merge_stats(self, stats: typing.Dict[str, FieldStats]) -> None:
+        """Adds the counters collected by a copy of the spec,
+        e.g. in a worker process
+        """
+        with self.lock:
+            for name, field_stats in stats.items():
+                self.stats[name].merge(field_stats)
+
+    def log_stats(self, level: int = logging.DEBUG) -> None:
+        with self.lock:
+            for name, stats in self.stats.items():
+                logging.log(
+                    level,
+                    "%s field %s: %i evaluations, %.0f%% hit rate (%s by selector),"
+                    " %.3fms per evaluation",
+                    self.spec.website.value,
+                    name,
+                    stats.evaluations,
+                    100 * stats.hit_rate,
+                    "/".join(map(str, stats.hits)),
+                    (
+                        1000 * stats.seconds / stats.evaluations
+                        if stats.evaluations
+                        else 0
+                    ),
+                )
+
+
+def _extract(result: typing.Any, field: FieldSpec) -> typing.Any:
+    if field.extract is Extract.EXISTS:
+        return bool(result)
+
+    if isinstance(result, list):
+        if len(result) == 0:
+            return None
+        result = result[0]
+
+    if isinstance(result, etree._Element):
+        match field.extract:
+            case Extract.TEXT:
+                if (text := result.text) is None:
+                    if len(result) == 0:
+                        return None
+                    text = "".join(result[0].itertext())
+                value: typing.Any = text
+            case Extract.TEXT_CONTENT:
+                value = " ".join("".join(result.itertext()).split())
+            case Extract.HTML:
+                value = etree.tounicode(result)
+    else:
+        value = str(result)
+
+    if field.post is None:
+        return value
+    try:
+        return field.post(value)
+    except (ValueError, IndexError):
+        return None
@@ -0,0 +1,148 @@
+import enum
+import logging
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from models import JobLink, ScrapingFailure, WebsiteIdentifier
+
+# where the websites redirect the links to job offers that are gone
+EXPIRED_LOCATIONS: typing.Dict[WebsiteIdentifier, typing.Tuple[str, ...]] = {
+    WebsiteIdentifier.CAREERVIET: ("/error.html",),
+}
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like"
+        " Gecko) Chrome/58.0.3029.110 Safari/537.3"
+    )
+}
+
+
+class Liveness(enum.Enum):
+    ALIVE = "alive"
+    EXPIRED = "expired"
+    UNKNOWN = "unknown"
+
+
+class LivenessProbe:
+    """Checks many links at once with cheap requests that do not follow
+    redirects, so that the links to expired job offers can be dropped
+    before their pages are downloaded and parsed.
+
+    Only expired links are dropped: the links whose liveness is unknown
+    are passed on, as if they were alive.
+    """
+
+    def __init__(
+        self,
+        website: WebsiteIdentifier,
+        n_workers: int = 32,
+        method: typing.Literal["head", "range"] = "head",
+        timeout: float = 10,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        website : WebsiteIdentifier
+            The website of the probed links
+        n_workers : int
+            The number of links probed at once
+        method : "head" | "range"
+            Probe with HEAD requests, or with GET requests of the first byte,
+            for the servers that do not answer HEAD requests
+        timeout : float
+            Seconds to wait for a response
+        """
+        self.website = website
+        self.method = method
+        self.timeout = timeout
+        self.expired_locations = EXPIRED_LOCATIONS.get(website, ())
+        self.executor = ThreadPoolExecutor(n_workers)
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=n_workers))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=n_workers))
+
+        self.lock = threading.Lock()
+        self.n_probed = 0
+        self.n_expired = 0
+        self.n_unknown = 0
+        self.seconds = 0.0
+
+    def probe(self, link: JobLink) -> Liveness:
+        try:
+            if self.method == "head":
+                response = self.session.head(
+                    link.link, allow_redirects=False, timeout=self.timeout
+                )
+            else:
+                response = self.session.get(
+                    link.link,
+                    allow_redirects=False,
+                    timeout=self.timeout,
+                    headers={"Range": "bytes=0-0"},
+                    stream=True,
+                )
+            response.close()
+        except requests.RequestException as e:
+            logging.debug("Could not probe %s: %s", link.link, e)
+            return Liveness.UNKNOWN
+
+        if response.is_redirect:
+            location = response.headers.get("Location", "")
+            if location.split("?")[0].endswith(self.expired_locations):
+                return Liveness.EXPIRED
+            return Liveness.UNKNOWN
+        if response.status_code in (404, 410):
+            return Liveness.EXPIRED
+        if response.ok:
+            return Liveness.ALIVE
+        return Liveness.UNKNOWN
+
+    def filter(
+        self, links: typing.Tuple[JobLink, ...]
+    ) -> typing.Tuple[typing.Tuple[JobLink, ...], typing.Tuple[ScrapingFailure, ...]]:
+        """Probes the links, and splits them into the links worth scraping,
+        and the failures of the expired links
+        """
+        start = time.perf_counter()
+        liveness = tuple(self.executor.map(self.probe, links))
+        seconds = time.perf_counter() - start
+
+        expired = tuple(
+            ScrapingFailure(link.id, "The job offer has expired (probed)", True)
+            for link, state in zip(links, liveness)
+            if state is Liveness.EXPIRED
+        )
+        n_unknown = sum(state is Liveness.UNKNOWN for state in liveness)
+        with self.lock:
+            self.n_probed += len(links)
+            self.n_expired += len(expired)
+            self.n_unknown += n_unknown
+            self.seconds += seconds
+
+        logging.info(
+            "Probed %i %s links in %.2fs (%.0f links/s): %i expired, %i unknown"
+            " (%i of %i fetches saved so far)",
+            len(links),
+            self.website.value,
+            seconds,
+            len(links) / seconds if seconds > 0 else 0,
+            len(expired),
+            n_unknown,
+            self.n_expired,
+            self.n_probed,
+        )
+        return (
+            tuple(
+                link
+                for link, state in zip(links, liveness)
+                if state is not Liveness.EXPIRED
+            ),
+            expired,
+        )
@@ -1,21 +1,78 @@
 import logging
 import typing
 
-from models import JobDetails, JobLink
+from models import JobDetails, JobLink, ScrapingFailure
+from normalization.urls import canonical_url
 from scrapers.strategy import DetailScrapingStrategy
 
+if typing.TYPE_CHECKING:
+    from scrapers.probe import LivenessProbe
+
+
+class ScrapedBatch(typing.NamedTuple):
+    details: typing.Tuple[JobDetails, ...]
+    failures: typing.Tuple[ScrapingFailure, ...]
+
 
 class DetailScraper:
     strategy: DetailScrapingStrategy
+    probe: "LivenessProbe | None"
 
-    def __init__(self, *, strategy: DetailScrapingStrategy):
+    def __init__(
+        self,
+        *,
+        strategy: DetailScrapingStrategy,
+        probe: "LivenessProbe | None" = None,
+    ):
+        """
+        Parameters
+        ----------
+        strategy : DetailScrapingStrategy
+            Collects the details of the links
+        probe : LivenessProbe, optional
+            Drops the links to expired job offers before the strategy sees them
+        """
         self.strategy = strategy
+        self.probe = probe
 
-    def scrape(
-        self, *, links: typing.Tuple[JobLink, ...]
-    ) -> typing.Tuple[JobDetails, ...]:
+    def scrape(self, *, links: typing.Tuple[JobLink, ...]) -> ScrapedBatch:
         logging.info(
-            "\n--- Scraping details ---\n"
-            f"\n\tScraping job details for {len(links)} links"
+            "\n--- Scraping details ---\n\n\tScraping job details for %i links",
+            len(links),
+        )
+        links = unique_links(links)
+        expired: typing.Tuple[ScrapingFailure, ...] = ()
+        if self.probe is not None:
+            links, expired = self.probe.filter(links)
+
+        results = self.strategy(links=links)
+        return ScrapedBatch(
+            details=tuple(r for r in results if isinstance(r, JobDetails)),
+            failures=expired
+            + tuple(r for r in results if isinstance(r, ScrapingFailure)),
         )
-        return self.strategy(links=links)
+
+
+def unique_links(
+    links: typing.Tuple[JobLink, ...], seen: typing.Optional[typing.Set[str]] = None
+) -> typing.Tuple[JobLink, ...]:
+    """The links without the ones to the same job offer as a previous link,
+    i.e. with the same canonical URL, so that no page is fetched twice.
+
+    Parameters
+    ----------
+    links : Tuple[JobLink, ...]
+    seen : Set[str], optional
+        The canonical URLs of the links of the previous batches,
+        updated with the ones of the returned links
+    """
+    seen = set() if seen is None else seen
+    unique = []
+    for link in links:
+        url = canonical_url(link.link, link.website_identifier)
+        if url not in seen:
+            seen.add(url)
+            unique.append(link)
+    if len(unique) < len(links):
+        logging.info("Skipped %i duplicate links", len(links) - len(unique))
+    return tuple(unique)
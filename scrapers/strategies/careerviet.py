@@ -1,37 +1,231 @@
-import enum
+import atexit
 import logging
 import logging.config
+import multiprocessing
 import re
-from typing import Tuple, cast
+import threading
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from itertools import batched
+from typing import Annotated, Dict, Generator, List, Optional, Tuple
 
 import requests
+from annotated_types import Ge, Gt
 from bs4 import BeautifulSoup
-from lxml import etree, html
+from lxml import etree
 from returns.result import Failure, Result, Success, safe
 
-from models import JobDetails, JobLink, WebsiteIdentifier
+import profiling
+from config import ApplictionConfig
+from models import JobDetails, JobLink, ScrapingFailure, WebsiteIdentifier
 from scrapers import PageExpired
-from scrapers.strategy import detail_scraping_strategy
+from scrapers.errors import MissingFields
+from scrapers.extraction import (
+    Extract,
+    Extracted,
+    ExtractionSpec,
+    FieldSpec,
+    FieldStats,
+)
+from scrapers.strategy import DetailScrapingStrategy, detail_scraping_strategy
+
+ParsedDetails = Tuple[str, str, str, Optional[str], str]
+"""The compact result of the parse stage: title, company, location,
+salary information and description, in the order of the `JobDetails` fields.
+It is a plain tuple, so that it is cheap to send back from a worker process.
+"""
+
+ParsedChunk = Tuple[Tuple[Result[ParsedDetails, Exception], ...], Dict[str, FieldStats]]
+"""The results of a chunk of pages, with the extraction counters of the chunk"""
 
 
 @detail_scraping_strategy(WebsiteIdentifier.CAREERVIET)
-def careerviet_selenium_sequential(
+def careerviet_requests_sequential(
     links: Tuple[JobLink, ...],
-) -> Tuple[JobDetails, ...]:
-    def handle_errors(e: Exception, url: str) -> bool:
-        if isinstance(e, PageExpired):
-            logging.warning(f"{e}; skipping link {url}")
-            return True
-        elif isinstance(e, requests.ReadTimeout):
-            logging.warning(f"{e}; skipping link {url}")
-            return True
-        raise e
-
-    return tuple(
-        cast(JobDetails, res.unwrap())
+) -> Tuple[JobDetails | ScrapingFailure, ...]:
+    scraped = tuple(
+        details_or_failure(
+            fetch_page(link).bind(lambda page: parse_page(link.link, page)), link
+        )
         for link in links
-        if not (res := collect_details(link)).alt(lambda e: handle_errors(e, link.link))
     )
+    COMPILED_SPEC.log_stats()
+    return scraped
+
+
+Executors = Tuple[ThreadPoolExecutor, Optional[ProcessPoolExecutor]]
+
+_shared_executors: Dict[Tuple[int, int], Executors] = {}
+_shared_executors_lock = threading.Lock()
+
+
+def shared_executors(n_fetch_workers: int, n_parse_workers: int) -> Executors:
+    """The pools of threads downloading and of processes parsing the pages,
+    shared by the parallel strategies of the process with the same numbers
+    of workers, so that building a strategy again does not start new ones.
+    The pools are shut down when the process exits.
+    """
+    with _shared_executors_lock:
+        key = (n_fetch_workers, n_parse_workers)
+        if key not in _shared_executors:
+            fetch_executor = ThreadPoolExecutor(n_fetch_workers)
+            parse_executor = (
+                ProcessPoolExecutor(
+                    n_parse_workers,
+                    # forking would copy the locks held by the threads already
+                    # running, e.g. those of the scheduler or of other scrapers
+                    mp_context=multiprocessing.get_context("forkserver"),
+                    # the parsing processes profile the chunks of the profiled
+                    # batches
+                    initializer=profiling.configure,
+                    initargs=(profiling.settings(),),
+                )
+                if n_parse_workers > 0
+                else None
+            )
+            atexit.register(fetch_executor.shutdown, cancel_futures=True)
+            if parse_executor is not None:
+                atexit.register(parse_executor.shutdown, cancel_futures=True)
+            _shared_executors[key] = fetch_executor, parse_executor
+        return _shared_executors[key]
+
+
+def init_careerviet_parallel_scraper(
+    n_fetch_workers: Annotated[int, Gt(0)],
+    n_parse_workers: Annotated[int, Ge(0)],
+    parse_chunksize: Annotated[int, Gt(0)],
+    incremental_parse: bool = False,
+) -> DetailScrapingStrategy:
+    """
+    Parameters
+    ----------
+    n_fetch_workers : int
+        The number of threads downloading the job pages
+    n_parse_workers : int
+        The number of processes parsing the downloaded pages.
+        With 0, the pages are parsed in the calling process.
+    parse_chunksize : int
+        How many downloaded pages are handed off to a parsing process at once
+    incremental_parse : bool
+        Parse the pages in the downloading threads while they are downloaded,
+        and stop downloading them once their fields have been parsed. The pages
+        that need a fallback selector are downloaded in full and handed off
+        to the parsing processes.
+    """
+    fetch_executor, parse_executor = shared_executors(n_fetch_workers, n_parse_workers)
+    fetch = stream_page if incremental_parse else fetch_page
+
+    @detail_scraping_strategy(WebsiteIdentifier.CAREERVIET)
+    def careerviet_requests_parallel(
+        links: Tuple[JobLink, ...],
+    ) -> Tuple[JobDetails | ScrapingFailure, ...]:
+        """
+        Downloads the pages in a pool of threads and, as soon as `parse_chunksize`
+        pages are available, hands them off to a pool of processes for parsing,
+        so that the parsing does not hold the GIL of the downloading threads.
+
+        See the `DetailsScrapingStrategy` protocol
+        definition to get the description of the arguments
+        and the return type
+        """
+        failed_downloads: List[ScrapingFailure] = []
+        streamed: List[JobDetails] = []
+
+        def downloaded() -> Generator[Tuple[JobLink, bytes], None, None]:
+            results = fetch_executor.map(profiling.in_batch(fetch), links)
+            for link, result in zip(links, results):
+                match result:
+                    case Success(bytes() as page):
+                        yield link, page
+                    case Success(parsed):
+                        streamed.append(JobDetails(link.id, *parsed))
+                    case Failure(e):
+                        failed_downloads.append(scraping_failure(e, link))
+
+        parse_jobs = [
+            (chunk, submit_parse(tuple((link.link, page) for link, page in chunk)))
+            for chunk in batched(downloaded(), parse_chunksize)
+        ]
+
+        parsed = [(chunk, *job.result()) for chunk, job in parse_jobs]
+        for _, _, stats in parsed:
+            COMPILED_SPEC.merge_stats(stats)
+        COMPILED_SPEC.log_stats()
+
+        return (
+            tuple(failed_downloads)
+            + tuple(streamed)
+            + tuple(
+                details_or_failure(result, link)
+                for chunk, results, _ in parsed
+                for (link, _), result in zip(chunk, results)
+            )
+        )
+
+    def submit_parse(
+        pages: Tuple[Tuple[str, bytes], ...],
+    ) -> Future[ParsedChunk]:
+        if parse_executor is None:
+            job: Future[ParsedChunk] = Future()
+            job.set_result(parse_pages(pages, profiling.is_sampled()))
+            return job
+        return parse_executor.submit(parse_pages, pages, profiling.is_sampled())
+
+    return careerviet_requests_parallel
+
+
+def init_careerviet_requests_sequential_scraper(
+    config: ApplictionConfig,
+) -> DetailScrapingStrategy:
+    return careerviet_requests_sequential
+
+
+def init_careerviet_requests_parallel_scraper(
+    config: ApplictionConfig,
+) -> DetailScrapingStrategy:
+    return init_careerviet_parallel_scraper(
+        n_fetch_workers=config.scraping.fetch_workers,
+        n_parse_workers=config.scraping.parse_workers,
+        parse_chunksize=config.scraping.parse_chunksize,
+        incremental_parse=config.scraping.incremental_parse,
+    )
+
+
+def details_or_failure(
+    result: Result[ParsedDetails, Exception], link: JobLink
+) -> JobDetails | ScrapingFailure:
+    match result:
+        case Success(parsed):
+            return JobDetails(link.id, *parsed)
+        case Failure(e):
+            return scraping_failure(e, link)
+    raise AssertionError(f"Unexpected result {result}")
+
+
+def scraping_failure(e: Exception, link: JobLink) -> ScrapingFailure:
+    """Records an expected error as a failure, which is permanent if the job
+    offer is gone, and retried later otherwise. Unexpected errors are re-raised.
+    """
+    match e:
+        case PageExpired():
+            permanent = True
+        case requests.HTTPError() if e.response is not None and (
+            e.response.status_code in (404, 410)
+        ):
+            permanent = True
+        case requests.Timeout() | requests.ConnectionError() | requests.HTTPError():
+            permanent = False
+        case MissingFields():
+            # most likely a page that did not load completely, or a new layout
+            permanent = False
+        case _:
+            raise e
+
+    logging.warning("%s; skipping link %s", e, link.link)
+    return ScrapingFailure(link.id, str(e), permanent)
 
 
 HEADERS = {
@@ -42,33 +236,87 @@ HEADERS = {
 }
 
 
-class XPATHS(enum.Enum):
-    TITLE = "/html/head/title"
-    LOCATION = (
-        "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[1]/div/"
-        "div[1]/div/div/p/a"
-    )
-    ALT_LOCATION = (
-        "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[5]/div"
+def split_title(title: str) -> Tuple[str, str]:
+    """Splits the page title into the job title and the company name"""
+    split_title = title.removeprefix("Tuyển dụng ").split(" tại ")
+    return (
+        split_title[0],
+        re.split(r" 20[0-9][0-9]", split_title[1].removesuffix(" - CareerViet.vn"))[0],
     )
-    ADDRESS = (
-        "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[5]/div/span"
-    )
-    SALARY = (
-        "/html/body/main/section[2]/div/div/div[2]/div/"
-        "div[1]/section/div[1]/div/div[3]/div/ul/li[1]/p"
-    )
-    ALT_SALARY = (
-        "/html/body/main/section[3]/div/div/div/div[1]/"
-        "div[2]/div/div/table/tbody/tr[2]/td[2]/p/*"
-    )
-    DESCRIPTION = "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[3]"
-    ALT_DESCRIPTION = "/html/body/main/section[3]/div/div/div/div[1]/div[4]/div[1]"
-    PAGE_EXPIRED_BANNER = "//div[contains(@class, 'no-search')"
+
+
+SPEC = ExtractionSpec(
+    WebsiteIdentifier.CAREERVIET,
+    (
+        FieldSpec("expired", ("//div[contains(@class, 'no-search')]",), Extract.EXISTS),
+        FieldSpec("title", ("/html/head/title",), post=split_title, required=True),
+        FieldSpec(
+            "location",
+            (
+                "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[1]"
+                "/div/div[1]/div/div/p/a",
+            ),
+        ),
+        FieldSpec(
+            "alt_location",
+            (
+                "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[5]"
+                "/div",
+            ),
+        ),
+        FieldSpec(
+            "address",
+            (
+                "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[5]"
+                "/div/span",
+            ),
+        ),
+        FieldSpec(
+            "salary",
+            (
+                "/html/body/main/section[2]/div/div/div[2]/div/"
+                "div[1]/section/div[1]/div/div[3]/div/ul/li[1]/p",
+                "/html/body/main/section[3]/div/div/div/div[1]/"
+                "div[2]/div/div/table/tbody/tr[2]/td[2]/p/*",
+            ),
+        ),
+        FieldSpec(
+            "description",
+            (
+                "/html/body/main/section[2]/div/div/div[2]/div/div[1]/section/div[3]",
+                "/html/body/main/section[3]/div/div/div/div[1]/div[4]/div[1]",
+            ),
+            Extract.HTML,
+            required=True,
+        ),
+    ),
+    # the primary selectors all point before the third section
+    stream_until="/html/body/main/section[3]",
+)
+
+COMPILED_SPEC = SPEC.compile()
+
+STREAM_CHUNK_SIZE = 16 * 1024
+"""The number of bytes read at once from a streamed page"""
+
+
+EXPIRED_PAGE_URL = "https://careerviet.vn/error.html"
+
+_sessions = threading.local()
+
+
+def session() -> requests.Session:
+    """The session of the current fetching thread, which keeps its connections
+    to the website open between the pages, and the runs of the daemon
+    """
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
 
 
 @safe
-def collect_details(link: JobLink) -> Result[JobDetails, PageExpired]:
+def fetch_page(link: JobLink) -> bytes:
+    """The network-bound stage: downloads the job page"""
     logging.info(
         "Retrieving details for job %s (id: %s, link: %s)",
         link.title,
@@ -76,129 +324,96 @@ def collect_details(link: JobLink) -> Result[JobDetails, PageExpired]:
         link.link,
     )
 
-    response = requests.get(link.link, headers=HEADERS, timeout=20)
-    response.raise_for_status()  # Raises an error if the request failed
+    with profiling.stage(profiling.FETCH):
+        response = session().get(link.link, headers=HEADERS, timeout=20)
+        check_response(link, response)
 
-    if response.url == "https://careerviet.vn/error.html":
-        return Failure(PageExpired(link.link))
+    return response.content
 
-    soup = BeautifulSoup(response.content, "html.parser")
 
-    dom: etree._Element = etree.HTML(str(soup))
+@safe
+def stream_page(link: JobLink) -> ParsedDetails | bytes:
+    """The network-bound stage, when the pages are parsed incrementally:
+    downloads the job page only until its fields have been parsed.
+    If they could not all be parsed from the beginning of the page,
+    returns the whole page instead, to be parsed like a downloaded one.
+    """
+    logging.info(
+        "Streaming details for job %s (id: %s, link: %s)",
+        link.title,
+        link.id,
+        link.link,
+    )
 
-    match element_exists(dom, XPATHS.PAGE_EXPIRED_BANNER):
-        case Success(True):
-            return Failure(PageExpired(link.link))
-        case Success(False):
-            pass
-        case Failure(e):
-            return Failure(e)
-
-    job_title, company = (
-        get_element_text(dom, XPATHS.TITLE.value)
-        .map(lambda title: (title.removeprefix("Tuyển dụng ").split(" tại ")))
-        .map(
-            lambda split_title: (
-                split_title[0],
-                re.split(
-                    r" 20[0-9][0-9]", split_title[1].removesuffix(" - CareerViet.vn")
-                )[0],
-            )
+    with (
+        profiling.stage(profiling.FETCH),
+        session().get(link.link, headers=HEADERS, timeout=20, stream=True) as response,
+    ):
+        check_response(link, response)
+
+        chunks = response.iter_content(STREAM_CHUNK_SIZE)
+        values, head = COMPILED_SPEC.evaluate_stream(
+            chunks,
+            # otherwise the parser looks for the encoding in the page itself
+            (
+                response.encoding
+                if "charset" in response.headers.get("Content-Type", "")
+                else None
+            ),
         )
-        .unwrap()
-    )
+        if values is None:
+            logging.debug("Reading the rest of %s to parse it in full", link.link)
+            return head + b"".join(chunks)
 
-    location = (
-        get_element_text(dom, XPATHS.LOCATION)
-        .map(lambda location: f"{location};")
-        .value_or("")
-        + get_element_text(dom, XPATHS.ALT_LOCATION)
-        .map(lambda alt_location: f" {alt_location};")
-        .value_or("")
-        + get_element_text(dom, XPATHS.ADDRESS)
-        .map(lambda address: f" {address};")
-        .value_or("")
-    )
+    logging.debug("Parsed %s from its first %i bytes", link.link, len(head))
+    return parsed_details(link.link, values)
 
-    salary_information = (
-        get_element_text(dom, XPATHS.SALARY)
-        .lash(lambda _: get_element_text(dom, XPATHS.ALT_SALARY))
-        .value_or(None)
-    )
-    description = (
-        get_element_as_text(dom, XPATHS.DESCRIPTION)
-        .lash(lambda _: get_element_as_text(dom, XPATHS.ALT_DESCRIPTION))
-        .unwrap()
-    )
 
-    return Success(
-        JobDetails(
-            id=link.id,
-            title=job_title,
-            company=company,
-            location=location,
-            salary_information=salary_information,
-            description=description,
-        )
-    )
+def check_response(link: JobLink, response: requests.Response) -> None:
+    response.raise_for_status()  # Raises an error if the request failed
 
+    if response.url == EXPIRED_PAGE_URL:
+        raise PageExpired(link.link)
 
-@safe
-def get_element_text(
-    dom: etree._Element, xpath: str | XPATHS, display_name: str | None = None
-) -> str:
-    if isinstance(xpath, XPATHS):
-        display_name = xpath.name
-        xpath = xpath.value
-
-    if (
-        isinstance(els := dom.xpath(xpath), list)
-        and len(els) > 0
-        and isinstance(el := els[0], etree._Element)
-    ):
-        if (text := el.text) is None:
-            text = str(html.HtmlElement(el[0]).text_content())
-        else:
-            text = text
-    else:
-        raise ValueError(
-            f"Unexpected value: {str(els)}: Expected list[lxml.etree._Element] for"
-            f" {display_name}"
-        )
 
-    return text
+def parse_pages(
+    pages: Tuple[Tuple[str, bytes], ...],
+    sampled: bool = False,
+) -> "ParsedChunk":
+    """Parses a chunk of `(url, page)` pairs. This is the unit of work
+    handed off to a parsing process, which also hands back the extraction
+    counters of the chunk. The chunk is profiled if its batch is `sampled`.
+    """
+    with profiling.batch(sampled):
+        return (
+            tuple(parse_page(url, page) for url, page in pages),
+            COMPILED_SPEC.reset_stats(),
+        )
 
 
 @safe
-def get_element_as_text(
-    dom: etree._Element, xpath: str | XPATHS, display_name: str | None = None
-) -> str:
-    if isinstance(xpath, XPATHS):
-        display_name = xpath.name
-        xpath = xpath.value
-
-    if isinstance(els := dom.xpath(xpath), list) and isinstance(
-        el := els[0], etree._Element
-    ):
-        text: str = etree.tounicode(el)
-    else:
-        raise ValueError(
-            f"Unexpected value: {str(els)}: Expected list[lxml.etree._Element] for"
-            f" {display_name}"
-        )
+def parse_page(url: str, page: bytes) -> ParsedDetails:
+    """The CPU-bound stage: extracts the job details from a downloaded page"""
+    with profiling.stage(profiling.PARSE):
+        soup = BeautifulSoup(page, "html.parser")
 
-    return text
+        dom: etree._Element = etree.HTML(str(soup))
 
+        return parsed_details(url, COMPILED_SPEC.evaluate(dom))
 
-@safe
-def element_exists(dom, xpath: XPATHS) -> bool:
-    if isinstance(els := dom.xpath(xpath.value), list):
-        if len(els) > 0:
-            return True
-        else:
-            return False
-    else:
-        raise ValueError(
-            f"Unexpected value: {str(els)}: Expected list[lxml.etree._Element] for"
-            f" {xpath.name}"
+
+def parsed_details(url: str, values: Extracted) -> ParsedDetails:
+    if values["expired"]:
+        raise PageExpired(url)
+    COMPILED_SPEC.require(values, url)
+
+    job_title, company = values["title"]
+    location = "".join(
+        (
+            f"{values['location']};" if values["location"] is not None else "",
+            f" {values['alt_location']};" if values["alt_location"] is not None else "",
+            f" {values['address']};" if values["address"] is not None else "",
         )
+    )
+
+    return job_title, company, location, values["salary"], values["description"]
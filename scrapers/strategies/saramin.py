@@ -1,32 +1,34 @@
 import logging
 import typing
 
-from selenium.common.exceptions import NoSuchElementException
+from annotated_types import Gt
+from lxml import etree, html
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver import Remote
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.options import ArgOptions
-from selenium.webdriver.remote.webelement import WebElement
 
-from models import JobDetails, JobLink, WebsiteIdentifier
+import drivers
+import profiling
+from config import ApplictionConfig
+from models import JobDetails, JobLink, ScrapingFailure, WebsiteIdentifier
+from scrapers.errors import MissingFields
+from scrapers.extraction import Extract, ExtractionSpec, FieldSpec
 from scrapers.strategy import DetailScrapingStrategy, detail_scraping_strategy
 
 
 def init_saramin_selenium_scraper(
-    driver_type: type[Remote], driver_options: ArgOptions
+    driver_pool: drivers.DriverPool,
 ) -> DetailScrapingStrategy:
     """
     Parameters
     ----------
-    driver_type : type[Remote]
-        The type of the Selenium driver (Firefox, Chrome, etc.)
-    driver_options : BaseOptions
-        The options that are compatible with the driver
+    driver_pool : drivers.DriverPool
+        The pool of warm browsers, which is shared with the other strategies
     """
 
     @detail_scraping_strategy(WebsiteIdentifier.SARAMIN)
     def saramin_selenium_sequential(
         links: typing.Tuple[JobLink, ...],
-    ) -> typing.Tuple[JobDetails, ...]:
+    ) -> typing.Tuple[JobDetails | ScrapingFailure, ...]:
         """
         Parameters
         ---------
@@ -42,89 +44,185 @@ def init_saramin_selenium_scraper(
         Selenium raises an error when I'm creating a driver for the second time and
         then close the first instance.
         """
-        with driver_type(options=driver_options) as driver:
-            return tuple(
-                details
-                for link in links
-                if (details := collect_details(driver, link)) is not None
-            )
+        with driver_pool.acquire() as driver:
+            scraped = tuple(collect_details(driver, link) for link in links)
+        COMPILED_SPEC.log_stats()
+        return scraped
 
     return saramin_selenium_sequential
 
 
-def collect_details(driver: Remote, link: JobLink) -> JobDetails | None:
-    logging.info(f"Retrieving details for job {link.title} (id {link.id})")
-    driver.get(link.link)
+def init_saramin_tabs_scraper(
+    driver_pool: drivers.DriverPool,
+    n_tabs: typing.Annotated[int, Gt(0)],
+    timeout_seconds: typing.Annotated[float, Gt(0)],
+) -> DetailScrapingStrategy:
+    """
+    Parameters
+    ----------
+    driver_pool : drivers.DriverPool
+        The pool of warm browsers, which is shared with the other strategies
+    n_tabs : int
+        How many pages are loaded at once in the tabs of the browser
+    timeout_seconds : float
+        How long a page may take to load before it is given up on
+    """
 
-    id = link.id
+    @detail_scraping_strategy(WebsiteIdentifier.SARAMIN)
+    def saramin_selenium_tabs(
+        links: typing.Tuple[JobLink, ...],
+    ) -> typing.Tuple[JobDetails | ScrapingFailure, ...]:
+        """
+        Loads the pages in several tabs of one browser at once, and extracts
+        the details from whichever page finishes loading first, so that a
+        single browser process makes progress while the others wait on the
+        network.
 
-    try:
-        title = driver.find_element(
-            By.XPATH, "/html/body/div[3]/div/div/div[3]/section[1]/div[1]/div[1]/div/h1"
-        ).text
-    except NoSuchElementException as e:
-        logging.warning(f"""The job details page was missing an element.
-                Perhaps the job has expired or the page has an unusual
-                structure. (link: {link}, error: {e})
-            """)
-        return None
+        See the `DetailsScrapingStrategy` protocol
+        definition to get the description of the arguments
+        and the return type
+        """
+        scraped: typing.List[JobDetails | ScrapingFailure] = []
+        with driver_pool.acquire() as driver:
+            for index, loaded in profiling.iterate(
+                profiling.FETCH,
+                drivers.load_in_tabs(
+                    driver,
+                    tuple(link.link for link in links),
+                    n_tabs,
+                    timeout_seconds,
+                ),
+            ):
+                link = links[index]
+                if loaded:
+                    scraped.append(extract_details(driver, link))
+                    continue
+                logging.warning(
+                    "The page did not load in %.0fs; skipping link %s",
+                    timeout_seconds,
+                    link.link,
+                )
+                scraped.append(
+                    ScrapingFailure(
+                        link.id,
+                        f"The page did not load in {timeout_seconds:.0f}s",
+                        permanent=False,
+                    )
+                )
+        COMPILED_SPEC.log_stats()
+        return tuple(scraped)
+
+    return saramin_selenium_tabs
+
+
+def init_saramin_selenium_sequential_scraper(
+    config: ApplictionConfig,
+) -> DetailScrapingStrategy:
+    return init_saramin_selenium_scraper(drivers.shared_pool(config))
 
-    try:
-        company = driver.find_element(
-            By.XPATH,
-            "/html/body/div[3]/div/div/div[3]/section[1]/div[1]/div[1]/div/div[1]/"
-            "a[contains(@class, 'company')]",
-        ).get_attribute("title")
-    except NoSuchElementException:
-        company = None
 
-    try:
-        location = driver.find_element(
-            By.XPATH,
-            "/html/body/div[3]/div/div/div[3]/section[1]/div[1]/"
-            "div[5]/div/address/span[1]/span",
-        ).text
-    except NoSuchElementException:
-        location = None
+def init_saramin_selenium_tabs_scraper(
+    config: ApplictionConfig,
+) -> DetailScrapingStrategy:
+    return init_saramin_tabs_scraper(
+        drivers.shared_pool(config),
+        config.selenium.tabs,
+        config.selenium.tab_timeout_seconds,
+    )
 
-    try:
-        location_div: WebElement = driver.find_element(By.XPATH, "//*[@id='map_0']")
-        alt_location = (
-            f"{location_div.get_attribute('data-address')}; "
-            f"lat {location_div.get_attribute('data-latitude')}; "
-            f"long {location_div.get_attribute('data-longitude')}"
-        )
-        location = f"{location} ({alt_location})"
-    except NoSuchElementException:
-        alt_location = ""
 
+SPEC = ExtractionSpec(
+    WebsiteIdentifier.SARAMIN,
+    (
+        FieldSpec(
+            "title",
+            ("/html/body/div[3]/div/div/div[3]/section[1]/div[1]/div[1]/div/h1",),
+            Extract.TEXT_CONTENT,
+            required=True,
+        ),
+        FieldSpec(
+            "company",
+            (
+                "/html/body/div[3]/div/div/div[3]/section[1]/div[1]/div[1]/div/div[1]/"
+                "a[contains(@class, 'company')]/@title",
+            ),
+            required=True,
+        ),
+        FieldSpec(
+            "location",
+            (
+                "/html/body/div[3]/div/div/div[3]/section[1]/div[1]/"
+                "div[5]/div/address/span[1]/span",
+            ),
+            Extract.TEXT_CONTENT,
+        ),
+        FieldSpec("map_address", ("//*[@id='map_0']/@data-address",)),
+        FieldSpec("latitude", ("//*[@id='map_0']/@data-latitude",), post=float),
+        FieldSpec("longitude", ("//*[@id='map_0']/@data-longitude",), post=float),
+        FieldSpec(
+            "salary",
+            (
+                "/html/body/div[3]/div/div/div[3]/section[1]/"
+                "div[1]/div[2]/div/div[1]/dl[1]/dd",
+            ),
+            Extract.TEXT_CONTENT,
+        ),
+        FieldSpec(
+            # so far only this has been loading some post-specific content
+            # but the result is raw and has a repeating header and footer
+            # from the saramin website
+            "description",
+            ("/html/body[.//*[@id='iframe_content_0']]",),
+            Extract.TEXT_CONTENT,
+        ),
+    ),
+)
+
+COMPILED_SPEC = SPEC.compile()
+
+
+def collect_details(driver: Remote, link: JobLink) -> JobDetails | ScrapingFailure:
+    logging.info("Retrieving details for job %s (id %s)", link.title, link.id)
     try:
-        salary_information = driver.find_element(
-            By.XPATH,
-            "/html/body/div[3]/div/div/div[3]/section[1]/"
-            "div[1]/div[2]/div/div[1]/dl[1]/dd",
-        ).text
-    except NoSuchElementException:
-        salary_information = None
+        with profiling.stage(profiling.FETCH):
+            driver.get(link.link)
+    except TimeoutException as e:
+        logging.warning("%s; skipping link %s", e, link.link)
+        return ScrapingFailure(link.id, str(e), permanent=False)
+
+    return extract_details(driver, link)
+
 
+def extract_details(driver: Remote, link: JobLink) -> JobDetails | ScrapingFailure:
+    """Extracts the details from the page loaded in the current tab"""
+    with profiling.stage(profiling.PARSE):
+        dom = html.fromstring(driver.page_source)
+        # the rendered text of the page, as the browser would show it
+        etree.strip_elements(dom, "script", "style", "noscript", with_tail=False)
+
+        values = COMPILED_SPEC.evaluate(dom)
     try:
-        # so far only this has been loading some post-specific content
-        # but the result is raw and has a repeating header and footer
-        # from the saramin website
-        # tried to go ahead with driver.switch_to.frame("iframe_content_0"),
-        # but no luck yet
-        user_iframe_body: WebElement = driver.find_element(
-            By.XPATH, "//*[@id='iframe_content_0']"
-        ).find_element(By.XPATH, "/html/body")
-        description = user_iframe_body.text
-    except NoSuchElementException:
-        description = ""
+        COMPILED_SPEC.require(values, link.link)
+    except MissingFields as e:
+        logging.warning(
+            "The job details page was missing an element. Perhaps the job"
+            " has expired or the page has an unusual structure. (link: %s, error: %s)",
+            link,
+            e,
+        )
+        return ScrapingFailure(link.id, str(e), permanent=False)
+
+    location = values["location"]
+    if values["map_address"] is not None:
+        location = f"{location} ({values['map_address']})"
 
     return JobDetails(
-        id=id,
-        title=title,
-        company=str(company),
+        id=link.id,
+        title=values["title"],
+        company=values["company"],
         location=location,
-        salary_information=salary_information,
-        description=description,
+        salary_information=values["salary"],
+        description=values["description"] or "",
+        latitude=values["latitude"],
+        longitude=values["longitude"],
     )
@@ -1,6 +1,6 @@
 from typing import Callable, ClassVar, Protocol, Tuple, runtime_checkable
 
-from models import JobDetails, JobLink, WebsiteIdentifier
+from models import JobDetails, JobLink, ScrapingFailure, WebsiteIdentifier
 
 
 @runtime_checkable
@@ -8,7 +8,9 @@ class DetailScrapingStrategy(Protocol):
     __name__: ClassVar[str]
     website: ClassVar[WebsiteIdentifier]
 
-    def __call__(self, *, links: Tuple[JobLink, ...]) -> Tuple[JobDetails, ...]:
+    def __call__(
+        self, *, links: Tuple[JobLink, ...]
+    ) -> Tuple[JobDetails | ScrapingFailure, ...]:
         """Given a list of job links, collect the job details
 
         Parameters
@@ -19,7 +21,8 @@ class DetailScrapingStrategy(Protocol):
         Returns
         ------
         typing.List[str]
-            A list of job details
+            A list of job details, or of the reasons why the details
+            of a link could not be collected
         """
 
     ...
@@ -28,12 +31,16 @@ class DetailScrapingStrategy(Protocol):
 def detail_scraping_strategy(website_: WebsiteIdentifier):
     """A decorator for function-like strategies"""
 
-    def wrapper(f: Callable[[Tuple[JobLink, ...]], Tuple[JobDetails, ...]]):
+    def wrapper(
+        f: Callable[[Tuple[JobLink, ...]], Tuple[JobDetails | ScrapingFailure, ...]],
+    ):
         class _(DetailScrapingStrategy):
             __name__: ClassVar[str] = f.__name__
             website: ClassVar[WebsiteIdentifier] = website_
 
-            def __call__(self, *, links: Tuple[JobLink, ...]) -> Tuple[JobDetails, ...]:
+            def __call__(
+                self, *, links: Tuple[JobLink, ...]
+            ) -> Tuple[JobDetails | ScrapingFailure, ...]:
                 return f(links)
 
         return _()
@@ -0,0 +1,58 @@
+import dataclasses
+import pathlib
+
+import pytest
+
+from models import JobDetails
+from normalization.companies import normalize_company
+from persistence.sqlite import SqliteJobDetailsRepository
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Công ty TNHH X", "x"),
+        ("CÔNG TY TNHH X ", "x"),
+        ("X Co., Ltd", "x"),
+        ("X Company Limited", "x"),
+        ("Công ty Cổ phần Phần mềm FPT", "phần mềm fpt"),
+        ("Công ty TNHH MTV Y", "y"),
+        ("Tập đoàn Vingroup - CTCP", "vingroup"),
+        ("(주)삼성전자", "삼성전자"),
+        ("삼성전자 주식회사", "삼성전자"),
+        ("㈜ 카카오", "카카오"),
+        ("AT&T Inc.", "at&t"),
+        # the names are not cut inside words
+        ("Incheon Logistics", "incheon logistics"),
+        ("Limitless", "limitless"),
+        # a name that is only a legal form is kept
+        ("Công ty", "công ty"),
+    ],
+)
+def test_normalize_company(name: str, expected: str) -> None:
+    assert normalize_company(name) == expected
+
+
+def test_the_variants_of_a_name_are_one_company(tmp_path: pathlib.Path) -> None:
+    details = JobDetails(
+        "1",
+        "Backend developer",
+        "(주)삼성전자",
+        "Seoul",
+        None,
+        "Python",
+        access_date=1_700_000_000_000_000,
+    )
+    with SqliteJobDetailsRepository(tmp_path / "jobs.db") as repository:
+        repository.save_batch(
+            (
+                details,
+                dataclasses.replace(details, id="2", company="삼성전자 주식회사"),
+                dataclasses.replace(details, id="3", company="LG전자"),
+            )
+        )
+        companies = repository.connection.execute(
+            "SELECT normalized_name, name, n_postings FROM companies ORDER BY id"
+        ).fetchall()
+
+    assert companies == [("삼성전자", "(주)삼성전자", 2), ("lg전자", "LG전자", 1)]
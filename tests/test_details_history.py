@@ -0,0 +1,102 @@
+import dataclasses
+import json
+import pathlib
+import typing
+
+import pytest
+
+from models import JobDetails
+from persistence.sqlite import SqliteJobDetailsRepository, content_diff
+
+DETAILS = JobDetails(
+    "1",
+    "Backend developer",
+    "Company",
+    "Seoul (Gangnam-gu)",
+    "연봉 3,000~4,000만원",
+    "Python\nSQL",
+    access_date=1_700_000_000_000_000,
+    latitude=37.5,
+    longitude=127.0,
+)
+
+
+@pytest.fixture
+def repository(
+    tmp_path: pathlib.Path,
+) -> typing.Iterator[SqliteJobDetailsRepository]:
+    with SqliteJobDetailsRepository(tmp_path / "jobs.db") as repository:
+        yield repository
+
+
+def history(
+    repository: SqliteJobDetailsRepository,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    return [
+        json.loads(diff)
+        for (diff,) in repository.connection.execute(
+            "SELECT diff FROM job_details_history ORDER BY rowid"
+        )
+    ]
+
+
+def test_unchanged_details_are_not_recorded(
+    repository: SqliteJobDetailsRepository,
+) -> None:
+    repository.save_batch((DETAILS,))
+    repository.save_batch(
+        (dataclasses.replace(DETAILS, access_date=DETAILS.access_date + 1),)
+    )
+
+    assert history(repository) == []
+
+
+def test_the_changes_are_recorded(repository: SqliteJobDetailsRepository) -> None:
+    repository.save_batch((DETAILS,))
+    repository.save_batch(
+        (
+            dataclasses.replace(
+                DETAILS, title="Senior backend developer", description="Python\nGo"
+            ),
+        )
+    )
+
+    assert history(repository) == [
+        {"title": "Backend developer", "description": "@@ -2 +2 @@\n-SQL\n+Go"}
+    ]
+
+
+def test_a_moved_map_pin_is_a_change(repository: SqliteJobDetailsRepository) -> None:
+    repository.save_batch((DETAILS,))
+    repository.save_batch((dataclasses.replace(DETAILS, latitude=37.6),))
+
+    assert history(repository) == [{"latitude": 37.5}]
+    assert repository.connection.execute(
+        "SELECT latitude FROM job_details"
+    ).fetchone() == (37.6,)
+
+
+def test_the_rows_hashed_without_some_fields_are_not_changes(
+    repository: SqliteJobDetailsRepository,
+) -> None:
+    repository.save_batch((DETAILS,))
+    repository.connection.execute("UPDATE job_details SET content_hash = 'old'")
+    repository.connection.commit()
+
+    repository.save_batch((DETAILS,))
+
+    assert history(repository) == []
+    assert repository.connection.execute(
+        "SELECT content_hash != 'old' FROM job_details"
+    ).fetchone() == (1,)
+
+
+def test_the_diff_keeps_the_previous_values() -> None:
+    previous = {
+        field: getattr(DETAILS, field)
+        for field in SqliteJobDetailsRepository.CONTENT_FIELDS
+    }
+
+    assert json.loads(
+        content_diff(previous, dataclasses.replace(DETAILS, salary_information=None))
+    ) == {"salary_information": "연봉 3,000~4,000만원"}
@@ -0,0 +1,55 @@
+import pytest
+from lxml import html
+
+from models import WebsiteIdentifier
+from scrapers.errors import MissingFields
+from scrapers.extraction import Extract, ExtractionSpec, FieldSpec
+
+SPEC = ExtractionSpec(
+    WebsiteIdentifier.SARAMIN,
+    (
+        FieldSpec("title", ("//h1", "//h2"), Extract.TEXT_CONTENT, required=True),
+        FieldSpec("company", ("//a[@class='company']/@title",), required=True),
+        FieldSpec("latitude", ("//*[@id='map']/@data-latitude",), post=float),
+        FieldSpec("expired", ("//div[@class='expired']",), Extract.EXISTS),
+    ),
+)
+
+
+def test_the_fallback_selectors_are_tried_in_order() -> None:
+    spec = SPEC.compile()
+    values = spec.evaluate(
+        html.fromstring(
+            "<html><body><h2> The  title </h2>"
+            "<a class='company' title='Company'></a>"
+            "<div id='map' data-latitude='nowhere'></div></body></html>"
+        )
+    )
+
+    assert values == {
+        "title": "The title",
+        "company": "Company",
+        "latitude": None,
+        "expired": False,
+    }
+    assert spec.stats["title"].hits == [0, 1]
+    assert spec.stats["latitude"].hit_rate == 0
+
+
+def test_a_missing_required_field_is_reported() -> None:
+    spec = SPEC.compile()
+    values = spec.evaluate(html.fromstring("<html><body><h1>Title</h1></body></html>"))
+
+    assert values["company"] is None
+    with pytest.raises(MissingFields):
+        spec.require(values, "https://example.com")
+
+
+def test_the_counters_are_reset() -> None:
+    spec = SPEC.compile()
+    spec.evaluate(html.fromstring("<html><body><h1>Title</h1></body></html>"))
+
+    previous = spec.reset_stats()
+
+    assert previous["title"].evaluations == 1
+    assert spec.stats["title"].evaluations == 0
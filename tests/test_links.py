@@ -0,0 +1,112 @@
+import pathlib
+import sqlite3
+
+import pytest
+
+from models import JobLink, WebsiteIdentifier
+from normalization.urls import canonical_url
+from persistence.sqlite import SqliteJobLinkRepository
+
+SARAMIN_VIEW = "https://www.saramin.co.kr/zf_user/jobs/view?rec_idx=123"
+CAREERVIET_JOB = "https://careerviet.vn/vi/tim-viec-lam/backend.35C1A2B3.html"
+
+
+@pytest.mark.parametrize(
+    "url, website_identifier, expected",
+    [
+        (SARAMIN_VIEW, WebsiteIdentifier.SARAMIN, SARAMIN_VIEW),
+        (
+            "https://www.saramin.co.kr/zf_user/jobs/relay/view"
+            "?view_type=list&rec_idx=123&location=ts&searchword=python",
+            WebsiteIdentifier.SARAMIN,
+            SARAMIN_VIEW,
+        ),
+        (
+            "HTTPS://WWW.Saramin.co.kr:443/zf_user/jobs/view?rec_idx=123#apply",
+            WebsiteIdentifier.SARAMIN,
+            SARAMIN_VIEW,
+        ),
+        (
+            "https://www.saramin.co.kr/zf_user/search"
+            "?utm_source=mail&searchword=python&fbclid=1&loc=101",
+            WebsiteIdentifier.SARAMIN,
+            "https://www.saramin.co.kr/zf_user/search?loc=101&searchword=python",
+        ),
+        (
+            f"{CAREERVIET_JOB}?src=search&utm_source=mail",
+            WebsiteIdentifier.CAREERVIET,
+            CAREERVIET_JOB,
+        ),
+        (
+            "http://careerviet.vn:8080",
+            WebsiteIdentifier.CAREERVIET,
+            "http://careerviet.vn:8080/",
+        ),
+    ],
+)
+def test_canonical_url(
+    url: str, website_identifier: WebsiteIdentifier, expected: str
+) -> None:
+    assert canonical_url(url, website_identifier) == expected
+
+
+def test_the_duplicates_are_not_saved(tmp_path: pathlib.Path) -> None:
+    with SqliteJobLinkRepository(tmp_path / "jobs.db") as repository:
+        repository.save_batch(
+            (
+                JobLink("1", "Backend", SARAMIN_VIEW, WebsiteIdentifier.SARAMIN),
+                JobLink(
+                    "2",
+                    "Backend",
+                    f"{SARAMIN_VIEW}&utm_source=mail",
+                    WebsiteIdentifier.SARAMIN,
+                ),
+            )
+        )
+        ids = repository.connection.execute("SELECT id FROM job_links").fetchall()
+
+    assert ids == [("1",)]
+
+
+def test_the_legacy_links_are_given_canonical_urls_once(
+    tmp_path: pathlib.Path,
+) -> None:
+    db_file_location = tmp_path / "jobs.db"
+    with sqlite3.connect(db_file_location) as connection:
+        connection.execute("""
+            CREATE TABLE job_links (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                link TEXT NOT NULL,
+                website_identifier TEXT NOT NULL
+            )
+            """)
+        connection.executemany(
+            "INSERT INTO job_links VALUES (?, 'Backend', ?, 'saramin')",
+            [("1", SARAMIN_VIEW), ("2", f"{SARAMIN_VIEW}#apply")],
+        )
+    connection.close()
+
+    with SqliteJobLinkRepository(db_file_location):
+        pass
+    with sqlite3.connect(db_file_location) as connection:
+        migrated = connection.execute(
+            "SELECT id, canonical_url FROM job_links ORDER BY id"
+        ).fetchall()
+        # a link the backfill would give a canonical URL, if it ran again
+        connection.execute(
+            "INSERT INTO job_links (id, title, link, website_identifier)"
+            " VALUES ('3', 'Frontend', ?, 'careerviet')",
+            (CAREERVIET_JOB,),
+        )
+    connection.close()
+    with SqliteJobLinkRepository(db_file_location):
+        pass
+    with sqlite3.connect(db_file_location) as connection:
+        reopened = connection.execute(
+            "SELECT canonical_url FROM job_links WHERE id = '3'"
+        ).fetchone()
+    connection.close()
+
+    assert migrated == [("1", SARAMIN_VIEW), ("2", None)]
+    assert reopened == (None,)
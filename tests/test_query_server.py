@@ -0,0 +1,106 @@
+import http
+import json
+import pathlib
+import typing
+
+import pytest
+
+from models import JobDetails, JobLink, WebsiteIdentifier
+from persistence.sqlite import SqliteJobDetailsRepository, SqliteJobLinkRepository
+from query_server import QueryServer
+
+
+@pytest.fixture
+def db_file_location(tmp_path: pathlib.Path) -> pathlib.Path:
+    location = tmp_path / "jobs.db"
+    with SqliteJobLinkRepository(location) as link_repository:
+        link_repository.save_batch(
+            tuple(
+                JobLink(id_, "Title", f"https://example.com/{id_}", website)
+                for id_, website in (
+                    ("1", WebsiteIdentifier.CAREERVIET),
+                    ("2", WebsiteIdentifier.CAREERVIET),
+                    ("3", WebsiteIdentifier.SARAMIN),
+                )
+            )
+        )
+    with SqliteJobDetailsRepository(location) as details_repository:
+        details_repository.save_batch(
+            tuple(
+                JobDetails(id_, "Title", "Company", None, None, "Description")
+                for id_ in ("1", "2", "3")
+            )
+        )
+        # written by hosts in different timezones, or before and after a DST change
+        details_repository.connection.executemany(
+            "UPDATE job_details SET access_date = ? WHERE id = ?",
+            [
+                ("2025-03-30T03:30:00+02:00", "1"),
+                ("2025-03-30T01:00:00+00:00", "2"),
+                ("2025-03-30T09:45:00+09:00", "3"),
+            ],
+        )
+        details_repository.connection.commit()
+    return location
+
+
+@pytest.fixture
+def query_server(db_file_location: pathlib.Path) -> typing.Iterator[QueryServer]:
+    query_server = QueryServer(db_file_location, connections=2, cache_size=8)
+    yield query_server
+    query_server.pool.close()
+    query_server.version_connection.close()
+
+
+def ids(query_server: QueryServer, target: str) -> typing.List[str]:
+    response = query_server.respond(target)
+    assert response.status == http.HTTPStatus.OK
+    return [item["id"] for item in json.loads(response.body)["items"]]
+
+
+def test_the_details_are_ordered_and_filtered_in_utc(
+    query_server: QueryServer,
+) -> None:
+    assert ids(query_server, "/details") == ["1", "2", "3"]
+    assert ids(query_server, "/details?since=2025-03-30T01:15:00") == ["1"]
+    assert ids(query_server, "/details?until=2025-03-30T10:15:00%2B09:00") == [
+        "2",
+        "3",
+    ]
+    assert ids(query_server, "/details?website=saramin") == ["3"]
+
+
+def test_an_invalid_date_is_a_bad_request(query_server: QueryServer) -> None:
+    assert (
+        query_server.respond("/details?since=yesterday").status
+        == http.HTTPStatus.BAD_REQUEST
+    )
+
+
+def test_the_responses_are_cached_until_the_next_write(
+    query_server: QueryServer, db_file_location: pathlib.Path
+) -> None:
+    first = query_server.respond("/count?website=careerviet")
+    assert json.loads(first.body)["count"] == 2
+    assert query_server.respond("/count?website=careerviet") is first
+
+    with SqliteJobLinkRepository(db_file_location) as link_repository:
+        link_repository.save_batch(
+            (
+                JobLink(
+                    "4",
+                    "Title",
+                    "https://example.com/4",
+                    WebsiteIdentifier.CAREERVIET,
+                ),
+            )
+        )
+
+    after_write = query_server.respond("/count?website=careerviet")
+    assert json.loads(after_write.body)["count"] == 3
+    assert after_write.etag != first.etag
+
+
+def test_a_missing_job_is_not_found(query_server: QueryServer) -> None:
+    assert query_server.respond("/links/404").status == http.HTTPStatus.NOT_FOUND
+    assert query_server.respond("/nowhere").status == http.HTTPStatus.NOT_FOUND
@@ -0,0 +1,196 @@
+import pathlib
+import types
+import typing
+
+import pytest
+
+from models import JobLink, ScrapingFailure, WebsiteIdentifier
+from persistence.sqlite import SqliteJobLinkQueue, SqliteJobLinkRepository
+
+SARAMIN = WebsiteIdentifier.SARAMIN
+LEASE_SECONDS = 60
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(
+        "persistence.sqlite.time", types.SimpleNamespace(time=clock.time)
+    )
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path: pathlib.Path, clock: Clock) -> typing.Iterator[SqliteJobLinkQueue]:
+    db_file_location = tmp_path / "jobs.db"
+    with SqliteJobLinkRepository(db_file_location) as repository:
+        repository.save_batch(
+            tuple(
+                JobLink(
+                    id_,
+                    "Backend",
+                    f"https://www.saramin.co.kr/zf_user/jobs/view?rec_idx={id_}",
+                    SARAMIN,
+                )
+                for id_ in ("1", "2", "3")
+            )
+        )
+        # the links first seen most recently have the highest ids
+        repository.connection.execute("UPDATE job_links SET first_seen = id")
+        repository.connection.commit()
+    with SqliteJobLinkQueue(
+        db_file_location,
+        retry_delay_seconds=100,
+        max_retry_delay_seconds=300,
+        max_attempts=3,
+    ) as queue:
+        queue.enqueue(SARAMIN)
+        yield queue
+
+
+def claim(
+    queue: SqliteJobLinkQueue, worker_id: str, batch_size: int = 3
+) -> typing.Set[str]:
+    """The ids of the claimed links, which are picked, but not returned,
+    in the order of their priority
+    """
+    return {
+        link.id for link in queue.claim(SARAMIN, worker_id, batch_size, LEASE_SECONDS)
+    }
+
+
+def test_the_freshest_links_are_claimed_first(queue: SqliteJobLinkQueue) -> None:
+    assert claim(queue, "a", 1) == {"3"}
+    assert queue.complete("a", ("3",)) == 1
+    assert queue.requeue_done(SARAMIN) == 1
+
+    # the re-queued links come after the ones never scraped
+    assert claim(queue, "b", 1) == {"2"}
+    assert claim(queue, "b", 1) == {"1"}
+    assert claim(queue, "b", 1) == {"3"}
+
+
+def test_a_leased_link_is_not_claimed_again(queue: SqliteJobLinkQueue) -> None:
+    assert claim(queue, "a", 2) == {"3", "2"}
+
+    assert claim(queue, "b") == {"1"}
+    assert claim(queue, "c") == set()
+
+
+def test_an_expired_lease_is_claimed_again(
+    queue: SqliteJobLinkQueue, clock: Clock
+) -> None:
+    claim(queue, "a")
+    clock.now += LEASE_SECONDS / 2
+    assert queue.heartbeat("a", LEASE_SECONDS) == 3
+    clock.now += LEASE_SECONDS / 2 + 1
+
+    # the heartbeat extended the leases
+    assert claim(queue, "b") == set()
+
+    clock.now += LEASE_SECONDS
+    assert claim(queue, "b") == {"3", "2", "1"}
+    # the worker that lost its leases cannot finish the links
+    assert queue.complete("a", ("3", "2", "1")) == 0
+    assert queue.complete("b", ("3", "2", "1")) == 3
+
+
+def test_the_expired_leases_are_reclaimed(
+    queue: SqliteJobLinkQueue, clock: Clock
+) -> None:
+    claim(queue, "a", 2)
+    assert queue.reclaim_expired() == 0
+
+    clock.now += LEASE_SECONDS + 1
+
+    assert queue.reclaim_expired() == 2
+    assert claim(queue, "b") == {"3", "2", "1"}
+
+
+def test_a_released_link_is_claimed_again(queue: SqliteJobLinkQueue) -> None:
+    claim(queue, "a", 1)
+
+    assert queue.release("a", ("3",)) == 1
+    assert claim(queue, "b", 1) == {"3"}
+
+
+def test_a_permanent_failure_is_never_retried(
+    queue: SqliteJobLinkQueue, clock: Clock
+) -> None:
+    claim(queue, "a", 1)
+
+    assert queue.fail("a", (ScrapingFailure("3", "expired", True),)) == 1
+    clock.now += 10 * 300
+    assert queue.requeue_done(SARAMIN) == 1
+
+    assert claim(queue, "b") == {"2", "1"}
+    assert status(queue, "3") == ("expired", 1, None)
+
+
+def test_a_transient_failure_is_retried_with_a_backoff(
+    queue: SqliteJobLinkQueue, clock: Clock
+) -> None:
+    start = clock.now
+    failure = ScrapingFailure("3", "timeout", False)
+    claim(queue, "a", 1)
+    assert queue.fail("a", (failure,)) == 1
+    assert status(queue, "3") == ("retry", 1, start + 100)
+
+    # not before the delay
+    assert claim(queue, "b") == {"2", "1"}
+    queue.complete("b", ("2", "1"))
+    clock.now = start + 100
+    assert claim(queue, "c") == {"3"}
+
+    # the delay doubles
+    queue.fail("c", (failure,))
+    assert status(queue, "3") == ("retry", 2, start + 300)
+    clock.now = start + 300
+    assert claim(queue, "d") == {"3"}
+
+    # and is given up on after the last attempt
+    queue.fail("d", (failure,))
+    assert status(queue, "3")[:2] == ("failed", 3)
+    clock.now += 10 * 300
+    assert claim(queue, "e") == set()
+
+
+def test_the_delay_is_capped(queue: SqliteJobLinkQueue, clock: Clock) -> None:
+    queue.max_attempts = 10
+    failure = ScrapingFailure("3", "timeout", False)
+    for _ in range(3):
+        claim(queue, "a", 1)
+        queue.fail("a", (failure,))
+        clock.now = status(queue, "3")[2]
+
+    # 100, 200, then 300 rather than 400 seconds
+    assert status(queue, "3") == ("retry", 3, clock.now)
+    assert clock.now == 1_700_000_000 + 100 + 200 + 300
+
+
+def test_a_completed_link_is_no_longer_retried(
+    queue: SqliteJobLinkQueue, clock: Clock
+) -> None:
+    claim(queue, "a", 1)
+    queue.fail("a", (ScrapingFailure("3", "timeout", False),))
+    clock.now += 100
+    claim(queue, "b", 1)
+
+    assert queue.complete("b", ("3",)) == 1
+    assert status(queue, "3") is None
+
+
+def status(queue: SqliteJobLinkQueue, id_: str) -> typing.Any:
+    """The `(status, attempts, next_retry_at)` of the link, if it failed"""
+    return queue.connection.execute(
+        "SELECT status, attempts, next_retry_at FROM job_link_status WHERE id = ?",
+        (id_,),
+    ).fetchone()
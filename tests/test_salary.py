@@ -0,0 +1,40 @@
+import pytest
+
+from normalization.salary import UNKNOWN, Salary, normalize_salary
+
+
+@pytest.mark.parametrize(
+    "salary_information, expected",
+    [
+        # Careerviet
+        ("Lương: 10 Tr - 15 Tr VND", Salary(10e6, 15e6, "VND", "month")),
+        ("10 - 15 Tr VND", Salary(10e6, 15e6, "VND", "month")),
+        ("Trên 20 triệu", Salary(20e6, None, "VND", "month")),
+        ("trên 20tr", Salary(20e6, None, "VND", "month")),
+        ("Lên đến 30 Tr VND", Salary(None, 30e6, "VND", "month")),
+        ("1,5 tỷ VND/năm", Salary(1.5e9, 1.5e9, "VND", "year")),
+        # Saramin
+        ("연봉 3,000~4,000만원", Salary(30e6, 40e6, "KRW", "year")),
+        ("월급 300만원 이상", Salary(3e6, None, "KRW", "month")),
+        ("1억 2,000만원", Salary(120e6, 120e6, "KRW", None)),
+        ("2,500,000 KRW/month", Salary(2.5e6, 2.5e6, "KRW", "month")),
+        ("3000 KRW", Salary(3000, 3000, "KRW", None)),
+        # in dollars, on both websites
+        ("$1,000 - $2,000", Salary(1000, 2000, "USD", None)),
+        ("Upto $1500", Salary(None, 1500, "USD", None)),
+        ("Up to 2,000 USD", Salary(None, 2000, "USD", None)),
+        ("15k USD", Salary(15e3, 15e3, "USD", None)),
+        ("Từ 500 USD", Salary(500, None, "USD", None)),
+    ],
+)
+def test_normalize_salary(salary_information: str, expected: Salary) -> None:
+    assert normalize_salary(salary_information) == expected
+
+
+@pytest.mark.parametrize(
+    "salary_information", [None, "", "Thỏa thuận", "Cạnh tranh", "회사내규에 따름"]
+)
+def test_salaries_without_amounts_are_unknown(
+    salary_information: str | None,
+) -> None:
+    assert normalize_salary(salary_information) == UNKNOWN